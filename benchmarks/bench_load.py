@@ -0,0 +1,261 @@
+"""End-to-end load test: N simulated users run the bot's menu flows against a fake Bot API.
+
+The real bot (main.py) runs as a child process pointed at fake_bot_api.FakeBotAPI
+through BOT_API_URL, so every handler, download and sendDocument goes over HTTP
+as it would against Telegram. Reports completed flows per second, p50/p99
+completion time per mode and the bot's peak RSS.
+Run from the repo root:
+    python benchmarks/bench_load.py [--users 20 --modes v2 --v2-files 200 --per-file 50]
+    python benchmarks/bench_load.py --latency 0.05 --retry-after-rate 0.02   # slow, flood-limited Telegram
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import signal
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+from fake_bot_api import FakeBotAPI
+
+BOT_TOKEN = '100000:FAKE-TOKEN-FOR-LOAD-TESTS'
+MODES = ('text', 'text_file', 'v1', 'v2', 'vcf_to_txt', 'merge_txt', 'merge_vcf')
+# bot replies that end a flow: errors and quota rejections
+FAILURE_PREFIXES = ('❌', '⛔')
+
+
+class FlowError(Exception):
+    pass
+
+
+class Session:
+    """One simulated user talking to the bot through the fake API"""
+
+    def __init__(self, api, chat_id, timeout):
+        self.api = api
+        self.chat_id = chat_id
+        self.timeout = timeout
+        # a user's later iterations run in the same chat, so earlier replies must not match
+        self.cursor = len(api.events(chat_id))
+        self.files_received = 0
+
+    async def expect(self, marker, method=None):
+        """Wait for the next bot message or edit containing `marker`; an error or rejection fails the flow"""
+        def matches(event):
+            if event.text.startswith(FAILURE_PREFIXES):
+                return True
+            return marker in event.text and method in (None, event.method)
+        try:
+            index, event = await self.api.wait_for(self.chat_id, matches, self.cursor, self.timeout)
+        except asyncio.TimeoutError:
+            raise FlowError(f"timed out waiting for {marker!r}")
+        self.files_received += sum(1 for e in self.api.events(self.chat_id)[self.cursor:index + 1]
+                                   if e.method == 'sendDocument')
+        self.cursor = index + 1
+        if event.text.startswith(FAILURE_PREFIXES):
+            raise FlowError(event.text.splitlines()[0])
+        return event
+
+    async def menu(self, *buttons):
+        self.api.command(self.chat_id, 'start')
+        await self.expect('Selamat datang')
+        for data, marker in buttons:
+            self.api.callback(self.chat_id, data)
+            await self.expect(marker)
+
+    def upload(self, filename, content):
+        self.api.document(self.chat_id, filename, content.encode('utf-8'))
+
+
+async def flow_text(session, args, seed):
+    await session.menu(('text_to_vcf', 'Format input'))
+    session.api.text(session.chat_id, synthetic.text_input(synthetic.numbers('id', args.numbers, seed)))
+    await session.expect('berhasil dibuat', method='sendDocument')
+
+
+async def flow_text_file(session, args, seed):
+    await session.menu(('text_to_vcf', 'Format input'))
+    session.upload('kontak.txt', synthetic.text_input(synthetic.numbers('id', args.numbers, seed)))
+    await session.expect('berhasil dibuat')
+
+
+async def flow_v1(session, args, seed):
+    await session.menu(('cv_txt_to_vcf', 'Pilih Mode'), ('cv_v1', 'Upload file TXT'))
+    for i in range(args.files):
+        session.upload(f"daftar{i + 1}.txt", synthetic.txt_text(synthetic.numbers('id', args.numbers, seed + i)))
+    await session.expect('Pilih mode output')
+    session.api.callback(session.chat_id, 'output_default')
+    await session.expect('Ketik nama kontak')
+    session.api.text(session.chat_id, 'Pelanggan')
+    await session.expect('SELESAI')
+
+
+async def flow_v2(session, args, seed):
+    await session.menu(('cv_txt_to_vcf', 'Pilih Mode'), ('cv_v2', 'Mode V2'))
+    count = max(args.numbers, args.per_file * args.v2_files)
+    session.upload('daftar.txt', synthetic.txt_text(synthetic.numbers('mixed', count, seed)))
+    await session.expect('Format Input')
+    session.api.text(session.chat_id, f"Pelanggan,hasil,{args.per_file},{args.v2_files},1")
+    await session.expect('V2 BATCH SELESAI')
+
+
+async def flow_vcf_to_txt(session, args, seed):
+    await session.menu(('cv_vcf_to_txt', 'Upload file VCF'))
+    for i in range(args.files):
+        session.upload(f"kontak{i + 1}.vcf", synthetic.vcf_text(synthetic.contacts('id', args.numbers, seed + i)))
+    await session.expect('Pilih Output')
+    session.api.callback(session.chat_id, 'vcf_separate')
+    await session.expect('SELESAI')
+
+
+async def flow_merge_txt(session, args, seed):
+    await session.menu(('merge_files', 'MERGE TXT/VCF'), ('merge_txt', 'MERGE TXT - Upload'))
+    numbers = synthetic.numbers('mixed', args.numbers * max(2, args.files), seed)
+    for i, part in enumerate(synthetic.split_files(numbers, max(2, args.files), seed=seed)):
+        session.upload(f"bagian{i + 1}.txt", '\n'.join(part))
+    await session.expect('Masukkan nama file TXT output')
+    session.api.text(session.chat_id, 'gabungan')
+    await session.expect('MERGE TXT SELESAI')
+
+
+async def flow_merge_vcf(session, args, seed):
+    await session.menu(('merge_files', 'MERGE TXT/VCF'), ('merge_vcf', 'MERGE VCF - Upload'))
+    contacts = synthetic.contacts('id', args.numbers * max(2, args.files), seed)
+    for i, part in enumerate(synthetic.split_files(contacts, max(2, args.files), seed=seed)):
+        session.upload(f"bagian{i + 1}.vcf", synthetic.vcf_text(part))
+    await session.expect('Masukkan nama file VCF output')
+    session.api.text(session.chat_id, 'gabungan')
+    await session.expect('VCF MERGE SELESAI')
+
+
+FLOWS = {
+    'text': flow_text, 'text_file': flow_text_file, 'v1': flow_v1, 'v2': flow_v2, 'vcf_to_txt': flow_vcf_to_txt,
+    'merge_txt': flow_merge_txt, 'merge_vcf': flow_merge_vcf,
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+async def run_user(api, user, args, results):
+    chat_id = 1000 + user
+    for iteration in range(args.iterations):
+        mode = args.modes[(user + iteration) % len(args.modes)]
+        session = Session(api, chat_id, args.timeout)
+        started = time.perf_counter()
+        try:
+            await FLOWS[mode](session, args, seed=user * 1000 + iteration)
+            error = None
+        except FlowError as e:
+            error = str(e)
+        results.append({'user': user, 'mode': mode, 'seconds': time.perf_counter() - started,
+                        'files': session.files_received, 'error': error})
+
+
+async def start_bot(api, log, **extra_env):
+    """Run main.py as a child process polling `api`; returns once it polls for updates"""
+    env = dict(os.environ, BOT_TOKEN=BOT_TOKEN, BOT_API_URL=api.url)
+    env.pop('BOT_API_LOCAL_MODE', None)
+    env.update(extra_env)
+    proc = await asyncio.create_subprocess_exec(sys.executable, 'main.py', cwd=REPO_ROOT, env=env,
+                                                stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while not api.calls.get('getUpdates'):
+        if proc.returncode is not None or time.monotonic() > deadline:
+            raise SystemExit("bot did not start polling; see --bot-log")
+        await asyncio.sleep(0.05)
+    return proc
+
+
+async def stop_bot(proc):
+    proc.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(proc.wait(), 30)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+    # the bot is the only child we wait for, so this is its peak
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+async def run(args):
+    method_latency = {'sendDocument': args.send_latency} if args.send_latency is not None else None
+    api = await FakeBotAPI(latency=args.latency, method_latency=method_latency,
+                           retry_after_rate=args.retry_after_rate, retry_after=args.retry_after).start()
+    with open(args.bot_log, 'wb') if args.bot_log else open(os.devnull, 'wb') as log:
+        proc = await start_bot(api, log)
+        results = []
+        started = time.perf_counter()
+        try:
+            async def delayed_user(user):
+                await asyncio.sleep(user * args.ramp)
+                await run_user(api, user, args, results)
+            await asyncio.gather(*(delayed_user(user) for user in range(args.users)))
+            wall = time.perf_counter() - started
+        finally:
+            peak_rss_mb = await stop_bot(proc)
+    await api.stop()
+    return results, wall, peak_rss_mb, api
+
+
+def report(results, wall, peak_rss_mb, api):
+    ok = [r for r in results if not r['error']]
+    print(f"\n{'mode':<12} {'flows':>6} {'failed':>7} {'p50 s':>8} {'p99 s':>8} {'files':>7}")
+    for mode in sorted({r['mode'] for r in results}):
+        rows = [r for r in results if r['mode'] == mode]
+        times = [r['seconds'] for r in rows if not r['error']]
+        p50, p99 = (percentile(times, 50), percentile(times, 99)) if times else (float('nan'),) * 2
+        print(f"{mode:<12} {len(rows):>6} {len(rows) - len(times):>7} {p50:>8.2f} {p99:>8.2f} "
+              f"{sum(r['files'] for r in rows):>7}")
+    files = sum(r['files'] for r in results)
+    print(f"\n{len(ok)}/{len(results)} flows in {wall:.1f}s: {len(ok) / wall:.2f} flows/s, {files / wall:.1f} files/s")
+    if ok:
+        times = [r['seconds'] for r in ok]
+        print(f"completion p50 {percentile(times, 50):.2f}s, p99 {percentile(times, 99):.2f}s")
+    print(f"bot peak RSS {peak_rss_mb:.1f} MB, 429 responses {api.flood_refusals}")
+    for error in sorted({r['error'] for r in results if r['error']}):
+        print(f"  failed: {error}")
+    return {'wall_seconds': wall, 'flows_per_s': len(ok) / wall, 'files_per_s': files / wall,
+            'peak_rss_mb': peak_rss_mb, 'retry_after_responses': api.flood_refusals, 'calls': api.calls,
+            'flows': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10, help="concurrent simulated users")
+    parser.add_argument('--iterations', type=int, default=1, help="flows each user runs one after another")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES),
+                        help="flows to run, assigned to users round-robin")
+    parser.add_argument('--ramp', type=float, default=0.1, help="seconds between user start times")
+    parser.add_argument('--numbers', type=int, default=1000, help="numbers or contacts per uploaded file")
+    parser.add_argument('--files', type=int, default=2, help="files uploaded in V1, VCF TO TXT and merge flows")
+    parser.add_argument('--v2-files', type=int, default=20, help="VCF files requested in the V2 flow")
+    parser.add_argument('--per-file', type=int, default=50, help="contacts per file in the V2 flow")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every Bot API call")
+    parser.add_argument('--send-latency', type=float, help="seconds added to sendDocument instead of --latency")
+    parser.add_argument('--retry-after-rate', type=float, default=0.0, help="fraction of sends answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after seconds in 429 answers")
+    parser.add_argument('--timeout', type=float, default=600.0, help="seconds one flow step may wait")
+    parser.add_argument('--bot-log', help="write the bot's output to this file")
+    parser.add_argument('--output', help="write the full report as JSON")
+    args = parser.parse_args()
+
+    print(f"{args.users} users x {args.iterations} flows ({', '.join(args.modes)}), {args.numbers} numbers per file")
+    results, wall, peak_rss_mb, api = asyncio.run(run(args))
+    summary = report(results, wall, peak_rss_mb, api)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
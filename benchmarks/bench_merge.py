@@ -0,0 +1,66 @@
+"""Peak RSS and throughput of the in-memory vs spill-to-disk TXT merge.
+
+Each mode runs in a fresh child process so ru_maxrss reflects only that merge.
+Run from the repo root:  python benchmarks/bench_merge.py [--files 10 --per-file 500000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import configure, iter_merge_txt_phones
+
+
+def phone_lists(files, per_file, overlap, seed=0):
+    """Yield one synthetic Indonesian phone list per "file", `overlap` of them repeated across files"""
+    rng = random.Random(seed)
+    pool_size = int(files * per_file * (1 - overlap)) or 1
+    for _ in range(files):
+        yield ['08' + str(10**9 + rng.randrange(pool_size)) for _ in range(per_file)]
+
+
+def run_child(mode, files, per_file, overlap, spill_threshold):
+    configure(merge_spill_threshold=0 if mode == 'memory' else spill_threshold,
+              merge_run_size=max(1, spill_threshold))
+    start = time.perf_counter()
+    count = sum(1 for _ in iter_merge_txt_phones(phone_lists(files, per_file, overlap)))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'unique': count, 'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024,
+                      'numbers_per_s': files * per_file / elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=10)
+    parser.add_argument('--per-file', type=int, default=500_000)
+    parser.add_argument('--overlap', type=float, default=0.2, help="fraction of numbers repeated across files")
+    parser.add_argument('--spill-threshold', type=int, default=250_000)
+    parser.add_argument('--child', choices=['memory', 'external'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.files, args.per_file, args.overlap, args.spill_threshold)
+        return
+
+    print(f"{args.files} files x {args.per_file} numbers, spill threshold {args.spill_threshold}")
+    print(f"{'mode':<10} {'unique':>10} {'seconds':>8} {'M numbers/s':>12} {'peak RSS MB':>12}")
+    for mode in ('memory', 'external'):
+        out = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--files', str(args.files), '--per-file', str(args.per_file),
+             '--overlap', str(args.overlap), '--spill-threshold', str(args.spill_threshold)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out)
+        print(f"{r['mode']:<10} {r['unique']:>10} {r['seconds']:>8.2f} {r['numbers_per_s'] / 1e6:>12.2f} "
+              f"{r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare the trie-based normalizer against the legacy ad-hoc +62 rules.
+
+Run from the repo root:  python benchmarks/bench_normalize.py [--count 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import normalize_numbers, normalize_phone
+
+
+def legacy_normalize_phone(phone):
+    """normalize_phone as it was before the trie engine"""
+    phone = phone.strip()
+    if not phone.startswith('+'):
+        if phone.startswith('0'):
+            phone = '+62' + phone[1:]
+        elif phone.startswith('62'):
+            phone = '+' + phone
+        else:
+            phone = '+62' + phone if len(phone) >= 10 and not phone.startswith('1') else '+' + phone
+    return phone
+
+
+def synthetic_numbers(count, seed=0):
+    """Mixed list shaped like our uploads: mostly Indonesian, some MY/IN/SG/US"""
+    rng = random.Random(seed)
+    makers = [
+        (50, lambda: '08' + str(rng.randrange(10**8, 10**11))),
+        (15, lambda: '628' + str(rng.randrange(10**8, 10**10))),
+        (10, lambda: '+628' + str(rng.randrange(10**8, 10**10))),
+        (8, lambda: '601' + str(rng.randrange(10**7, 10**9))),
+        (7, lambda: '91' + rng.choice('6789') + str(rng.randrange(10**8, 10**9))),
+        (5, lambda: '+65' + rng.choice('689') + str(rng.randrange(10**6, 10**7))),
+        (5, lambda: '1' + str(rng.randrange(2 * 10**9, 10**10))),
+    ]
+    weights = [w for w, _ in makers]
+    chosen = rng.choices([m for _, m in makers], weights=weights, k=count)
+    return [make() for make in chosen]
+
+
+def bench(label, fn, numbers):
+    start = time.perf_counter()
+    result = fn(numbers)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.3f}s  {len(numbers) / elapsed / 1e6:6.2f} M numbers/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    numbers = synthetic_numbers(args.count)
+    legacy = bench('legacy normalize_phone (loop)', lambda ns: [legacy_normalize_phone(n) for n in ns], numbers)
+    scalar = bench('normalize_phone (loop)', lambda ns: [normalize_phone(n) for n in ns], numbers)
+    parsed = bench('normalize_numbers (batch)', normalize_numbers, numbers)
+
+    numbers_out, flags = parsed
+    assert scalar == numbers_out
+    changed = sum(1 for old, new in zip(legacy, scalar) if old != new)
+    invalid = flags.count(False)
+    print(f"\n{changed} of {len(numbers)} numbers differ from legacy output, {invalid} flagged invalid")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Replay a recorded traffic profile (TRAFFIC_RECORD_PATH, see recorder.py) against the bot and a fake Bot API.
+
+Each recorded update is sent again at its original offset (divided by --speed)
+from its own chat: buttons and commands as they were, documents as synthetic
+files of the recorded type and size, text rebuilt from its recorded shape. The
+bot records the replayed run too, so recorded and replayed handler times can
+be compared per update kind and mode. Replay is deterministic for a given
+recording and --seed.
+Run from the repo root:
+    python benchmarks/bench_replay.py traffic.jsonl [--speed 2 --latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import synthetic
+from bench_load import FAILURE_PREFIXES, percentile, start_bot, stop_bot
+from fake_bot_api import FakeBotAPI
+
+VCF_MODES = ('vcf_to_txt', 'merge_vcf')
+
+
+def load_recording(path):
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted((r for r in records if 'kind' in r), key=lambda r: r['t'])
+
+
+def shape_text(shape, seed):
+    """Text with the recorded line structure: masks as recorded, 'p' lines as synthetic numbers"""
+    numbers = iter(synthetic.indonesian_numbers(sum(n for token, n in shape if token == 'p'), seed))
+    lines = []
+    for token, count in shape:
+        for _ in range(count):
+            lines.append(next(numbers) if token == 'p' else '' if token == 'b' else token)
+    return '\n'.join(lines)
+
+
+def send(api, chat_id, record, seed):
+    kind = record['kind']
+    if kind == 'command':
+        api.command(chat_id, record['command'])
+    elif kind == 'callback':
+        api.callback(chat_id, record['data'])
+    elif kind == 'document':
+        ext = record['ext'] or 'txt'
+        content = synthetic.upload_of_size(ext, record['size'], vcf=record.get('mode') in VCF_MODES, seed=seed)
+        api.document(chat_id, f"replay{seed}.{ext}", content)
+    elif kind == 'text':
+        api.text(chat_id, shape_text(record['shape'], seed))
+        return True
+    else:
+        return False
+    return True
+
+
+async def reply_latency(api, chat_id, since, sent_at, timeout):
+    """Seconds until the bot's first message or edit in the chat after an update, None if it never came"""
+    try:
+        _, event = await api.wait_for(chat_id, lambda e: True, since, timeout)
+    except asyncio.TimeoutError:
+        return None
+    return event.at - sent_at
+
+
+async def replay(records, args, record_path):
+    api = await FakeBotAPI(latency=args.latency, seed=args.seed).start()
+    chats = {}
+    waits = []
+    with open(args.bot_log, 'wb') if args.bot_log else open(os.devnull, 'wb') as log:
+        proc = await start_bot(api, log, TRAFFIC_RECORD_PATH=record_path)
+        started = time.perf_counter()
+        try:
+            for seed, record in enumerate(records):
+                delay = started + record['t'] / args.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                chat_id = chats.setdefault(record['chat'], 1000 + len(chats))
+                since = len(api.events(chat_id))
+                sent_at = time.perf_counter()
+                if send(api, chat_id, record, args.seed * 100003 + seed):
+                    key = f"{record['kind']}:{record.get('mode') or 'unknown'}"
+                    waits.append((key, asyncio.create_task(reply_latency(api, chat_id, since, sent_at, args.timeout))))
+            latencies = [(key, await task) for key, task in waits]
+            # let the last handlers finish writing their records
+            await asyncio.sleep(args.settle)
+            wall = time.perf_counter() - started
+        finally:
+            peak_rss_mb = await stop_bot(proc)
+    await api.stop()
+    errors = sum(1 for chat_id in chats.values() for e in api.events(chat_id) if e.text.startswith(FAILURE_PREFIXES))
+    return latencies, wall, peak_rss_mb, errors
+
+
+def handler_times(records):
+    times = {}
+    for r in records:
+        times.setdefault(f"{r['kind']}:{r.get('mode') or 'unknown'}", []).append(r['handler_ms'])
+    return times
+
+
+def _p(values, pct):
+    return f"{percentile(values, pct):.0f}" if values else '-'
+
+
+def report(recorded, replayed, latencies, wall, peak_rss_mb, errors):
+    recorded_ms, replayed_ms = handler_times(recorded), handler_times(replayed)
+    reply_s = {}
+    for key, seconds in latencies:
+        if seconds is not None:
+            reply_s.setdefault(key, []).append(seconds * 1000)
+    print(f"\n{'update':<28} {'count':>6} {'rec p50':>8} {'rec p99':>8} {'run p50':>8} {'run p99':>8} "
+          f"{'reply p50':>10} {'reply p99':>10}  (ms)")
+    for key in sorted(recorded_ms):
+        rec, run, reply = recorded_ms[key], replayed_ms.get(key, []), reply_s.get(key, [])
+        print(f"{key:<28} {len(rec):>6} {_p(rec, 50):>8} {_p(rec, 99):>8} {_p(run, 50):>8} {_p(run, 99):>8} "
+              f"{_p(reply, 50):>10} {_p(reply, 99):>10}")
+    unanswered = sum(1 for _, seconds in latencies if seconds is None)
+    print(f"\n{len(recorded)} updates from {len({r['chat'] for r in recorded})} chats replayed in {wall:.1f}s "
+          f"(recorded span {recorded[-1]['t'] if recorded else 0:.1f}s)")
+    print(f"bot peak RSS {peak_rss_mb:.1f} MB, error or rejection replies {errors}, updates without reply {unanswered}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording', help="JSON lines written by the bot with TRAFFIC_RECORD_PATH set")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay this many times faster than recorded; the bot's fixed upload wait does not "
+                             "shrink, so high speeds can send input before the bot asks for it")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every Bot API call")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120.0, help="seconds to wait for a reply to one update")
+    parser.add_argument('--settle', type=float, default=1.0, help="seconds to wait after the last reply")
+    parser.add_argument('--bot-log', help="write the bot's output to this file")
+    args = parser.parse_args()
+
+    recorded = load_recording(args.recording)
+    if not recorded:
+        raise SystemExit(f"no updates in {args.recording}")
+    with tempfile.TemporaryDirectory() as tmp:
+        record_path = os.path.join(tmp, 'replayed.jsonl')
+        latencies, wall, peak_rss_mb, errors = asyncio.run(replay(recorded, args, record_path))
+        replayed = load_recording(record_path)
+    report(recorded, replayed, latencies, wall, peak_rss_mb, errors)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Measure cold import time of the conversion engine vs the full bot module.
+
+Run from the repo root:  python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    'engine': 'import engine',
+    'main (bot)': 'import main',
+}
+
+
+def time_import(statement, runs):
+    """Return wall-clock seconds for `runs` fresh interpreters executing `statement`"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import('pass', args.runs))
+    print(f"{'target':<12} {'median ms':>10} {'min ms':>8} {'over bare python ms':>20}")
+    print(f"{'python':<12} {baseline * 1000:>10.1f}")
+    for label, statement in TARGETS.items():
+        try:
+            samples = time_import(statement, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{label:<12} {'import failed':>10}")
+            continue
+        median = statistics.median(samples)
+        print(f"{label:<12} {median * 1000:>10.1f} {min(samples) * 1000:>8.1f} {(median - baseline) * 1000:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Time and peak memory of the conversion hot paths, saved as JSON and checked against a baseline.
+
+Every case runs on Indonesian-only and mixed-country data at each size. Time is
+the best of --repeat runs; peak memory is the tracemalloc peak of one extra run
+(so tracing overhead never counts towards time).
+Run from the repo root:
+    python benchmarks/bench_suite.py [--sizes 1000 100000 1000000] [--output results.json]
+    python benchmarks/bench_suite.py --baseline results.json   # exit 1 on regression
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import (
+    create_txt_from_vcf, create_vcf_content, create_vcf_from_phones, extract_phone_numbers, merge_txt_files,
+    merge_vcf_files, normalize_phone_list_format, parse_vcf_content, split_phones_into_batches
+)
+
+import synthetic
+
+MERGE_FILES = 10
+# absolute slack on top of --time-tolerance, so sub-millisecond cases do not flag on timer noise
+TIME_SLACK = 0.002
+
+
+def _merge_txt_input(dataset, size):
+    files = synthetic.split_files(synthetic.numbers(dataset, size), MERGE_FILES)
+    return ([{'filename': f'{i}.txt', 'phone_numbers': phones} for i, phones in enumerate(files)],)
+
+
+def _merge_vcf_input(dataset, size):
+    files = synthetic.split_files(synthetic.contacts(dataset, size), MERGE_FILES)
+    return ([{'filename': f'{i}.vcf', 'contacts': contacts} for i, contacts in enumerate(files)],)
+
+
+# case name -> (build the call arguments for (dataset, size), function under test)
+CASES = {
+    'extract_phone_numbers': (lambda d, n: (synthetic.txt_text(synthetic.numbers(d, n)),), extract_phone_numbers),
+    'parse_vcf_content': (lambda d, n: (synthetic.vcf_text(synthetic.contacts(d, n)),), parse_vcf_content),
+    'create_vcf_content': (lambda d, n: (synthetic.text_input(synthetic.numbers(d, n)),), create_vcf_content),
+    'create_vcf_from_phones': (lambda d, n: (synthetic.numbers(d, n), 'Kontak'), create_vcf_from_phones),
+    'create_txt_from_vcf': (lambda d, n: (synthetic.contacts(d, n),), create_txt_from_vcf),
+    # a generator: the case consumes it, so the peak is the merge's own state, not a result list
+    'merge_txt_files': (_merge_txt_input, lambda files: sum(1 for _ in merge_txt_files(files))),
+    'merge_vcf_files': (_merge_vcf_input, merge_vcf_files),
+    'normalize_phone_list_format': (lambda d, n: (synthetic.numbers(d, n),), normalize_phone_list_format),
+    'split_phones_into_batches': (lambda d, n: (synthetic.numbers(d, n), 100, max(1, n // 100)),
+                                  split_phones_into_batches),
+}
+
+
+def measure(fn, args, repeat):
+    """(best seconds over `repeat` runs, tracemalloc peak bytes of one more run)"""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(cases, datasets, sizes, repeat):
+    results = []
+    for size in sizes:
+        for dataset in datasets:
+            for name in cases:
+                build, fn = CASES[name]
+                args = build(dataset, size)
+                seconds, peak = measure(fn, args, repeat if size < 1_000_000 else 1)
+                result = {'case': name, 'dataset': dataset, 'size': size, 'seconds': seconds, 'peak_bytes': peak}
+                results.append(result)
+                print(f"{name:<28} {dataset:<6} {size:>9} {seconds:>9.4f}s {peak / 2**20:>9.1f} MiB", flush=True)
+    return results
+
+
+def _key(result):
+    return result['case'], result['dataset'], result['size']
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """Regression messages for results slower or hungrier than the baseline beyond the tolerances"""
+    previous = {_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        label = '{} {} {}'.format(*_key(result))
+        if result['seconds'] > old['seconds'] * (1 + time_tolerance) + TIME_SLACK:
+            regressions.append(f"{label}: time {old['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        if result['peak_bytes'] > old['peak_bytes'] * (1 + memory_tolerance):
+            regressions.append(f"{label}: peak {old['peak_bytes'] / 2**20:.1f} -> {result['peak_bytes'] / 2**20:.1f} MiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000])
+    parser.add_argument('--datasets', nargs='+', choices=synthetic.DATASETS, default=list(synthetic.DATASETS))
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case below 1M entries (best is kept)")
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--baseline', help="results JSON from an earlier run to compare against")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help="allowed peak memory growth")
+    args = parser.parse_args()
+
+    print(f"{'case':<28} {'data':<6} {'size':>9} {'time':>10} {'peak':>13}")
+    results = run(args.cases, args.datasets, args.sizes, args.repeat)
+
+    if args.output:
+        report = {'python': platform.python_version(), 'machine': platform.machine(),
+                  'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
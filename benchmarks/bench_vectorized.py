@@ -0,0 +1,45 @@
+"""Compare the NumPy batch normalizer with the scalar per-number loop.
+
+Run from the repo root:  python benchmarks/bench_vectorized.py [--sizes 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import configure, normalize_phone_batch, normalize_phone_list_format
+from engine.vectorized import available
+
+from bench_normalize import synthetic_numbers
+
+
+def timed(fn, numbers):
+    start = time.perf_counter()
+    result = fn(numbers)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    if not available():
+        sys.exit("numpy is not installed")
+
+    print(f"{'function':<30} {'size':>9} {'scalar s':>9} {'numpy s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        numbers = synthetic_numbers(size)
+        for label, fn in (('normalize_phone_batch', normalize_phone_batch),
+                          ('normalize_phone_list_format', normalize_phone_list_format)):
+            configure(vectorize_threshold=0)
+            scalar_s, scalar = timed(fn, numbers)
+            configure(vectorize_threshold=1)
+            numpy_s, vector = timed(fn, numbers)
+            assert scalar == vector, f"{label}: vectorized output differs"
+            print(f"{label:<30} {size:>9} {scalar_s:>9.3f} {numpy_s:>9.3f} {scalar_s / numpy_s:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""A local stand-in for the Telegram Bot API, for load tests that run the real bot.
+
+Point the bot at it with BOT_API_URL=http://127.0.0.1:<port>. It implements just
+what the bot uses: getMe, deleteWebhook, long-polled getUpdates, getFile plus
+file downloads, sendMessage, sendDocument, editMessageText, deleteMessage and
+answerCallbackQuery; any other method answers `true`. Tests queue updates with
+the helpers (`command`, `text`, `callback`, `document`) and wait for the bot's
+replies with `wait_for`.
+
+Every method can be slowed down by a fixed latency, and outgoing calls can be
+refused with 429 "retry after" at a given rate to see how the bot copes with
+Telegram's flood control.
+
+With `local_dir` set it behaves like a local-mode Bot API server: uploads are
+also written to that directory and getFile returns their absolute path, which a
+bot started with BOT_API_LOCAL_MODE reads from disk instead of downloading.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import time
+import urllib.parse
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'Fake VCF Bot', 'username': 'fake_vcf_bot'}
+# methods that can be answered with 429 when --retry-after-rate is set; polling and file access never are
+FLOOD_METHODS = {'sendMessage', 'sendDocument', 'editMessageText', 'deleteMessage', 'answerCallbackQuery'}
+
+_DISPOSITION_PARAM = re.compile(r'(\w+)="([^"]*)"')
+
+
+class BotEvent:
+    """One call the bot made towards a chat"""
+    __slots__ = ('method', 'chat_id', 'at', 'text', 'filename', 'size', 'message_id', 'file_id')
+
+    def __init__(self, method, chat_id, text=None, filename=None, size=0, message_id=None, file_id=None):
+        self.method = method
+        self.chat_id = chat_id
+        self.at = time.perf_counter()
+        self.text = text or ''
+        self.filename = filename
+        self.size = size
+        self.message_id = message_id
+        self.file_id = file_id
+
+
+def parse_form(content_type, body):
+    """Request parameters as `{name: str}` and uploads as `{name: (filename, bytes)}`"""
+    if content_type.startswith('multipart/form-data'):
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+        fields, files = {}, {}
+        for part in body.split(b'--' + boundary)[1:-1]:
+            head, _, content = part[2:-2].partition(b'\r\n\r\n')
+            disposition = next((line for line in head.decode('utf-8').split('\r\n')
+                                if line.lower().startswith('content-disposition')), '')
+            params = dict(_DISPOSITION_PARAM.findall(disposition))
+            if 'filename' in params:
+                files[params['name']] = (params['filename'], content)
+            else:
+                fields[params['name']] = content.decode('utf-8')
+        return fields, files
+    return {k: v[-1] for k, v in urllib.parse.parse_qs(body.decode('utf-8')).items()}, {}
+
+
+def _json_param(fields, name, default=None):
+    """PTB sends every parameter JSON encoded, except plain strings"""
+    if name not in fields:
+        return default
+    try:
+        return json.loads(fields[name])
+    except ValueError:
+        return fields[name]
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0, method_latency=None, retry_after_rate=0.0, retry_after=1, seed=0,
+                 keep_sent=False, local_dir=None):
+        self.latency = latency
+        # keep sent documents in `files` (under the event's file_id) so tests can read what the bot wrote
+        self.keep_sent = keep_sent
+        self.local_dir = local_dir
+        self.method_latency = method_latency or {}
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.files = {}
+        self.calls = {}
+        self.downloads = 0
+        self.flood_refusals = 0
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+        self._events = {}
+        self._changed = asyncio.Condition()
+        self._server = None
+        self.port = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    # --- updates sent to the bot ---
+
+    def _user(self, chat_id):
+        return {'id': chat_id, 'is_bot': False, 'first_name': f"user{chat_id}"}
+
+    def _message(self, chat_id, **fields):
+        return {'message_id': next(self._message_ids), 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'}, 'from': self._user(chat_id), **fields}
+
+    def _push(self, **payload):
+        self._updates.append({'update_id': next(self._update_ids), **payload})
+        self._new_update.set()
+
+    def command(self, chat_id, command, args=''):
+        text = f"/{command} {args}".strip()
+        self._push(message=self._message(chat_id, text=text,
+                                         entities=[{'type': 'bot_command', 'offset': 0, 'length': len(command) + 1}]))
+
+    def text(self, chat_id, text):
+        self._push(message=self._message(chat_id, text=text))
+
+    def callback(self, chat_id, data, message_id=None):
+        """Press an inline button on the bot message `message_id` (default: the bot's latest message)"""
+        if message_id is None:
+            message_id = self.last_message_id(chat_id) or 0
+        message = {'message_id': message_id, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'},
+                   'from': BOT_USER, 'text': ''}
+        self._push(callback_query={'id': str(next(self._update_ids)), 'from': self._user(chat_id),
+                                   'message': message, 'chat_instance': str(chat_id), 'data': data})
+
+    def document(self, chat_id, filename, content, caption=None):
+        file_id = f"file{next(self._file_ids)}"
+        self.files[file_id] = content
+        if self.local_dir:
+            with open(os.path.join(self.local_dir, file_id), 'wb') as f:
+                f.write(content)
+        document = {'file_id': file_id, 'file_unique_id': file_id, 'file_name': filename, 'file_size': len(content)}
+        fields = {'document': document}
+        if caption:
+            fields['caption'] = caption
+        self._push(message=self._message(chat_id, **fields))
+
+    # --- what the bot sent back ---
+
+    def events(self, chat_id):
+        return self._events.get(chat_id, [])
+
+    def last_message_id(self, chat_id):
+        return next((e.message_id for e in reversed(self.events(chat_id)) if e.method == 'sendMessage'), None)
+
+    async def wait_for(self, chat_id, predicate, since=0, timeout=60.0):
+        """First event for `chat_id` at index >= `since` matching `predicate`; raises TimeoutError"""
+        async def first_match():
+            async with self._changed:
+                while True:
+                    events = self.events(chat_id)
+                    for index in range(since, len(events)):
+                        if predicate(events[index]):
+                            return index, events[index]
+                    await self._changed.wait()
+        return await asyncio.wait_for(first_match(), timeout)
+
+    async def _record(self, event):
+        self._events.setdefault(event.chat_id, []).append(event)
+        async with self._changed:
+            self._changed.notify_all()
+
+    # --- HTTP ---
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                verb, path, _ = request_line.split(' ', 2)
+                headers = {k.strip().lower(): v.strip() for k, _, v in
+                           (line.partition(':') for line in header_lines if line)}
+                if headers.get('transfer-encoding', '').lower() == 'chunked':
+                    body = await self._read_chunked(reader)
+                else:
+                    body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, content_type, payload = await self._dispatch(verb, path, headers, body)
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode() + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # client gone, or the loop is shutting down with a long poll still open
+            pass
+        finally:
+            writer.close()
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if not size:
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def _dispatch(self, verb, path, headers, body):
+        path = urllib.parse.urlsplit(path).path
+        if path.startswith('/file/bot'):
+            file_id = path.rsplit('/', 1)[1]
+            if file_id not in self.files:
+                return '404 Not Found', 'text/plain', b'not found'
+            self.downloads += 1
+            await self._delay('download')
+            return '200 OK', 'application/octet-stream', bytes(self.files[file_id])
+
+        method = path.rsplit('/', 1)[1]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        fields, files = parse_form(headers.get('content-type', ''), body)
+        await self._delay(method)
+        if method in FLOOD_METHODS and self.retry_after_rate and self.rng.random() < self.retry_after_rate:
+            self.flood_refusals += 1
+            return '429 Too Many Requests', 'application/json', json.dumps({
+                'ok': False, 'error_code': 429, 'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after},
+            }).encode()
+        result = await self._result(method, fields, files)
+        return '200 OK', 'application/json', json.dumps({'ok': True, 'result': result}).encode()
+
+    async def _delay(self, method):
+        delay = self.method_latency.get(method, self.latency)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def _result(self, method, fields, files):
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return await self._get_updates(_json_param(fields, 'offset', 0), _json_param(fields, 'timeout', 0))
+        if method == 'getFile':
+            file_id = fields['file_id']
+            file_path = os.path.join(self.local_dir, file_id) if self.local_dir else file_id
+            return {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(self.files.get(file_id, b'')),
+                    'file_path': file_path}
+
+        chat_id = _json_param(fields, 'chat_id')
+        if method in ('sendMessage', 'sendDocument'):
+            message = {'message_id': next(self._message_ids), 'date': int(time.time()),
+                       'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER}
+            if method == 'sendMessage':
+                message['text'] = fields.get('text', '')
+                event = BotEvent(method, chat_id, text=message['text'], message_id=message['message_id'])
+            else:
+                filename, content = files.get('document', (fields.get('document'), b''))
+                message['document'] = {'file_id': f"out{message['message_id']}", 'file_unique_id': 'out',
+                                       'file_name': filename, 'file_size': len(content)}
+                file_id = message['document']['file_id']
+                if self.keep_sent:
+                    self.files[file_id] = content
+                event = BotEvent(method, chat_id, text=fields.get('caption'), filename=filename, size=len(content),
+                                 message_id=message['message_id'], file_id=file_id)
+            await self._record(event)
+            return message
+        if method == 'editMessageText':
+            await self._record(BotEvent(method, chat_id, text=fields.get('text'),
+                                        message_id=_json_param(fields, 'message_id')))
+            return {'message_id': _json_param(fields, 'message_id'), 'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER, 'text': fields.get('text', '')}
+        return True
+
+    async def _get_updates(self, offset, timeout):
+        self._updates = [u for u in self._updates if u['update_id'] >= offset]
+        if not self._updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:100]
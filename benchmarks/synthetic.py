@@ -0,0 +1,104 @@
+"""Synthetic uploads for the benchmarks: Indonesian-only and mixed-country numbers, TXT, VCF and text input.
+
+Everything is seeded, so a given (dataset, size, seed) always produces the same data.
+"""
+import io
+import random
+
+from bench_normalize import synthetic_numbers
+
+DATASETS = ('id', 'mixed')
+
+
+def indonesian_numbers(count, seed=0):
+    """Mobile numbers written the ways users send them: 08..., 628..., +628..."""
+    rng = random.Random(seed)
+    makers = [
+        (70, lambda: '08' + str(rng.randrange(10**8, 10**11))),
+        (20, lambda: '628' + str(rng.randrange(10**8, 10**10))),
+        (10, lambda: '+628' + str(rng.randrange(10**8, 10**10))),
+    ]
+    chosen = rng.choices([m for _, m in makers], weights=[w for w, _ in makers], k=count)
+    return [make() for make in chosen]
+
+
+def numbers(dataset, count, seed=0):
+    if dataset == 'id':
+        return indonesian_numbers(count, seed)
+    if dataset == 'mixed':
+        return synthetic_numbers(count, seed)
+    raise ValueError(f"unknown dataset {dataset!r}, expected one of {DATASETS}")
+
+
+def contacts(dataset, count, seed=0):
+    """Contact dicts with short Indonesian-style names"""
+    rng = random.Random(seed + 1)
+    first = ['Budi', 'Siti', 'Agus', 'Dewi', 'Rina', 'Andi', 'Putri', 'Joko', 'Wati', 'Eko']
+    last = ['Santoso', 'Wijaya', 'Lestari', 'Saputra', 'Hidayat', 'Kurniawan', 'Pratama', 'Sari']
+    return [{'name': f"{rng.choice(first)} {rng.choice(last)} {i}", 'phone': phone}
+            for i, phone in enumerate(numbers(dataset, count, seed))]
+
+
+def txt_text(phones, seed=0):
+    """TXT upload body: one number per line, with a little noise around some of them"""
+    rng = random.Random(seed + 2)
+    lines = []
+    for phone in phones:
+        roll = rng.random()
+        if roll < 0.05:
+            lines.append(f"WA: {phone}")
+        elif roll < 0.08:
+            lines.append('')
+        lines.append(phone)
+    return '\n'.join(lines)
+
+
+def vcf_text(contact_list):
+    return ''.join(f"BEGIN:VCARD\nVERSION:3.0\nFN:{c['name']}\nTEL:{c['phone']}\nEND:VCARD\n" for c in contact_list)
+
+
+def text_input(phones, per_contact=10):
+    """TEXT TO VCF message: file name, then blocks of a contact name followed by its numbers"""
+    blocks = [f"kontak {i // per_contact}\n" + '\n'.join(phones[i:i + per_contact])
+              for i in range(0, len(phones), per_contact)]
+    return 'hasil\n\n' + '\n\n'.join(blocks)
+
+
+def split_files(items, files, overlap=0.2, seed=0):
+    """Spread `items` over `files` uploads, repeating `overlap` of them in a second file"""
+    rng = random.Random(seed + 3)
+    buckets = [[] for _ in range(files)]
+    for i, item in enumerate(items):
+        buckets[i % files].append(item)
+        if rng.random() < overlap:
+            buckets[rng.randrange(files)].append(item)
+    return buckets
+
+
+def upload_of_size(ext, size, vcf=False, seed=0):
+    """Bytes of an upload close to `size` bytes: TXT/CSV/VCF text, an XLSX sheet, or a stored ZIP holding a
+    TXT (or VCF when `vcf`) member, so parsing cost follows the real file size"""
+    if ext == 'zip':
+        import zipfile
+        buffer = io.BytesIO()
+        member_ext = 'vcf' if vcf else 'txt'
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            archive.writestr(f"data.{member_ext}", upload_of_size(member_ext, max(0, size - 120), seed=seed))
+        return buffer.getvalue()
+    if ext == 'xlsx':
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['nama', 'telepon'])
+        for contact in contacts('id', max(1, size // 12), seed):
+            sheet.append([contact['name'], contact['phone']])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue()
+    if ext == 'vcf' or (vcf and ext not in ('txt', 'csv')):
+        text = vcf_text(contacts('id', max(1, size // 70), seed))
+    elif ext == 'csv':
+        text = 'nama,telepon\n' + '\n'.join(f"{c['name']},{c['phone']}" for c in contacts('id', max(1, size // 28), seed))
+    else:
+        text = txt_text(indonesian_numbers(max(1, size // 13), seed), seed)
+    return text.encode('utf-8')[:size] if size else b''
@@ -0,0 +1,345 @@
+"""Offline bulk conversions using the same engine as the Telegram bot.
+
+Examples:
+    python cli.py txt2vcf data/*.txt -o out --name pudidi
+    python cli.py txt2vcf data/ -o out --name pudidi --custom amanai1
+    python cli.py txt2vcf data/ -o out --v2 pudidi,amanai,50,20,1
+    python cli.py vcf2txt exports/ -o out [--merge all.txt]
+    python cli.py merge-txt data/ -o out --filename merged.txt
+    python cli.py merge-vcf exports/ -o out --filename merged.vcf
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (
+    configure, decode_file_content, extract_phone_numbers, parse_vcf_content, normalize_phone_batch,
+    iter_vcf_from_phones, iter_vcf_from_contacts, iter_txt_from_vcf, iter_merge_txt_phones, iter_merge_vcf_contacts,
+    generate_custom_filenames, split_phones_into_batches, exclude_exported, claim_exported, claim_exported_contacts,
+    compact_exported, get_config, iter_lines
+)
+
+
+class JobStats:
+    """Counters for the throughput summary"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files_in = 0
+        self.files_out = 0
+        self.skipped = 0
+        self.contacts = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.excluded = 0
+
+    def add(self, contacts=0, bytes_in=0, bytes_out=0, files_in=0, files_out=0, excluded=0):
+        self.contacts += contacts
+        self.excluded += excluded
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.files_in += files_in
+        self.files_out += files_out
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        mb_in = self.bytes_in / (1024 * 1024)
+        return (
+            f"files in: {self.files_in} ({self.skipped} skipped), files out: {self.files_out}\n"
+            f"contacts: {self.contacts}, read: {mb_in:.2f} MB, written: {self.bytes_out / (1024 * 1024):.2f} MB\n"
+            f"excluded (already exported): {self.excluded}\n"
+            f"elapsed: {elapsed:.2f}s, {self.files_in / elapsed:.1f} files/s, "
+            f"{self.contacts / elapsed:.0f} contacts/s, {mb_in / elapsed:.2f} MB/s"
+        )
+
+
+def expand_inputs(patterns, extension, recursive=False):
+    """Resolve files, directories and glob patterns into a sorted list of unique paths"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            sub = os.path.join(pattern, '**', '*') if recursive else os.path.join(pattern, '*')
+            candidates = glob.glob(sub, recursive=recursive)
+        elif glob.has_magic(pattern):
+            candidates = glob.glob(pattern, recursive=True)
+        else:
+            candidates = [pattern]
+        paths.extend(p for p in candidates if os.path.isfile(p) and p.lower().endswith(extension))
+    return sorted(dict.fromkeys(paths))
+
+
+def _init_worker(overrides):
+    if overrides:
+        configure(**overrides)
+
+
+def _read_text(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return decode_file_content(data), len(data)
+
+
+def _write_lines(out_path, chunks):
+    """Stream string chunks to disk and return the number of bytes written"""
+    written = 0
+    with open(out_path, 'wb') as f:
+        for chunk in chunks:
+            # encoded once: the bytes written are the bytes counted
+            data = chunk.encode('utf-8')
+            f.write(data)
+            written += len(data)
+    return written
+
+
+def _parse_txt(path):
+    text, size = _read_text(path)
+    return path, extract_phone_numbers(text) if text else [], size
+
+
+def _parse_vcf(path):
+    text, size = _read_text(path)
+    return path, parse_vcf_content(text) if text else [], size
+
+
+def _txt_to_vcf(task):
+    """V1: one TXT in, one VCF out (phones normalized per file like the bot)"""
+    path, out_path, contact_name = task
+    _, phones, size = _parse_txt(path)
+    # claimed under the index lock, so parallel workers never both write a number
+    phones, excluded = claim_exported(normalize_phone_batch(phones))
+    if not phones:
+        return 0, size, 0, 0, excluded
+    written = _write_lines(out_path, iter_vcf_from_phones(phones, contact_name, normalized=True))
+    return len(phones), size, written, 1, excluded
+
+
+def _vcf_to_txt(task):
+    path, out_path = task
+    _, contacts, size = _parse_vcf(path)
+    if not contacts:
+        return 0, size, 0, 0, 0
+    return len(contacts), size, _write_lines(out_path, iter_lines(iter_txt_from_vcf(contacts))), 1, 0
+
+
+def _write_vcf_batch(task):
+    out_path, batch, contact_name = task
+    written = _write_lines(out_path, iter_vcf_from_phones(batch, contact_name, normalized=True))
+    return len(batch), 0, written, 1, 0
+
+
+def _chunksize(count, jobs):
+    return max(1, count // (jobs * 4))
+
+
+def _collect(stats, results):
+    for contacts, bytes_in, bytes_out, files_out, excluded in results:
+        stats.add(contacts=contacts, bytes_in=bytes_in, bytes_out=bytes_out, files_out=files_out, excluded=excluded)
+        if not files_out:
+            stats.skipped += 1
+
+
+def parse_v2_spec(spec):
+    """Parse `nama_kontak,nama_file,per_file,jumlah_file,angka_awal` like the bot's V2 input"""
+    parts = [p.strip() for p in spec.split(',')]
+    if len(parts) != 5:
+        raise ValueError("V2 spec must have 5 comma-separated values")
+    contact_name, file_base, contacts_per_file, total_files, start_num = parts
+    contacts_per_file, total_files, start_num = int(contacts_per_file), int(total_files), int(start_num)
+    if contacts_per_file <= 0 or total_files <= 0:
+        raise ValueError("per_file and jumlah_file must be greater than 0")
+    return contact_name, file_base, contacts_per_file, total_files, start_num
+
+
+def run_txt2vcf(args, pool, stats):
+    paths = expand_inputs(args.inputs, '.txt', args.recursive)
+    stats.files_in = len(paths)
+
+    if args.v2:
+        contact_name, file_base, contacts_per_file, total_files, start_num = parse_v2_spec(args.v2)
+        all_phones = []
+        for _, phones, size in pool.map(_parse_txt, paths, chunksize=_chunksize(len(paths), args.jobs)):
+            all_phones.extend(phones)
+            stats.add(bytes_in=size)
+            if not phones:
+                stats.skipped += 1
+        all_phones, excluded = exclude_exported(normalize_phone_batch(all_phones))
+        stats.add(excluded=excluded)
+        if len(all_phones) < contacts_per_file:
+            raise ValueError(f"Not enough numbers: {len(all_phones)} available, {contacts_per_file} per file requested")
+        batches = []
+        for batch in split_phones_into_batches(all_phones, contacts_per_file, total_files):
+            # only what is written gets claimed; a number another job took meanwhile drops out of its batch
+            batch, excluded = claim_exported(batch)
+            stats.add(excluded=excluded)
+            if batch:
+                batches.append(batch)
+        tasks = [(os.path.join(args.output, f"{file_base}{start_num + i}.vcf"), batch, contact_name)
+                 for i, batch in enumerate(batches)]
+        _collect(stats, pool.map(_write_vcf_batch, tasks))
+        return
+
+    if args.custom:
+        filenames = generate_custom_filenames(args.custom, len(paths))
+        if not filenames:
+            raise ValueError("--custom must end with a number, e.g. pudidi1")
+    else:
+        filenames = [os.path.basename(p).rsplit('.txt', 1)[0] + '.vcf' for p in paths]
+    tasks = [(p, os.path.join(args.output, name), args.name) for p, name in zip(paths, filenames)]
+    _collect(stats, pool.map(_txt_to_vcf, tasks, chunksize=_chunksize(len(tasks), args.jobs)))
+
+
+def run_vcf2txt(args, pool, stats):
+    paths = expand_inputs(args.inputs, '.vcf', args.recursive)
+    stats.files_in = len(paths)
+
+    if args.merge:
+        filename = args.merge if args.merge.endswith('.txt') else args.merge + '.txt'
+        out_path = os.path.join(args.output, filename)
+        total = 0
+
+        def contacts():
+            nonlocal total
+            for items in _parsed_lists(pool, _parse_vcf, paths, args.jobs, stats):
+                total += len(items)
+                yield from items
+
+        # written as the parsed files come in, never joined into one string
+        written = _write_lines(out_path, iter_lines(iter_txt_from_vcf(contacts())))
+        if written:
+            stats.add(contacts=total, files_out=1, bytes_out=written)
+        else:
+            os.remove(out_path)
+        return
+
+    tasks = [(p, os.path.join(args.output, os.path.basename(p).rsplit('.vcf', 1)[0] + '.txt')) for p in paths]
+    _collect(stats, pool.map(_vcf_to_txt, tasks, chunksize=_chunksize(len(tasks), args.jobs)))
+
+
+def _parsed_lists(pool, parse, paths, jobs, stats):
+    """Yield parsed lists one file at a time so merges can stream them"""
+    for _, items, size in pool.map(parse, paths, chunksize=_chunksize(len(paths), jobs)):
+        stats.add(bytes_in=size)
+        yield items
+
+
+def _excluding(stats, items, claim, chunk_size=10000):
+    """Stream `items` through an exclusion claim in chunks, so what passes is recorded as exported"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from _claim_chunk(stats, chunk, claim)
+            chunk = []
+    yield from _claim_chunk(stats, chunk, claim)
+
+
+def _claim_chunk(stats, chunk, claim):
+    kept, excluded = claim(chunk)
+    stats.add(excluded=excluded)
+    return kept
+
+
+def _write_merged(stats, out_path, chunks):
+    """Write merged output and count it, removing the file if nothing was merged"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for chunk in chunks:
+            count += 1
+            yield chunk
+
+    written = _write_lines(out_path, counted())
+    if count:
+        stats.add(contacts=count, files_out=1, bytes_out=written)
+    else:
+        os.remove(out_path)
+
+
+def run_merge_txt(args, pool, stats):
+    paths = expand_inputs(args.inputs, '.txt', args.recursive)
+    stats.files_in = len(paths)
+    filename = args.filename if args.filename.endswith('.txt') else args.filename + '.txt'
+    merged = _excluding(stats, iter_merge_txt_phones(_parsed_lists(pool, _parse_txt, paths, args.jobs, stats)),
+                        claim_exported)
+    _write_merged(stats, os.path.join(args.output, filename),
+                  (phone if i == 0 else '\n' + phone for i, phone in enumerate(merged)))
+
+
+def run_merge_vcf(args, pool, stats):
+    paths = expand_inputs(args.inputs, '.vcf', args.recursive)
+    stats.files_in = len(paths)
+    filename = args.filename if args.filename.endswith('.vcf') else args.filename + '.vcf'
+    merged = _excluding(stats, iter_merge_vcf_contacts(_parsed_lists(pool, _parse_vcf, paths, args.jobs, stats)),
+                        claim_exported_contacts)
+    _write_merged(stats, os.path.join(args.output, filename), iter_vcf_from_contacts(merged))
+
+
+COMMANDS = {
+    'txt2vcf': run_txt2vcf,
+    'vcf2txt': run_vcf2txt,
+    'merge-txt': run_merge_txt,
+    'merge-vcf': run_merge_vcf,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk TXT/VCF conversion", epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='+', help="files, directories or glob patterns")
+    common.add_argument('-o', '--output', required=True, help="output directory")
+    common.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="worker processes")
+    common.add_argument('-r', '--recursive', action='store_true', help="descend into subdirectories")
+    common.add_argument('--country-code', help="default country calling code (overrides VCF_DEFAULT_COUNTRY_CODE)")
+    common.add_argument('--exclusion-dir', help="skip and record already-exported numbers (overrides VCF_EXCLUSION_DIR)")
+
+    sub = parser.add_subparsers(dest='command', required=True)
+    txt2vcf = sub.add_parser('txt2vcf', parents=[common], help="TXT to VCF (V1 default/custom or V2)")
+    mode = txt2vcf.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--name', help="V1: contact name for every VCF")
+    mode.add_argument('--v2', metavar='SPEC', help="V2: nama_kontak,nama_file,per_file,jumlah_file,angka_awal")
+    txt2vcf.add_argument('--custom', metavar='BASE', help="V1 custom naming, e.g. pudidi1 -> pudidi1.vcf, pudidi2.vcf")
+
+    vcf2txt = sub.add_parser('vcf2txt', parents=[common], help="VCF to TXT, one file each or merged")
+    vcf2txt.add_argument('--merge', metavar='FILENAME', help="write a single merged TXT")
+
+    for name in ('merge-txt', 'merge-vcf'):
+        merge = sub.add_parser(name, parents=[common], help="merge files with duplicate removal")
+        merge.add_argument('--filename', required=True, help="merged output file name")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'txt2vcf' and args.custom and not args.name:
+        print("--custom requires --name", file=sys.stderr)
+        return 2
+    args.jobs = max(1, args.jobs)
+    os.makedirs(args.output, exist_ok=True)
+    overrides = {}
+    if args.country_code:
+        overrides['default_country_code'] = args.country_code.lstrip('+')
+    if args.exclusion_dir:
+        overrides['exclusion_dir'] = args.exclusion_dir
+    _init_worker(overrides)
+
+    stats = JobStats()
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(overrides,)) as pool:
+            COMMANDS[args.command](args, pool, stats)
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if get_config().exclusion_dir:
+        # workers only append; the parent is the one process that compacts
+        compact_exported()
+    print(stats.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
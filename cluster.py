@@ -0,0 +1,256 @@
+"""Multi-worker mode: one ingress process polls Telegram and shards updates across worker processes.
+
+Session state lives in `context.user_data` of whichever Application handled a
+chat, so every update of a chat must reach the same process. The ingress routes
+each update by a consistent hash of its chat id (`HashRing`) into that worker's
+queue; a worker runs the normal bot Application without an Updater and handles
+its queue in order, so per-chat ordering holds too. Changing the worker count
+only moves about 1/N of the chats.
+
+The ingress restarts workers that die and exports per-worker liveness and queue
+depth (updates routed but not yet handled) as metrics; with METRICS_PORT set,
+worker i serves its own metrics on METRICS_PORT + 1 + i.
+
+State that must not multiply with the worker count has one owner: the quota
+counters live in a manager process the ingress starts (`SharedState`), and
+workers call it through a proxy. Workers only append to the exclusion index
+(under its file lock) and the ingress compacts it. Traffic recordings and the
+job ledger are appended by every worker, under a file lock and through SQLite.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.managers import BaseManager
+
+from telegram import Update
+from telegram.error import NetworkError, RetryAfter, TimedOut
+from telegram.ext import TypeHandler
+
+from engine import compact_exported
+from metrics import worker_queue_depth, worker_restarts_total, worker_up, worker_updates_total
+from quotas import QuotaStore
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 10
+HEALTH_INTERVAL = 5.0
+HEARTBEAT_INTERVAL = 1.0
+# a worker whose heartbeat is older than this is reported down (its loop is blocked or wedged)
+STALE_AFTER = 30.0
+RING_REPLICAS = 160
+# the ingress checks the exclusion index for compaction once per this many health checks
+COMPACT_EVERY = 12
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring with `replicas` virtual points per node"""
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        points = sorted((_hash(f"{node}-{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+_quota_store = None
+
+
+def _shared_quota_store():
+    global _quota_store
+    if _quota_store is None:
+        _quota_store = QuotaStore()
+    return _quota_store
+
+
+class SharedState(BaseManager):
+    """Manager process holding the one QuotaStore every worker checks and charges"""
+
+
+SharedState.register('quota_store', callable=_shared_quota_store)
+
+
+def _ignore_sigint():
+    # like the workers, the state process outlives Ctrl+C until the ingress shuts it down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def shard_key(update):
+    """Chat id of an update, falling back to the user and then the update id"""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+class Worker:
+    """Handle on one worker process, its queue and the counters it shares with the ingress"""
+
+    def __init__(self, ctx, index, state_address):
+        self.ctx = ctx
+        self.index = index
+        self.state_address = state_address
+        self.queue = ctx.Queue()
+        self.beat = ctx.Value('d', time.time())
+        self.handled = ctx.Value('q', 0)
+        self.routed = 0
+        self.process = None
+
+    def start(self):
+        self.beat.value = time.time()
+        if self.process is not None:
+            # a worker killed inside queue.get() can leave the queue's read lock held, so its
+            # replacement gets a fresh queue; chats on it lose their session state either way
+            lost = self.depth
+            if lost:
+                logger.warning(f"Worker {self.index}: {lost} routed updates lost with the exited process")
+            self.queue = self.ctx.Queue()
+            self.routed = self.handled.value
+        self.process = self.ctx.Process(target=worker_main,
+                                        args=(self.index, self.queue, self.beat, self.handled, self.state_address),
+                                        name=f"bot-worker-{self.index}", daemon=True)
+        self.process.start()
+
+    def send(self, data):
+        self.routed += 1
+        self.queue.put(data)
+        worker_updates_total.inc(worker=str(self.index))
+
+    @property
+    def depth(self):
+        return self.routed - self.handled.value
+
+    @property
+    def healthy(self):
+        return self.process.is_alive() and time.time() - self.beat.value < STALE_AFTER
+
+
+async def _check_health(workers):
+    loop = asyncio.get_running_loop()
+    checks = 0
+    while True:
+        await asyncio.sleep(HEALTH_INTERVAL)
+        checks += 1
+        if checks % COMPACT_EVERY == 0:
+            # workers only append to the shared exclusion index; its one compacting process is this one
+            try:
+                await loop.run_in_executor(None, compact_exported)
+            except Exception as e:
+                logger.error(f"Exclusion index compaction failed: {e}")
+        for worker in workers:
+            label = str(worker.index)
+            if not worker.process.is_alive():
+                logger.error(f"Worker {worker.index} exited with {worker.process.exitcode}, restarting")
+                worker_restarts_total.inc(worker=label)
+                worker.start()
+            elif not worker.healthy:
+                logger.warning(f"Worker {worker.index} heartbeat is {time.time() - worker.beat.value:.0f}s old")
+            worker_up.set(1 if worker.healthy else 0, worker=label)
+            worker_queue_depth.set(worker.depth, worker=label)
+
+
+async def run_ingress(bot, worker_count):
+    """Poll updates with `bot` and route them to `worker_count` worker processes until cancelled"""
+    ctx = multiprocessing.get_context('spawn')
+    state = SharedState(ctx=ctx)
+    state.start(_ignore_sigint)
+    # one time origin for every worker's traffic recording (inherited by the spawned workers)
+    os.environ.setdefault('TRAFFIC_RECORD_EPOCH', str(time.time()))
+    workers = [Worker(ctx, i, state.address) for i in range(worker_count)]
+    ring = HashRing(range(worker_count))
+    for worker in workers:
+        worker.start()
+    health = asyncio.create_task(_check_health(workers))
+    offset = 0
+    try:
+        async with bot:
+            await bot.delete_webhook()
+            logger.info(f"Ingress routing updates to {worker_count} workers")
+            try:
+                while True:
+                    try:
+                        updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                        allowed_updates=Update.ALL_TYPES)
+                    except RetryAfter as e:
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except (NetworkError, TimedOut) as e:
+                        logger.warning(f"getUpdates failed: {e}")
+                        await asyncio.sleep(1)
+                        continue
+                    for update in updates:
+                        workers[ring.node_for(shard_key(update))].send(update.to_dict())
+                        offset = update.update_id + 1
+            finally:
+                if offset:
+                    # confirm what was routed so a restart does not receive it again
+                    try:
+                        await bot.get_updates(offset=offset, timeout=0)
+                    except Exception as e:
+                        logger.warning(f"Could not confirm updates up to {offset}: {e}")
+    finally:
+        health.cancel()
+        for worker in workers:
+            worker.queue.put(None)
+        for worker in workers:
+            worker.process.join(timeout=30)
+        state.shutdown()
+
+
+def worker_main(index, queue, beat, handled, state_address):
+    """Worker process entry point: run the bot Application on the updates the ingress routes here"""
+    # Ctrl+C reaches the whole process group; workers stop when the ingress sends None instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_worker(index, queue, beat, handled, state_address))
+
+
+async def _serve_worker(index, queue, beat, handled, state_address):
+    import main
+
+    state = SharedState(address=state_address)
+    state.connect()
+    main.quota_store = state.quota_store()
+
+    async def mark_handled(update, context):
+        with handled.get_lock():
+            handled.value += 1
+
+    async def heartbeat():
+        while True:
+            beat.value = time.time()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    application = main.build_application(polling=False)
+    application.add_handler(TypeHandler(Update, mark_handled), group=99)
+    if main.METRICS_PORT:
+        main.start_metrics_server(main.METRICS_PORT + 1 + index)
+
+    loop = asyncio.get_running_loop()
+    async with application:
+        await application.start()
+        # run_polling would call these; the stall watchdog and job ledger hang off them
+        if application.post_init:
+            await application.post_init(application)
+        beating = asyncio.create_task(heartbeat())
+        logger.info(f"Worker {index} ready")
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        beating.cancel()
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
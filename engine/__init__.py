@@ -0,0 +1,23 @@
+"""Telegram-free conversion engine for TXT/VCF contact files"""
+from .config import EngineConfig, get_config, configure, reset_config, use_config
+from .decode import MappedFile, decode_file_content, detect_encoding, iter_text_lines, map_local_file
+from .numbering import ParsedNumber, REGION_CODES, match_country_code, parse_number, to_e164, normalize_numbers
+from .phones import (
+    extract_phone_numbers, normalize_phone, normalize_phone_batch, normalize_phone_for_txt_output,
+    normalize_phone_list_format
+)
+from .vcf import (
+    clean_name_for_vcf, parse_vcf_content, create_txt_from_vcf, create_vcf_from_contacts,
+    create_vcf_content, create_vcf_from_phones, iter_vcf_from_contacts, iter_vcf_from_phones,
+    iter_vcf_from_text, iter_txt_from_vcf, text_vcf_filename
+)
+from .external import dedupe_first_seen
+from .merge import merge_txt_files, merge_vcf_files, iter_merge_txt_phones, iter_merge_vcf_contacts
+from .batch import generate_custom_filenames, split_phones_into_batches
+from .exclusion import (
+    ExclusionIndex, get_exclusion_index, exclude_exported, claim_exported, claim_exported_contacts,
+    release_exported, release_exported_contacts, compact_exported
+)
+from .archive import ArchiveError, parse_zip
+from .tabular import TABLE_EXTENSIONS, TableError, parse_table, parse_column_mapping
+from .output import COMPRESSIONS, PackedOutput, iter_lines, pack_outputs, part_filename, split_compression
@@ -0,0 +1,127 @@
+"""ZIP archive ingestion: decompress members one at a time and parse them in a process pool"""
+import io
+import multiprocessing
+import posixpath
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import get_config, use_config
+from .decode import decode_file_content
+from .phones import extract_phone_numbers
+from .vcf import parse_vcf_content
+
+# kind -> (member extension, parser, key of the parsed list in the file record)
+PARSERS = {
+    'txt': ('.txt', extract_phone_numbers, 'phone_numbers'),
+    'vcf': ('.vcf', parse_vcf_content, 'contacts'),
+}
+
+
+class ArchiveError(ValueError):
+    """The upload is not a usable ZIP archive (corrupt, too many members, too large)"""
+
+
+def iter_zip_members(data, extension, max_members=None, max_bytes=None):
+    """Yield `(filename, bytes)` per file member, decompressing one at a time.
+
+    Members without `extension` are yielded as `(filename, None)` so callers can count them.
+    Limits default to the config's; 0 disables a limit.
+    """
+    config = get_config()
+    if max_members is None:
+        max_members = config.zip_max_members
+    if max_bytes is None:
+        max_bytes = config.zip_max_bytes
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data) if not hasattr(data, 'read') else data)
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"not a valid zip archive: {e}") from e
+
+    members = 0
+    total = 0
+    with archive:
+        for info in archive.infolist():
+            name = posixpath.basename(info.filename)
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            if not name.lower().endswith(extension):
+                yield name, None
+                continue
+            members += 1
+            total += info.file_size
+            if max_members and members > max_members:
+                raise ArchiveError(f"archive has more than {max_members} {extension} files")
+            if max_bytes and total > max_bytes:
+                raise ArchiveError(f"archive expands to more than {max_bytes} bytes")
+            with archive.open(info) as member:
+                # read at most one byte past the declared size so a lying header cannot blow up memory
+                content = member.read(info.file_size + 1)
+            if len(content) > info.file_size:
+                raise ArchiveError(f"{info.filename} is larger than its header claims")
+            yield name, content
+
+
+def parse_member(kind, filename, content):
+    """Decode and parse one archive member into a file record, or None if nothing was found"""
+    _, parser, key = PARSERS[kind]
+    text = decode_file_content(content)
+    items = parser(text) if text else []
+    if not items:
+        return None
+    return {'filename': filename, key: items}
+
+
+_pool = None
+_pool_config = None
+
+
+def get_parse_pool():
+    """Process pool shared by archive parsing, created on first use; None when parsing inline.
+
+    Workers run with the config in effect when the pool was made, configure() overrides
+    included; a later change of config replaces the pool.
+    """
+    global _pool, _pool_config
+    config = get_config()
+    if config.parse_workers <= 1:
+        return None
+    if _pool is not None and _pool_config != config:
+        _pool.shutdown(wait=False)
+        _pool = None
+    if _pool is None:
+        # spawn, not fork: the bot calls this from executor threads next to a running event loop
+        _pool = ProcessPoolExecutor(max_workers=config.parse_workers, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=use_config, initargs=(config,))
+        _pool_config = config
+    return _pool
+
+
+def parse_zip(data, kind):
+    """Parse every `kind` member of a ZIP archive.
+
+    Members are decompressed one by one and handed to the parse pool with a bounded
+    number in flight, so memory holds only a few members at a time. Returns
+    `(records, skipped)` where records keep archive order and skipped counts members
+    that had the wrong extension or contained nothing parseable.
+    """
+    extension = PARSERS[kind][0]
+    pool = get_parse_pool()
+    max_in_flight = 2 * get_config().parse_workers
+    records = []
+    pending = deque()
+    skipped = 0
+
+    for filename, content in iter_zip_members(data, extension):
+        if content is None:
+            skipped += 1
+        elif pool is None:
+            records.append(parse_member(kind, filename, content))
+        else:
+            pending.append(pool.submit(parse_member, kind, filename, content))
+            if len(pending) >= max_in_flight:
+                records.append(pending.popleft().result())
+    records.extend(future.result() for future in pending)
+
+    parsed = [record for record in records if record]
+    return parsed, skipped + len(records) - len(parsed)
@@ -0,0 +1,32 @@
+import re
+
+
+def generate_custom_filenames(base_name: str, total_files: int) -> list:
+    """Generate custom filenames with incremental numbers"""
+    match = re.search(r'(.+?)(\d+)$', base_name)
+    if not match:
+        return []
+    
+    base_part = match.group(1)
+    start_number = int(match.group(2))
+    
+    return [f"{base_part}{start_number + i}.vcf" for i in range(total_files)]
+
+def split_phones_into_batches(phones: list, contacts_per_file: int, total_files: int) -> list:
+    """Split phone numbers into batches for V2 processing"""
+    batches = []
+    phones_per_batch = len(phones) // total_files
+    remainder = len(phones) % total_files
+    
+    start_idx = 0
+    for i in range(total_files):
+        batch_size = min(contacts_per_file, phones_per_batch + (1 if i < remainder else 0))
+        end_idx = start_idx + batch_size
+        if end_idx > len(phones):
+            end_idx = len(phones)
+        batches.append(phones[start_idx:end_idx])
+        start_idx = end_idx
+        if start_idx >= len(phones):
+            break
+    
+    return [batch for batch in batches if batch]
@@ -0,0 +1,108 @@
+import os
+from dataclasses import dataclass, field, replace
+
+DEFAULT_ENCODINGS = ('utf-8', 'latin-1', 'cp1252', 'iso-8859-1')
+
+# field name -> environment variable, for settings that need no extra parsing
+_STR_ENV = {
+    'tmpdir': 'VCF_TMPDIR',
+    'exclusion_dir': 'VCF_EXCLUSION_DIR',
+    'phone_column': 'VCF_PHONE_COLUMN',
+    'name_column': 'VCF_NAME_COLUMN',
+    'output_compression': 'VCF_OUTPUT_COMPRESSION',
+}
+_INT_ENV = {
+    'vectorize_threshold': 'VCF_VECTORIZE_THRESHOLD',
+    'merge_spill_threshold': 'VCF_MERGE_SPILL_THRESHOLD',
+    'merge_run_size': 'VCF_MERGE_RUN_SIZE',
+    'exclusion_compact_threshold': 'VCF_EXCLUSION_COMPACT_THRESHOLD',
+    'zip_max_members': 'VCF_ZIP_MAX_MEMBERS',
+    'zip_max_bytes': 'VCF_ZIP_MAX_BYTES',
+    'parse_workers': 'VCF_PARSE_WORKERS',
+    'output_max_bytes': 'VCF_OUTPUT_MAX_BYTES',
+}
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """Settings used by the conversion engine"""
+    default_country_code: str = '62'
+    encodings: tuple = field(default=DEFAULT_ENCODINGS)
+    # lists at least this long use the NumPy batch path when numpy is installed (0 disables)
+    vectorize_threshold: int = 100_000
+    # merges spill sorted runs to disk past this many unique entries (0 keeps everything in memory)
+    merge_spill_threshold: int = 5_000_000
+    merge_run_size: int = 1_000_000
+    tmpdir: str = None
+    # directory of the persistent "already exported" index (None disables exclusion)
+    exclusion_dir: str = None
+    exclusion_compact_threshold: int = 100_000
+    # ZIP uploads: member count / total uncompressed size limits (0 disables) and parse pool size
+    zip_max_members: int = 1000
+    zip_max_bytes: int = 512 * 1024 * 1024
+    parse_workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    # CSV/XLSX column mapping: header name or 1-based index (None guesses from the header)
+    phone_column: str = None
+    name_column: str = None
+    # default compression of merged/converted outputs: None, 'gzip' or 'zip'
+    output_compression: str = None
+    # larger outputs are split into name_part2.ext, ... (Bot API uploads stop at 50 MB; 0 disables)
+    output_max_bytes: int = 48 * 1024 * 1024
+
+    @classmethod
+    def from_env(cls):
+        """Build config from VCF_* environment variables"""
+        kwargs = {}
+        if os.getenv('VCF_DEFAULT_REGION'):
+            from .numbering import REGION_CODES
+            region = os.getenv('VCF_DEFAULT_REGION').upper()
+            if region not in REGION_CODES:
+                raise ValueError(f"Unknown VCF_DEFAULT_REGION {region!r}, expected one of {sorted(REGION_CODES)}")
+            kwargs['default_country_code'] = REGION_CODES[region]
+        if os.getenv('VCF_DEFAULT_COUNTRY_CODE'):
+            kwargs['default_country_code'] = os.getenv('VCF_DEFAULT_COUNTRY_CODE').lstrip('+')
+        if os.getenv('VCF_ENCODINGS'):
+            kwargs['encodings'] = tuple(e.strip() for e in os.getenv('VCF_ENCODINGS').split(',') if e.strip())
+        for name, env in _STR_ENV.items():
+            if os.getenv(env):
+                kwargs[name] = os.getenv(env)
+        for name, env in _INT_ENV.items():
+            if os.getenv(env):
+                kwargs[name] = int(os.getenv(env))
+        if kwargs.get('output_compression'):
+            from .output import COMPRESSIONS
+            kwargs['output_compression'] = kwargs['output_compression'].lower()
+            if kwargs['output_compression'] not in COMPRESSIONS:
+                raise ValueError(f"Unknown VCF_OUTPUT_COMPRESSION {kwargs['output_compression']!r}, expected one of {sorted(COMPRESSIONS)}")
+        return cls(**kwargs)
+
+
+_config = None
+
+
+def get_config():
+    """Return engine config, reading the environment on first use"""
+    global _config
+    if _config is None:
+        _config = EngineConfig.from_env()
+    return _config
+
+
+def configure(**overrides):
+    """Override engine config values (e.g. from a CLI or worker process)"""
+    global _config
+    _config = replace(get_config(), **overrides)
+    return _config
+
+
+def use_config(config):
+    """Install a complete EngineConfig, e.g. the parent's in a pool worker process"""
+    global _config
+    _config = config
+    return _config
+
+
+def reset_config():
+    """Drop cached config so the environment is read again on next use"""
+    global _config
+    _config = None
@@ -0,0 +1,60 @@
+import codecs
+import io
+import mmap
+
+from .config import get_config
+
+# bytes looked at to pick the encoding of a streamed upload
+ENCODING_SAMPLE = 64 * 1024
+
+
+def decode_file_content(file_content):
+    """Decode uploaded bytes (or any buffer, e.g. a mapped file) trying each configured encoding, None if all fail"""
+    for encoding in get_config().encodings:
+        try:
+            # decode straight from the buffer, so a memory-mapped file is not copied to bytes first
+            with memoryview(file_content) as view:
+                return str(view, encoding)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def detect_encoding(sample):
+    """First configured encoding that decodes `sample` (a possibly cut-off prefix), latin-1 if none does"""
+    for encoding in get_config().encodings:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return 'utf-8-sig' if encoding == 'utf-8' else encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def iter_text_lines(data):
+    """Yield the lines of an upload (bytes or a mapped file) decoded as they are read, never as one string"""
+    encoding = detect_encoding(bytes(data[:ENCODING_SAMPLE]))
+    # a memory-mapped upload is already a binary file, so it is read in place instead of copied
+    source = data if hasattr(data, 'read') else io.BytesIO(data)
+    yield from io.TextIOWrapper(source, encoding=encoding, errors='replace')
+
+
+class MappedFile(mmap.mmap):
+    """Read-only mmap that also passes as a seekable binary file (zipfile, TextIOWrapper, openpyxl)"""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return False
+
+
+def map_local_file(path):
+    """Memory-map a file on local disk (b'' when empty), usable wherever upload bytes are"""
+    with open(path, 'rb') as f:
+        if not f.seek(0, 2):
+            return b''
+        return MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
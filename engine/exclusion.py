@@ -0,0 +1,309 @@
+"""Persistent index of already-exported numbers, so no number is handed out twice across jobs.
+
+Numbers are stored as E.164 digits in int64. The bulk lives in `numbers.bin`, a
+sorted array that is memory-mapped and binary-searched, so opening the index costs
+nothing and lookups are O(log n). New exports go to `append.log` (unsorted int64,
+append-only) and are held in a set; `compact()` folds the log into a new sorted
+file and truncates the log. A job that claimed numbers but failed to deliver them
+gives them back with `release()`, which appends their negated values to the log as
+tombstones; compaction drops released numbers from the new base.
+
+Several processes (CLI workers, bot cluster workers) may share one directory.
+Every read and append holds an flock on `index.lock` (shared to read, exclusive
+to append) and first catches up with the others: it reads log entries appended
+since its last look and remaps the base file when a compaction replaced it.
+`claim_exported` filters and records in one exclusive section, so concurrent
+jobs never both hand out a number. Workers only append; compaction is left to
+one owner process (the CLI parent, the single-process bot or the cluster
+ingress) through `compact_exported`, and `release_exported` undoes a claim whose
+output never reached the user.
+"""
+import bisect
+import contextlib
+import fcntl
+import heapq
+import mmap
+import os
+from array import array
+
+from .config import get_config
+from .numbering import to_e164
+from .phones import normalize_phone_batch
+
+BASE_FILE = 'numbers.bin'
+LOG_FILE = 'append.log'
+LOCK_FILE = 'index.lock'
+_ITEM = array('q').itemsize
+
+
+def _e164_int(e164):
+    digits = e164[1:]
+    return int(digits) if digits.isdigit() and len(digits) <= 18 else None
+
+
+def canonical_int(phone):
+    """E.164 digits of `phone` as an int, or None if it has none"""
+    return _e164_int(to_e164(phone))
+
+
+class ExclusionIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.base_path = os.path.join(directory, BASE_FILE)
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self._lock_fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        self._map = None
+        self._base = memoryview(b'').cast('q')
+        self._base_id = None
+        self._log = set()
+        # tombstoned numbers that may still be in the base file
+        self._released = set()
+        self._log_offset = 0
+        with self._locked(fcntl.LOCK_SH):
+            self._refresh()
+
+    @contextlib.contextmanager
+    def _locked(self, mode):
+        fcntl.flock(self._lock_fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Catch up with other processes (call under the lock): remap a base file that was
+        replaced by a compaction and read log entries appended since the last look"""
+        try:
+            st = os.stat(self.base_path)
+            base_id = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            base_id = None
+        if base_id != self._base_id:
+            # a compaction folded the log into the new base and truncated it
+            self._open_base()
+            self._base_id = base_id
+            self._log.clear()
+            self._released.clear()
+            self._log_offset = 0
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._log_offset:
+            self._log.clear()
+            self._released.clear()
+            self._log_offset = 0
+        end = size - size % _ITEM
+        if end > self._log_offset:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                logged = array('q')
+                logged.frombytes(f.read(end - self._log_offset))
+            for number in logged:
+                if number < 0:
+                    self._log.discard(-number)
+                    self._released.add(-number)
+                else:
+                    self._log.add(number)
+                    self._released.discard(number)
+            self._log_offset = end
+
+    def _open_base(self):
+        self._release_base()
+        if os.path.exists(self.base_path) and os.path.getsize(self.base_path) >= _ITEM:
+            with open(self.base_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._base = memoryview(self._map).cast('q')
+
+    def _release_base(self):
+        self._base.release()
+        self._base = memoryview(b'').cast('q')
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def close(self):
+        self._release_base()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def __len__(self):
+        released = sum(1 for n in self._released if self._in_base(n))
+        return len(self._base) - released + sum(1 for n in self._log if not self._in_base(n))
+
+    @property
+    def pending(self):
+        """Numbers and releases waiting in the append log"""
+        return len(self._log) + len(self._released)
+
+    def _in_base(self, number):
+        base = self._base
+        i = bisect.bisect_left(base, number)
+        return i < len(base) and base[i] == number
+
+    def contains_int(self, number):
+        return number in self._log or (number not in self._released and self._in_base(number))
+
+    def __contains__(self, phone):
+        number = canonical_int(phone)
+        if number is None:
+            return False
+        with self._locked(fcntl.LOCK_SH):
+            self._refresh()
+            return self.contains_int(number)
+
+    def _canonical_ints(self, phones):
+        return [_e164_int(e164) for e164 in normalize_phone_batch(phones)]
+
+    def _append(self, new):
+        if new:
+            data = new.tobytes()
+            with open(self.log_path, 'ab') as f:
+                f.write(data)
+            self._log_offset += len(data)
+
+    def keep_mask(self, phones):
+        """One flag per phone: True if it has not been exported yet"""
+        numbers = self._canonical_ints(phones)
+        with self._locked(fcntl.LOCK_SH):
+            self._refresh()
+            contains = self.contains_int
+            return [number is None or not contains(number) for number in numbers]
+
+    def filter(self, phones):
+        """Return (phones not yet exported, number excluded), keeping input order"""
+        kept = [phone for phone, keep in zip(phones, self.keep_mask(phones)) if keep]
+        return kept, len(phones) - len(kept)
+
+    def claim_mask(self, phones):
+        """keep_mask that also records the kept phones, both under one exclusive lock, so two
+        processes filtering at the same time never both keep a number"""
+        numbers = self._canonical_ints(phones)
+        mask = []
+        new = array('q')
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh()
+            claimed = set()
+            for number in numbers:
+                if number is None or number in claimed:
+                    mask.append(True)
+                elif self.contains_int(number):
+                    mask.append(False)
+                else:
+                    claimed.add(number)
+                    new.append(number)
+                    mask.append(True)
+            self._log.update(claimed)
+            self._released.difference_update(claimed)
+            self._append(new)
+        return mask
+
+    def release(self, phones):
+        """Forget claimed phones that were never delivered, so a later job may hand them out"""
+        numbers = {number for number in self._canonical_ints(phones) if number is not None}
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh()
+            released = [number for number in numbers if self.contains_int(number)]
+            self._log.difference_update(released)
+            self._released.update(released)
+            self._append(array('q', (-number for number in released)))
+        return len(released)
+
+    def compact(self):
+        """Merge the append log into a new sorted base file and truncate the log"""
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh()
+            self._compact()
+
+    def _compact(self):
+        if not self._log and not self._released:
+            return
+        tmp_path = self.base_path + '.tmp'
+        pending = sorted(n for n in self._log if not self._in_base(n))
+        released = self._released
+        base = (n for n in self._base if n not in released) if released else self._base
+        with open(tmp_path, 'wb') as f:
+            chunk = array('q')
+            for number in heapq.merge(base, pending):
+                chunk.append(number)
+                if len(chunk) >= 65536:
+                    f.write(chunk.tobytes())
+                    chunk = array('q')
+            f.write(chunk.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._release_base()
+        os.replace(tmp_path, self.base_path)
+        open(self.log_path, 'wb').close()
+        # picks up the new base and starts the (now empty) log over
+        self._refresh()
+
+    def maybe_compact(self):
+        """Compact once the append log reaches the configured size"""
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh()
+            if self.pending >= get_config().exclusion_compact_threshold:
+                self._compact()
+
+
+_index = None
+
+
+def get_exclusion_index():
+    """Shared index for VCF_EXCLUSION_DIR, opened on first use; None when exclusion is off"""
+    global _index
+    directory = get_config().exclusion_dir
+    if not directory:
+        return None
+    if _index is None or _index.directory != directory:
+        _index = ExclusionIndex(directory)
+    return _index
+
+
+def exclude_exported(phones):
+    """Drop phones exported by earlier jobs; returns (kept, excluded_count)"""
+    index = get_exclusion_index()
+    if index is None:
+        return phones, 0
+    return index.filter(phones)
+
+
+def claim_exported(phones):
+    """exclude_exported that also records the kept phones as exported in the same locked step"""
+    index = get_exclusion_index()
+    if index is None:
+        return phones, 0
+    kept = [phone for phone, keep in zip(phones, index.claim_mask(phones)) if keep]
+    return kept, len(phones) - len(kept)
+
+
+def claim_exported_contacts(contacts):
+    """Contact-list form of claim_exported"""
+    index = get_exclusion_index()
+    if index is None:
+        return contacts, 0
+    mask = index.claim_mask([contact['phone'] for contact in contacts])
+    kept = [contact for contact, keep in zip(contacts, mask) if keep]
+    return kept, len(contacts) - len(kept)
+
+
+def release_exported(phones):
+    """Undo claim_exported for phones whose output was not delivered"""
+    index = get_exclusion_index()
+    if index is None:
+        return 0
+    return index.release(phones)
+
+
+def release_exported_contacts(contacts):
+    """Contact-list form of release_exported"""
+    return release_exported([contact['phone'] for contact in contacts])
+
+
+def compact_exported():
+    """Compact the shared index once its log reaches the threshold; call from the owner process only"""
+    index = get_exclusion_index()
+    if index is not None:
+        index.maybe_compact()
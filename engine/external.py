@@ -0,0 +1,101 @@
+"""First-seen-order dedupe that spills to disk once the input outgrows memory.
+
+Below the spill threshold keys live in an insertion-ordered dict. Past it, every
+record is tagged with its sequence index and written out in runs sorted by
+(key, seq). A k-way merge keeps the lowest seq per key and writes runs sorted by
+seq, and a second k-way merge over those yields survivors in first-seen order.
+"""
+import heapq
+import os
+import pickle
+import tempfile
+
+from .config import get_config
+
+_BLOCK = 4096
+
+
+def _spill(records, workdir):
+    """Write already-sorted records to a run file and return its path"""
+    fd, path = tempfile.mkstemp(dir=workdir, suffix='.run')
+    with os.fdopen(fd, 'wb') as f:
+        for i in range(0, len(records), _BLOCK):
+            pickle.dump(records[i:i + _BLOCK], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+def _sorted_runs(records, run_size, workdir):
+    runs = []
+    buffer = []
+    for record in records:
+        buffer.append(record)
+        if len(buffer) >= run_size:
+            buffer.sort()
+            runs.append(_spill(buffer, workdir))
+            buffer = []
+    if buffer:
+        buffer.sort()
+        runs.append(_spill(buffer, workdir))
+    return runs
+
+
+def _merge_runs(runs):
+    readers = [_read_run(path) for path in runs]
+    yield from heapq.merge(*readers)
+    for path in runs:
+        os.remove(path)
+
+
+def dedupe_first_seen(keyed_items, spill_threshold=None, run_size=None, tmpdir=None):
+    """Yield `(key, payload)` for the first occurrence of every key, in input order.
+
+    Stays in memory until more than `spill_threshold` unique keys are seen, then
+    switches to sorted runs on disk under `tmpdir`.
+    """
+    config = get_config()
+    spill_threshold = config.merge_spill_threshold if spill_threshold is None else spill_threshold
+    run_size = run_size or config.merge_run_size
+    tmpdir = tmpdir or config.tmpdir
+
+    seen = {}
+    items = iter(keyed_items)
+    for key, payload in items:
+        if key not in seen:
+            seen[key] = payload
+            if spill_threshold and len(seen) > spill_threshold:
+                break
+    else:
+        yield from seen.items()
+        return
+
+    with tempfile.TemporaryDirectory(prefix='vcf-merge-', dir=tmpdir) as workdir:
+        def records():
+            # dict order is first-seen order, so its index is the sequence number
+            for seq, (key, payload) in enumerate(seen.items()):
+                yield key, seq, payload
+            for seq, (key, payload) in enumerate(items, len(seen)):
+                yield key, seq, payload
+
+        key_runs = _sorted_runs(records(), run_size, workdir)
+        seen.clear()
+
+        def survivors():
+            last = object()
+            for key, seq, payload in _merge_runs(key_runs):
+                if key != last:
+                    last = key
+                    yield seq, key, payload
+
+        seq_runs = _sorted_runs(survivors(), run_size, workdir)
+        for _, key, payload in _merge_runs(seq_runs):
+            yield key, payload
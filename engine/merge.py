@@ -0,0 +1,44 @@
+from .config import get_config
+from .external import dedupe_first_seen
+from .numbering import normalize_numbers
+
+
+def merge_txt_files(txt_files_data):
+    """Merge multiple TXT files and remove duplicates with consistent format, yielding output phones"""
+    yield from iter_merge_txt_phones(file_data['phone_numbers'] for file_data in txt_files_data)
+
+def merge_vcf_files(vcf_files_data):
+    """Merge multiple VCF files and remove duplicates"""
+    # Unique identifier for contact is name + phone
+    return [contact for _, contact in dedupe_first_seen(
+        (f"{contact['name']}|{contact['phone']}", contact)
+        for file_data in vcf_files_data for contact in file_data['contacts']
+    )]
+
+def iter_merge_txt_phones(phone_lists):
+    """Streaming merge over an iterable of phone lists: one phone per canonical (E.164) number, first seen
+    kept, so 0812..., 62812... and +62812... are one number. Like normalize_phone_list_format, once any
+    input has a '+' every output phone is written in E.164."""
+    has_plus = False
+    cc = get_config().default_country_code
+    
+    def keyed():
+        nonlocal has_plus
+        for phones in phone_lists:
+            if not has_plus and any(phone.startswith('+') for phone in phones):
+                has_plus = True
+            canonical, _ = normalize_numbers(phones, cc)
+            for phone, number in zip(phones, canonical):
+                # numbers without digits are kept apart under their own text
+                yield number or phone, phone
+    
+    # dedupe consumes every input before its first yield, so has_plus is final by then
+    for number, phone in dedupe_first_seen(keyed()):
+        yield number if has_plus and number and not phone.startswith('+') else phone
+
+def iter_merge_vcf_contacts(contact_lists):
+    """Streaming merge_vcf_files over an iterable of contact lists"""
+    for _, contact in dedupe_first_seen(
+        (f"{contact['name']}|{contact['phone']}", contact) for contacts in contact_lists for contact in contacts
+    ):
+        yield contact
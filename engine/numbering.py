@@ -0,0 +1,193 @@
+"""E.164 phone number normalization built on a country-calling-code trie"""
+import re
+from typing import NamedTuple
+
+from .config import get_config
+
+# ITU-T E.164 country calling codes (prefix-free, so the first terminal node in the trie wins)
+COUNTRY_CODES = (
+    '1', '7', '20', '27', '30', '31', '32', '33', '34', '36', '39', '40', '41', '43', '44', '45', '46', '47', '48',
+    '49', '51', '52', '53', '54', '55', '56', '57', '58', '60', '61', '62', '63', '64', '65', '66', '81', '82', '84',
+    '86', '90', '91', '92', '93', '94', '95', '98',
+    '211', '212', '213', '216', '218', '220', '221', '222', '223', '224', '225', '226', '227', '228', '229', '230',
+    '231', '232', '233', '234', '235', '236', '237', '238', '239', '240', '241', '242', '243', '244', '245', '246',
+    '247', '248', '249', '250', '251', '252', '253', '254', '255', '256', '257', '258', '260', '261', '262', '263',
+    '264', '265', '266', '267', '268', '269', '290', '291', '297', '298', '299',
+    '350', '351', '352', '353', '354', '355', '356', '357', '358', '359', '370', '371', '372', '373', '374', '375',
+    '376', '377', '378', '379', '380', '381', '382', '383', '385', '386', '387', '389',
+    '420', '421', '423',
+    '500', '501', '502', '503', '504', '505', '506', '507', '508', '509', '590', '591', '592', '593', '594', '595',
+    '596', '597', '598', '599',
+    '670', '672', '673', '674', '675', '676', '677', '678', '679', '680', '681', '682', '683', '685', '686', '687',
+    '688', '689', '690', '691', '692',
+    '800', '808', '850', '852', '853', '855', '856', '870', '878', '880', '881', '882', '883', '886', '888',
+    '960', '961', '962', '963', '964', '965', '966', '967', '968', '970', '971', '972', '973', '974', '975', '976',
+    '977', '979', '992', '993', '994', '995', '996', '998',
+)
+
+
+class NumberingPlan(NamedTuple):
+    """National significant number rules for one calling code"""
+    min_length: int
+    max_length: int
+    trunk_prefix: str = '0'
+    # first digits of subscriber numbers commonly written without trunk prefix or country code
+    national_leading: str = ''
+
+
+# Plans for the countries our lists actually contain; anything else falls back to E.164 length limits
+NUMBERING_PLANS = {
+    '62': NumberingPlan(8, 12, '0', '8'),
+    '60': NumberingPlan(8, 10, '0', '1'),
+    '65': NumberingPlan(8, 8, '', '689'),
+    '63': NumberingPlan(8, 10, '0', '9'),
+    '66': NumberingPlan(8, 9, '0', '689'),
+    '84': NumberingPlan(9, 10, '0', '35789'),
+    '91': NumberingPlan(10, 10, '0', '6789'),
+    '92': NumberingPlan(9, 10, '0', '3'),
+    '880': NumberingPlan(8, 10, '0', '1'),
+    '86': NumberingPlan(8, 11, '0', '1'),
+    '81': NumberingPlan(9, 10, '0', ''),
+    '82': NumberingPlan(8, 10, '0', ''),
+    '61': NumberingPlan(9, 9, '0', '4'),
+    '44': NumberingPlan(9, 10, '0', '7'),
+    '1': NumberingPlan(10, 10, '', ''),
+    '7': NumberingPlan(10, 10, '8', '9'),
+    '966': NumberingPlan(8, 9, '0', '5'),
+    '971': NumberingPlan(8, 9, '0', '5'),
+}
+
+# ISO 3166 region -> calling code, for VCF_DEFAULT_REGION
+REGION_CODES = {
+    'ID': '62', 'MY': '60', 'SG': '65', 'PH': '63', 'TH': '66', 'VN': '84', 'IN': '91', 'PK': '92', 'BD': '880',
+    'CN': '86', 'JP': '81', 'KR': '82', 'AU': '61', 'GB': '44', 'US': '1', 'CA': '1', 'RU': '7', 'SA': '966',
+    'AE': '971',
+}
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def _build_trie(codes):
+    trie = {}
+    for code in codes:
+        node = trie
+        for digit in code:
+            node = node.setdefault(digit, {})
+        node[None] = code
+    return trie
+
+
+_TRIE = _build_trie(COUNTRY_CODES)
+
+
+def plan_for(country_code):
+    """Numbering plan for a calling code, falling back to generic E.164 limits"""
+    plan = NUMBERING_PLANS.get(country_code)
+    if plan is None:
+        plan = NumberingPlan(6, 15 - len(country_code), '0', '')
+    return plan
+
+
+def match_country_code(digits):
+    """Return the calling code that prefixes `digits`, or '' if none does"""
+    node = _TRIE
+    for digit in digits[:3]:
+        node = node.get(digit)
+        if node is None:
+            return ''
+        if None in node:
+            return node[None]
+    return ''
+
+
+class ParsedNumber(NamedTuple):
+    e164: str
+    country_code: str
+    national: str
+    valid: bool
+
+
+# (min, max) national length per calling code, precomputed so the hot path is one dict lookup
+_LENGTHS = {code: plan_for(code)[:2] for code in COUNTRY_CODES}
+
+
+def _split(raw, cc, plan):
+    """Return (country_code, national digits) for a raw number; country_code is '' if unknown"""
+    digits = raw.strip()
+    international = digits.startswith('+')
+    if international:
+        digits = digits[1:]
+    if not digits.isdigit():
+        digits = _NON_DIGITS.sub('', digits)
+    if not international and digits.startswith('00'):
+        international, digits = True, digits[2:]
+    if international or not digits:
+        matched = match_country_code(digits)
+        return matched, digits[len(matched):]
+
+    lo, hi = plan.min_length, plan.max_length
+    n = len(digits)
+    if plan.trunk_prefix and digits.startswith(plan.trunk_prefix):
+        return cc, digits[len(plan.trunk_prefix):]
+    if digits.startswith(cc) and lo <= n - len(cc) <= hi:
+        return cc, digits[len(cc):]
+    if digits[0] in plan.national_leading and lo <= n <= hi:
+        return cc, digits
+    matched = match_country_code(digits)
+    if matched:
+        m_lo, m_hi = _LENGTHS[matched]
+        if m_lo <= n - len(matched) <= m_hi:
+            return matched, digits[len(matched):]
+    if lo <= n <= hi:
+        return cc, digits
+    return '', digits
+
+
+def _is_valid(code, national):
+    if not code:
+        return False
+    lo, hi = _LENGTHS[code]
+    return lo <= len(national) <= hi
+
+
+def parse_number(raw, default_country_code=None):
+    """Resolve one raw phone string to E.164.
+
+    `+`/`00` prefixed numbers are matched against the trie directly. Otherwise the
+    trunk prefix, the default country code, and the default region's usual leading
+    digits are tried before falling back to any other calling code that fits.
+    """
+    cc = default_country_code or get_config().default_country_code
+    code, national = _split(raw, cc, plan_for(cc))
+    if not code and not national:
+        return ParsedNumber('', '', '', False)
+    return ParsedNumber('+' + code + national, code, national, _is_valid(code, national))
+
+
+def to_e164(raw, default_country_code=None):
+    """E.164 string for one raw number without building a ParsedNumber"""
+    cc = default_country_code or get_config().default_country_code
+    code, national = _split(raw, cc, plan_for(cc))
+    return '+' + code + national if code or national else ''
+
+
+def normalize_numbers(phones, default_country_code=None):
+    """Normalize a whole list in one call.
+
+    Returns `(e164_numbers, valid_flags)`, two lists parallel to `phones`.
+    """
+    cc = default_country_code or get_config().default_country_code
+    plan = plan_for(cc)
+    split, lengths = _split, _LENGTHS
+    numbers, flags = [], []
+    append_number, append_flag = numbers.append, flags.append
+    for phone in phones:
+        code, national = split(phone, cc, plan)
+        if code:
+            lo, hi = lengths[code]
+            append_number('+' + code + national)
+            append_flag(lo <= len(national) <= hi)
+        else:
+            append_number('+' + national if national else '')
+            append_flag(False)
+    return numbers, flags
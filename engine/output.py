@@ -0,0 +1,159 @@
+"""Build upload-ready output buffers from generated TXT/VCF text.
+
+Content arrives as an iterable of string chunks (one vCard, one line, ...) and
+is encoded and, if asked, gzip- or zip-deflated while it is being produced, so
+the uncompressed file never exists as one big string or bytes object. Outputs
+that would pass the upload size limit roll over to `name_part2.vcf`,
+`name_part3.vcf`, ... between chunks, so a vCard is never split, and each part
+is handed out before the next one is encoded.
+"""
+import gzip
+import io
+import os
+import zipfile
+from typing import NamedTuple
+
+from .config import get_config
+
+COMPRESSIONS = {'gzip': '.gz', 'zip': '.zip'}
+_FLUSH = 64 * 1024
+# room for the gzip trailer / zip central directory and bytes still inside the compressor
+_COMPRESSED_MARGIN = 64 * 1024
+
+
+class PackedOutput(NamedTuple):
+    buffer: io.BytesIO
+    filename: str
+    raw_size: int
+    size: int
+    compression: str = None
+    # chunks of the input written to this part
+    chunks: int = 0
+
+    @property
+    def ratio(self):
+        """Uncompressed size divided by delivered size"""
+        return self.raw_size / self.size if self.size else 1.0
+
+
+def split_compression(filename, compression=None):
+    """Return `(inner filename, compression)`, taking a trailing .gz/.zip on `filename` as the choice.
+
+    Without such a suffix `compression` is used, falling back to VCF_OUTPUT_COMPRESSION.
+    """
+    lowered = filename.lower()
+    for name, extension in COMPRESSIONS.items():
+        if lowered.endswith(extension):
+            return filename[:-len(extension)], name
+    compression = compression if compression is not None else get_config().output_compression
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {sorted(COMPRESSIONS)}")
+    return filename, compression or None
+
+
+def iter_lines(items):
+    """Yield `items` as newline-separated text without a trailing newline, like '\\n'.join.
+
+    The newline goes at the end of each line, so a part boundary never starts with a blank line.
+    """
+    items = iter(items)
+    previous = next(items, None)
+    if previous is None:
+        return
+    for item in items:
+        yield previous + '\n'
+        previous = item
+    yield previous
+
+
+def part_filename(filename, number):
+    """`filename` for the first part, `name_partN.ext` for the following ones"""
+    if number == 1:
+        return filename
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}_part{number}{extension}"
+
+
+class _Part:
+    """One output file being written: a buffer, with a gzip/zip writer on top when compressing"""
+
+    def __init__(self, filename, compression):
+        self.filename = filename
+        self.compression = compression
+        self.buffer = io.BytesIO()
+        self._archive = None
+        if compression == 'gzip':
+            self._target = gzip.GzipFile(filename=filename, mode='wb', fileobj=self.buffer, mtime=0)
+        elif compression == 'zip':
+            self._archive = zipfile.ZipFile(self.buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+            self._target = self._archive.open(filename, 'w')
+        elif compression is None:
+            self._target = self.buffer
+        else:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {sorted(COMPRESSIONS)}")
+        self.raw_size = 0
+        self.chunks = 0
+        self._pending = []
+        self._pending_size = 0
+        # raw bytes the compressor may still hold (written since its output last grew)
+        self._held = 0
+
+    def write(self, data):
+        self._pending.append(data)
+        self._pending_size += len(data)
+        self.raw_size += len(data)
+        self.chunks += 1
+        if self._pending_size >= _FLUSH:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = b''.join(self._pending)
+        before = self.buffer.tell()
+        self._target.write(data)
+        self._held = len(data) if self.buffer.tell() > before else self._held + len(data)
+        self._pending = []
+        self._pending_size = 0
+
+    def size_bound(self):
+        """Upper bound of the delivered size if the part were closed now"""
+        if self.compression is None:
+            return self.buffer.tell() + self._pending_size
+        return self.buffer.tell() + self._held + self._pending_size + _COMPRESSED_MARGIN
+
+    def close(self):
+        self._flush()
+        if self._target is not self.buffer:
+            self._target.close()
+        if self._archive is not None:
+            self._archive.close()
+        delivered = self.filename + COMPRESSIONS[self.compression] if self.compression else self.filename
+        size = self.buffer.tell()
+        self.buffer.seek(0)
+        self.buffer.name = delivered
+        return PackedOutput(self.buffer, delivered, self.raw_size, size, self.compression, self.chunks)
+
+
+def pack_outputs(chunks, filename, compression=None, max_bytes=None):
+    """Encode `chunks` into in-memory files named after `filename`, optionally compressed.
+
+    `compression` is None, 'gzip' (delivered as `filename`.gz) or 'zip' (a one-member
+    archive delivered as `filename`.zip). A new part is started before any chunk that
+    would take the delivered size past `max_bytes` (default VCF_OUTPUT_MAX_BYTES, 0 for
+    no limit); a single chunk larger than the limit still gets a part of its own.
+    Yields a PackedOutput per part, buffer rewound, as soon as the part is complete; the
+    next part is only encoded when asked for, so a consumer that sends and drops each
+    part holds one part at a time.
+    """
+    max_bytes = get_config().output_max_bytes if max_bytes is None else max_bytes
+    number = 1
+    part = _Part(filename, compression)
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        if max_bytes and part.raw_size and part.size_bound() + len(data) > max_bytes:
+            yield part.close()
+            number += 1
+            part = _Part(part_filename(filename, number), compression)
+        part.write(data)
+    yield part.close()
@@ -0,0 +1,58 @@
+import re
+
+from .config import get_config
+from .numbering import to_e164
+from . import vectorized
+
+
+def extract_phone_numbers(text: str) -> list:
+    """Extract and clean phone numbers"""
+    patterns = [r'\+?62\d{8,15}', r'0\d{8,15}', r'\+\d{10,15}', r'\d{10,15}']
+    phones = []
+    
+    for pattern in patterns:
+        for match in re.findall(pattern, text):
+            clean = re.sub(r'[^\d+]', '', match)
+            if 10 <= len(clean) <= 15 and len(set(clean.replace('+', ''))) >= 3:
+                phones.append(clean)
+    
+    return list(dict.fromkeys(phones))
+
+def normalize_phone(phone):
+    """Normalize phone number format"""
+    return to_e164(phone)
+
+def normalize_phone_for_txt_output(phone):
+    """Normalize phone number for TXT output - E.164 with +, default region only applies to national numbers"""
+    return to_e164(phone)
+
+def _use_vectorized(count):
+    threshold = get_config().vectorize_threshold
+    return threshold > 0 and count >= threshold and vectorized.available()
+
+def normalize_phone_batch(phone_list):
+    """Normalize every phone to E.164 in one call, vectorized for very large lists"""
+    if _use_vectorized(len(phone_list)):
+        return vectorized.normalize_e164_vectorized(phone_list)
+    cc = get_config().default_country_code
+    return [to_e164(phone, cc) for phone in phone_list]
+
+def normalize_phone_list_format(phone_list):
+    """Normalize all phones in list to have consistent format"""
+    if not phone_list:
+        return phone_list
+    
+    if _use_vectorized(len(phone_list)):
+        return vectorized.normalize_list_format_vectorized(phone_list)
+    
+    cc = get_config().default_country_code
+    
+    # Check if any phone has + prefix
+    has_plus = any(phone.startswith('+') for phone in phone_list)
+    
+    if has_plus:
+        # If any phone has +, make sure all have +
+        return [phone if phone.startswith('+') else to_e164(phone, cc) for phone in phone_list]
+    
+    # If no phone has +, keep numbers as written
+    return list(phone_list)
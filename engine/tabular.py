@@ -0,0 +1,187 @@
+"""Streaming CSV/XLSX contact ingestion.
+
+Rows are read one at a time (csv.reader over a text wrapper, openpyxl read-only
+iterator) and only the mapped name/phone cells are kept, so sheet size does not
+change parser memory. Columns are picked by header name or 1-based index, or
+guessed from the header row when no mapping is given. A phone cell is one
+number (or several split by / , ; | or line breaks) with its formatting
+stripped and canonicalized to E.164; cells are not scanned like free text.
+"""
+import csv
+import io
+import re
+
+from .config import get_config
+from .decode import detect_encoding
+from .numbering import to_e164
+
+TABLE_EXTENSIONS = ('.csv', '.xlsx')
+
+_PHONE_HEADERS = re.compile(r'phone|telp|telepon|nomor|nomer|no\.?\s*hp|^hp$|mobile|^tel$|whatsapp|^wa$|msisdn', re.I)
+_NAME_HEADERS = re.compile(r'name|nama|contact|kontak', re.I)
+# what separates several numbers written in one cell
+_CELL_SEPARATORS = re.compile(r'[/,;|\n]+')
+_SAMPLE = 64 * 1024
+
+
+class TableError(ValueError):
+    """The CSV/XLSX upload cannot be read or has no usable phone column"""
+
+
+def iter_csv_rows(data):
+    """Yield CSV rows as lists of strings, sniffing encoding and delimiter from the first 64KB"""
+    sample = bytes(data[:_SAMPLE])
+    encoding = detect_encoding(sample)
+    text_sample = sample.decode(encoding, errors='ignore')
+    try:
+        dialect = csv.Sniffer().sniff(text_sample, delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    # a memory-mapped upload is already a binary file, so it is read in place instead of copied
+    source = data if hasattr(data, 'read') else io.BytesIO(data)
+    stream = io.TextIOWrapper(source, encoding=encoding, errors='replace', newline='')
+    yield from csv.reader(stream, dialect)
+
+
+def iter_xlsx_rows(data):
+    """Yield rows of the first worksheet through openpyxl's read-only iterator"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise TableError("XLSX support needs the openpyxl package") from e
+    try:
+        workbook = load_workbook(data if hasattr(data, 'read') else io.BytesIO(data), read_only=True, data_only=True)
+    except Exception as e:
+        raise TableError(f"not a readable XLSX file: {e}") from e
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def cell_text(value):
+    """Cell value as text; spreadsheet numbers like 6281234567890.0 lose the float tail"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def cell_phones(value):
+    """E.164 numbers in a phone cell, e.g. '0812-3456-7890' or '+60 12-345 6789 / 0813 1111 2222'"""
+    phones = []
+    for part in _CELL_SEPARATORS.split(cell_text(value)):
+        digits = re.sub(r'\D', '', part)
+        clean = ('+' if part.lstrip().startswith('+') else '') + digits
+        # same length and repeated-digit rules as extract_phone_numbers
+        if 10 <= len(clean) <= 15 and len(set(digits)) >= 3:
+            phone = to_e164(clean)
+            if phone:
+                phones.append(phone)
+    return list(dict.fromkeys(phones))
+
+
+def _resolve_column(spec, header):
+    """Column index for a header name or 1-based number, or None"""
+    if spec is None or spec == '':
+        return None
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return int(spec) - 1
+    for i, title in enumerate(header):
+        if cell_text(title).lower() == spec.lower():
+            return i
+    raise TableError(f"column {spec!r} not found in header")
+
+
+def _guess_column(header, pattern):
+    for i, title in enumerate(header):
+        if pattern.search(cell_text(title)):
+            return i
+    return None
+
+
+def map_columns(first_row, phone_column=None, name_column=None):
+    """Return (phone index, name index or None, whether first_row is a header)"""
+    config = get_config()
+    phone_column = phone_column or config.phone_column
+    name_column = name_column or config.name_column
+
+    phone_idx = _resolve_column(phone_column, first_row)
+    name_idx = _resolve_column(name_column, first_row)
+    is_header = not any(cell_phones(cell) for cell in first_row)
+    if is_header:
+        if phone_idx is None:
+            phone_idx = _guess_column(first_row, _PHONE_HEADERS)
+        if name_idx is None:
+            name_idx = _guess_column(first_row, _NAME_HEADERS)
+    if phone_idx is None:
+        # no header or no recognisable title: first column whose cell holds a phone number
+        phone_idx = next((i for i, cell in enumerate(first_row) if cell_phones(cell)), None)
+    return phone_idx, name_idx, is_header
+
+
+def iter_table_contacts(rows, phone_column=None, name_column=None):
+    """Yield `(name, phone)` per phone number found in the mapped columns; name is '' if unmapped"""
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return
+    phone_idx, name_idx, is_header = map_columns(first_row, phone_column, name_column)
+    if phone_idx is None:
+        if not is_header:
+            return
+        # header without a recognisable phone title: decide from the first data row
+        second_row = next(rows, None)
+        if second_row is None:
+            return
+        phone_idx, _, _ = map_columns(second_row)
+        if phone_idx is None:
+            raise TableError("no phone column found, set it with phone=<column>")
+        rows = _prepend(second_row, rows)
+    elif not is_header:
+        rows = _prepend(first_row, rows)
+
+    for row in rows:
+        if phone_idx >= len(row):
+            continue
+        phones = cell_phones(row[phone_idx])
+        if not phones:
+            continue
+        name = cell_text(row[name_idx]) if name_idx is not None and name_idx < len(row) else ''
+        for phone in phones:
+            yield name, phone
+
+
+def _prepend(row, rows):
+    yield row
+    yield from rows
+
+
+def parse_table(data, kind, filename, phone_column=None, name_column=None):
+    """Parse a CSV/XLSX upload into one file record for `kind` ('txt' -> phones, 'vcf' -> contacts).
+
+    Returns `(records, skipped)` like parse_zip so both feed the same upload path.
+    """
+    rows = iter_xlsx_rows(data) if filename.lower().endswith('.xlsx') else iter_csv_rows(data)
+    contacts = iter_table_contacts(rows, phone_column, name_column)
+    if kind == 'txt':
+        items = list(dict.fromkeys(phone for _, phone in contacts))
+        key = 'phone_numbers'
+    else:
+        items = [{'name': name or phone, 'phone': phone} for name, phone in contacts]
+        key = 'contacts'
+    if not items:
+        return [], 1
+    return [{'filename': filename, key: items}], 0
+
+
+def parse_column_mapping(text):
+    """Read `phone=<column>` / `name=<column>` overrides from an upload caption"""
+    mapping = {}
+    for key, value in re.findall(r'\b(phone|name)\s*=\s*("[^"]+"|[^,;\n]+)', text or '', re.I):
+        mapping[f'{key.lower()}_column'] = value.strip().strip('"')
+    return mapping
@@ -0,0 +1,113 @@
+import itertools
+import re
+
+from .phones import normalize_phone, normalize_phone_for_txt_output
+
+
+def clean_name_for_vcf(name):
+    """Clean name to be VCF compatible while preserving emojis"""
+    cleaned = re.sub(r'[;\n\r]', ' ', name)
+    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    return cleaned
+
+def parse_vcf_content(vcf_content):
+    """Parse VCF content and extract contacts"""
+    contacts = []
+    vcards = re.findall(r'BEGIN:VCARD.*?END:VCARD', vcf_content, re.DOTALL)
+    
+    for vcard in vcards:
+        name_match = re.search(r'FN:(.+)', vcard)
+        tel_match = re.search(r'TEL:(.+)', vcard)
+        
+        if name_match and tel_match:
+            name = name_match.group(1).strip()
+            phone = tel_match.group(1).strip()
+            contacts.append({'name': name, 'phone': phone})
+    
+    return contacts
+
+def iter_txt_from_vcf(contacts):
+    """Yield the TXT lines of VCF contacts (normalized phone numbers, first-seen order, no duplicates)"""
+    seen = set()
+    for contact in contacts:
+        phone = normalize_phone_for_txt_output(contact['phone'])
+        if phone not in seen:
+            seen.add(phone)
+            yield phone
+
+def create_txt_from_vcf(contacts):
+    """Convert VCF contacts to TXT format (phone numbers only) with improved normalization"""
+    if not contacts:
+        return ""
+    return '\n'.join(iter_txt_from_vcf(contacts))
+
+def iter_vcf_from_contacts(contacts):
+    """Yield one vCard string per contact"""
+    for contact in contacts:
+        yield f"BEGIN:VCARD\nVERSION:3.0\nFN:{contact['name']}\nTEL:{contact['phone']}\nEND:VCARD\n"
+
+def create_vcf_from_contacts(contacts):
+    """Create VCF content from contact list"""
+    return ''.join(iter_vcf_from_contacts(contacts))
+
+def text_vcf_filename(line):
+    """Output file name from the first line of TEXT TO VCF input"""
+    line = line.strip()
+    return line + ('.vcf' if not line.endswith('.vcf') else '')
+
+def iter_vcf_from_text(lines, contact_stats):
+    """Yield vCards from TEXT TO VCF blocks (a name line, then its phone lines; blocks separated by
+    blank lines) read from any iterable of lines after the file name line.
+
+    Only the first phone of a block is held back, until a second one shows whether names are
+    numbered, so memory does not grow with the input. Fills `contact_stats` {name: phones} as
+    blocks end; a name without phones is skipped.
+    """
+    name = first = None
+    count = 0
+    for line in itertools.chain(lines, ('',)):
+        line = line.strip()
+        if not line:
+            if count == 1:
+                yield f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL:{first}\nEND:VCARD\n"
+            if count:
+                contact_stats[name] = count
+            name = first = None
+            count = 0
+        elif name is None:
+            name = clean_name_for_vcf(line)
+        else:
+            count += 1
+            phone = normalize_phone(line)
+            if count == 1:
+                first = phone
+                continue
+            if count == 2:
+                yield f"BEGIN:VCARD\nVERSION:3.0\nFN:{name} 1\nTEL:{first}\nEND:VCARD\n"
+            yield f"BEGIN:VCARD\nVERSION:3.0\nFN:{name} {count}\nTEL:{phone}\nEND:VCARD\n"
+
+def create_vcf_content(text_input):
+    """Convert text input to VCF format"""
+    lines = text_input.strip().split('\n')
+    if len(lines) < 3:
+        return None, None, None
+
+    contact_stats = {}
+    vcf_content = ''.join(iter_vcf_from_text(lines[1:], contact_stats))
+    return vcf_content, text_vcf_filename(lines[0]), contact_stats
+
+def iter_vcf_from_phones(phone_numbers: list, contact_name: str, normalized=False):
+    """Yield one vCard string per phone, numbering names when there is more than one.
+
+    Pass `normalized=True` when the phones already went through normalize_phone_batch.
+    """
+    contact_name = clean_name_for_vcf(contact_name)
+    for i, phone in enumerate(phone_numbers, 1):
+        if not normalized:
+            phone = normalize_phone(phone)
+        name = f"{contact_name} {i}" if len(phone_numbers) > 1 else contact_name
+        yield f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL:{phone}\nEND:VCARD\n"
+
+def create_vcf_from_phones(phone_numbers: list, contact_name: str, normalized=False) -> str:
+    """Create VCF from phone list"""
+    return ''.join(iter_vcf_from_phones(phone_numbers, contact_name, normalized))
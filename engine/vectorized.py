@@ -0,0 +1,153 @@
+"""Optional NumPy batch path for E.164 normalization of very large phone lists.
+
+Numbers are loaded into a fixed-width code point matrix so prefix detection,
+trunk rewriting and `+` handling run as array operations. Rows that are not
+plain `[+]digits` or that need a foreign calling code lookup fall back to the
+scalar trie path, so output is identical to `to_e164` for every input.
+"""
+from .config import get_config
+from .numbering import _LENGTHS, match_country_code, plan_for, to_e164
+
+# numpy is optional and imported on first use so `import engine` stays fast
+np = None
+
+_PLUS, _ZERO, _NINE = ord('+'), ord('0'), ord('9')
+
+
+def available():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np is not False
+
+
+def _codes(text):
+    return np.array([ord(c) for c in text], dtype=np.uint32)
+
+
+def normalize_e164_vectorized(phones, default_country_code=None):
+    """E.164 strings for `phones`, identical to `[to_e164(p) for p in phones]`"""
+    return _normalize(phones, default_country_code, keep_plus=False)
+
+
+def normalize_list_format_vectorized(phones, default_country_code=None):
+    """Array form of normalize_phone_list_format: if any row has `+`, give the others E.164"""
+    return _normalize(phones, default_country_code, keep_plus=True)
+
+
+def _normalize(phones, default_country_code, keep_plus):
+    if not available():
+        raise RuntimeError("numpy is not installed")
+    n = len(phones)
+    if not n:
+        return []
+    cc = default_country_code or get_config().default_country_code
+    plan = plan_for(cc)
+
+    arr = np.asarray(phones, dtype=str)
+    width = arr.dtype.itemsize // 4
+    if width == 0:
+        return ['' for _ in phones]
+    codes = arr.view(np.uint32).reshape(n, width)
+    lengths = np.count_nonzero(codes, axis=1)
+
+    is_digit = (codes >= _ZERO) & (codes <= _NINE)
+    plus = codes[:, 0] == _PLUS
+    # a row is "plain" when every character after an optional leading + is a digit
+    cols = np.arange(width)
+    in_body = (cols >= plus[:, None]) & (cols < lengths[:, None])
+    plain = (lengths > plus) & ~np.any(in_body & ~is_digit, axis=1)
+    if keep_plus and not plus.any():
+        return list(phones)
+
+    first = codes[:, 0]
+    second = codes[:, 1] if width > 1 else np.zeros(n, dtype=np.uint32)
+
+    # (mask, prefix, skip) groups: output row = prefix + row[skip:]
+    groups = []
+    keep = plus if keep_plus else plus & plain
+    groups.append((keep, '', 0))
+    todo = plain & ~plus
+
+    double_zero = todo & (first == _ZERO) & (second == _ZERO)
+    groups.append((double_zero & (lengths > 2), '+', 2))
+    todo &= ~double_zero
+
+    trunk = plan.trunk_prefix
+    if trunk:
+        has_trunk = todo & _startswith(codes, trunk)
+        groups.append((has_trunk, '+' + cc, len(trunk)))
+        todo &= ~has_trunk
+
+    lo, hi = plan.min_length, plan.max_length
+    own_cc = todo & _startswith(codes, cc) & (lengths - len(cc) >= lo) & (lengths - len(cc) <= hi)
+    groups.append((own_cc, '+', 0))
+    todo &= ~own_cc
+
+    if plan.national_leading:
+        leading = np.isin(first, [ord(c) for c in plan.national_leading])
+        national = todo & leading & (lengths >= lo) & (lengths <= hi)
+        groups.append((national, '+' + cc, 0))
+        todo &= ~national
+
+    # remaining plain rows: foreign calling code via a 3-digit prefix table built from the trie
+    rest = todo & (lengths >= 3)
+    if rest.any():
+        code_len, code_lo, code_hi = _prefix_tables()
+        prefix = (codes[:, 0] - _ZERO) * 100 + (codes[:, 1] - _ZERO) * 10 + (codes[:, 2] - _ZERO)
+        prefix = np.where(rest, prefix, 0)
+        matched_len = code_len[prefix]
+        national = lengths - matched_len
+        foreign = rest & (matched_len > 0) & (national >= code_lo[prefix]) & (national <= code_hi[prefix])
+        default_fit = rest & ~foreign & (lengths >= lo) & (lengths <= hi)
+        groups.append((foreign | (rest & ~foreign & ~default_fit), '+', 0))
+        groups.append((default_fit, '+' + cc, 0))
+
+    out_width = width + 1 + len(cc)
+    out = np.zeros((n, out_width), dtype=np.uint32)
+    for mask, prefix, skip in groups:
+        rows = np.flatnonzero(mask)
+        if not rows.size:
+            continue
+        if prefix:
+            out[rows, :len(prefix)] = _codes(prefix)
+        out[rows, len(prefix):len(prefix) + width - skip] = codes[rows, skip:]
+
+    claimed = np.zeros(n, dtype=bool)
+    for mask, _, _ in groups:
+        claimed |= mask
+
+    result = out.view(f'<U{out_width}').ravel().tolist()
+    # everything not claimed by a vector group goes through the scalar trie path
+    for i in np.flatnonzero(~claimed).tolist():
+        result[i] = to_e164(phones[i], cc)
+    return result
+
+
+_prefix_cache = None
+
+
+def _prefix_tables():
+    """Per 3-digit prefix: matched calling code length and its national length bounds"""
+    global _prefix_cache
+    if _prefix_cache is None:
+        code_len = np.zeros(1000, dtype=np.int64)
+        code_lo = np.zeros(1000, dtype=np.int64)
+        code_hi = np.zeros(1000, dtype=np.int64)
+        for p in range(1000):
+            code = match_country_code(f'{p:03d}')
+            if code:
+                code_len[p] = len(code)
+                code_lo[p], code_hi[p] = _LENGTHS[code]
+        _prefix_cache = code_len, code_lo, code_hi
+    return _prefix_cache
+
+
+def _startswith(codes, prefix):
+    if len(prefix) > codes.shape[1]:
+        return np.zeros(codes.shape[0], dtype=bool)
+    return np.all(codes[:, :len(prefix)] == _codes(prefix), axis=1)
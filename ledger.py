@@ -0,0 +1,211 @@
+"""Opt-in ledger of finished conversion jobs in SQLite, for capacity planning.
+
+With JOB_LEDGER_PATH set, every job (from a session's first upload or text
+input until its session data is cleared) is written as one row: mode, outcome,
+files and bytes in and out, contacts written, wall time, time spent in its
+handlers and seconds per pipeline stage. Chats and contents are not stored.
+
+Rows go through a write-behind batcher: `JobLedger.record` only puts the row
+on a queue, and a background task writes what gathered every FLUSH_INTERVAL
+seconds in one transaction on the ledger's own thread, so handlers never wait
+on disk. When the queue is full, rows are dropped and counted instead.
+Cluster workers share one database file (WAL mode).
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+LEDGER_PATH = os.getenv('JOB_LEDGER_PATH')
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 500
+MAX_PENDING = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    mode TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration REAL NOT NULL,
+    busy REAL NOT NULL,
+    files_in INTEGER NOT NULL,
+    files_out INTEGER NOT NULL,
+    bytes_in INTEGER NOT NULL,
+    bytes_out INTEGER NOT NULL,
+    contacts INTEGER NOT NULL,
+    stages TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+COLUMNS = ('finished', 'mode', 'outcome', 'duration', 'busy', 'files_in', 'files_out',
+           'bytes_in', 'bytes_out', 'contacts', 'stages')
+
+
+class JobRecord:
+    """Counters of one job, filled by metrics helpers while its updates are handled"""
+    __slots__ = ('mode', 'started', 'busy', 'files_in', 'files_out', 'bytes_in', 'bytes_out', 'contacts',
+                 'stages', '_update_started')
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = time.time()
+        self.busy = 0.0
+        self.files_in = self.files_out = 0
+        self.bytes_in = self.bytes_out = 0
+        self.contacts = 0
+        self.stages = {}
+        self._update_started = None
+
+    def begin_update(self):
+        self._update_started = time.perf_counter()
+
+    def end_update(self):
+        if self._update_started is not None:
+            self.busy += time.perf_counter() - self._update_started
+            self._update_started = None
+
+    def add_stage(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_file(self, direction, size):
+        if direction == 'in':
+            self.files_in += 1
+            self.bytes_in += size
+        else:
+            self.files_out += 1
+            self.bytes_out += size
+
+    def add_contacts(self, count):
+        self.contacts += count
+
+    def row(self, outcome, finished=None):
+        finished = finished or time.time()
+        stages = {stage: round(seconds, 4) for stage, seconds in self.stages.items()}
+        return (finished, self.mode, outcome, round(finished - self.started, 3), round(self.busy, 4),
+                self.files_in, self.files_out, self.bytes_in, self.bytes_out, self.contacts,
+                json.dumps(stages, separators=(',', ':')))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+class JobLedger:
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, max_pending=MAX_PENDING):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._queue = None
+        self._writer = None
+        # rows taken off the queue for the next batch, written by close() if the writer is cancelled
+        self._batch = []
+        self._db = None
+        # one thread owns the connection, so SQLite never runs on the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-ledger')
+
+    def record(self, job, outcome):
+        """Queue a finished job's row; never blocks (starts the writer on first use)"""
+        if self._writer is None:
+            self._queue = asyncio.Queue(self.max_pending)
+            self._writer = asyncio.create_task(self._write_behind())
+        try:
+            self._queue.put_nowait(job.row(outcome))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Job ledger queue full, {self.dropped} jobs dropped so far")
+
+    def _take(self, limit=None):
+        rows = []
+        while self._queue is not None and not self._queue.empty() and (limit is None or len(rows) < limit):
+            rows.append(self._queue.get_nowait())
+        return rows
+
+    async def _write_behind(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = [await self._queue.get()]
+            # let a batch gather instead of committing every job on its own
+            await asyncio.sleep(self.flush_interval)
+            rows, self._batch = self._batch + self._take(self.batch_size - 1), []
+            try:
+                await loop.run_in_executor(self._executor, self._insert, rows)
+            except Exception as e:
+                logger.error(f"Job ledger write of {len(rows)} jobs failed: {e}")
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        db = self._connect()
+        with db:
+            db.executemany(f"INSERT INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def _summarize(self, rows, since):
+        self._insert(rows)
+        cursor = self._connect().execute(
+            "SELECT mode, outcome, busy, duration, contacts, files_out, bytes_in FROM jobs WHERE finished >= ?",
+            (since,))
+        modes = {}
+        for mode, outcome, busy, duration, contacts, files_out, bytes_in in cursor:
+            stats = modes.setdefault(mode, {'jobs': 0, 'failed': 0, 'cancelled': 0, 'contacts': 0, 'files_out': 0,
+                                            'bytes_in': 0, 'busy': [], 'duration': []})
+            stats['jobs'] += 1
+            if outcome in ('failed', 'cancelled'):
+                stats[outcome] += 1
+                continue
+            stats['contacts'] += contacts
+            stats['files_out'] += files_out
+            stats['bytes_in'] += bytes_in
+            stats['busy'].append(busy)
+            stats['duration'].append(duration)
+        for stats in modes.values():
+            busy, duration = stats.pop('busy'), stats.pop('duration')
+            stats['completed'] = len(busy)
+            stats['busy_seconds'] = sum(busy)
+            stats['latency'] = {pct: percentile(busy, pct) for pct in (50, 95, 99)} if busy else None
+            stats['duration_p50'] = percentile(duration, 50) if duration else None
+        return modes
+
+    async def summary(self, window):
+        """Per-mode totals and handler-time percentiles of completed jobs finished in the last `window` seconds.
+
+        Rows still waiting in the queue are written first, so the report includes them.
+        """
+        loop = asyncio.get_running_loop()
+        rows, self._batch = self._batch + self._take(), []
+        return await loop.run_in_executor(self._executor, self._summarize, rows, time.time() - window)
+
+    async def close(self):
+        """Stop the writer and write whatever is still queued"""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        loop = asyncio.get_running_loop()
+        try:
+            rows, self._batch = self._batch + self._take(), []
+            await loop.run_in_executor(self._executor, self._insert, rows)
+        except Exception as e:
+            logger.error(f"Job ledger final write failed: {e}")
+        if self._db is not None:
+            await loop.run_in_executor(self._executor, self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=False)
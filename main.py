@@ -1,21 +1,64 @@
 import os
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters, ContextTypes
 import io
 import re
 import asyncio
+import contextlib
+import functools
+import itertools
 import time
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+from engine import (
+    clean_name_for_vcf, parse_vcf_content, normalize_phone_batch,
+    merge_txt_files, merge_vcf_files, extract_phone_numbers,
+    create_vcf_content, create_vcf_from_phones, generate_custom_filenames, split_phones_into_batches,
+    decode_file_content, map_local_file, MappedFile, parse_zip, ArchiveError, parse_table, parse_column_mapping, TABLE_EXTENSIONS, TableError,
+    get_exclusion_index, exclude_exported, claim_exported, claim_exported_contacts, release_exported,
+    release_exported_contacts, compact_exported,
+    iter_lines, iter_vcf_from_contacts, iter_txt_from_vcf, pack_outputs, split_compression, iter_text_lines, iter_vcf_from_text,
+    text_vcf_filename
+)
+from transport import build_requests
+from cluster import run_ingress
+from metrics import (
+    active_sessions, count_contacts, count_file, current_job, current_mode, stage_timer, start_metrics_server
+)
+from tracing import JsonFormatter, start_trace
+from recorder import RECORD_PATH, TrafficRecorder
+from quotas import QuotaExceeded, QuotaStore, quota_settings
+from ledger import LEDGER_PATH, JobLedger, JobRecord
+from stall_watchdog import STALL_THRESHOLD, LoopWatchdog, format_reports, labelled, reports as stall_reports
+import profiling
+
+if os.getenv('LOG_FORMAT') == 'json':
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(JsonFormatter())
+    logging.basicConfig(handlers=[_handler], level=logging.INFO)
+else:
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Optional self-hosted Bot API server, e.g. http://localhost:8081 started with --local
+BOT_API_URL = os.getenv('BOT_API_URL', '').rstrip('/')
+BOT_API_LOCAL_MODE = os.getenv('BOT_API_LOCAL_MODE', '').lower() in ('1', 'true', 'yes')
+
+# Prometheus /metrics endpoint, off unless a port is given
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Worker processes; above 1 this process becomes an ingress sharding chats across them (cluster.py)
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+# seconds between checks whether the exclusion index log is due for compaction
+EXCLUSION_COMPACT_INTERVAL = 60
 
-#Validate token exists
-if not BOT_TOKEN:
-    raise ValueError("BOT_TOKEN environment variable is required!")
+# Telegram user ids allowed to run admin commands such as /profile, comma separated
+ADMIN_IDS = {int(i) for i in os.getenv('ADMIN_IDS', '').replace(' ', '').split(',') if i}
 
+# replaced by a proxy to the ingress's shared store in cluster workers
+quota_store = QuotaStore()
+
+COMPRESSION_HINT = "💡 _Akhiri dengan .gz atau .zip untuk file terkompresi (contoh: hasil.zip)_"
 
 # Menu configurations
 MENUS = {
@@ -58,130 +101,14 @@ MENUS = {
             [InlineKeyboardButton("📄 Selesai", callback_data='vcf_separate'), InlineKeyboardButton("🔗 Gabung", callback_data='vcf_merge')]
         ]
     },
-    'text_instruction': "📝 *Format input:*\n```\nnama_file_vcf\n\nnama kontak\nnomer telepon\n\nnama kontak\nnomer telepon\n```",
-    'cv_instruction': "📁 *Upload file TXT Anda*\n\n• Upload satu atau beberapa file sekaligus\n• Bot akan otomatis mendeteksi ketika upload selesai",
-    'v2_instruction': "🚀 *Mode V2 - Upload File TXT*\n\n📂 *Upload 1-10 file TXT*\n• **1 file**: Input manual format\n• **2-10 file**: Auto gabung & konfirmasi\n\n💡 *Bot akan otomatis memproses setelah upload selesai*",
-    'vcf_instruction': "🔄 *Upload file VCF Anda*\n\n• Upload satu atau beberapa file VCF\n• Bot akan otomatis mendeteksi ketika upload selesai",
-    'merge_txt_instruction': "🔗 *MERGE TXT - Upload File*\n\n📂 *Upload minimal 2 file TXT*\n• Bot akan menggabung semua file menjadi satu\n• Otomatis remove duplikat nomor telepon\n\n💡 *Bot akan memproses setelah upload selesai*",
-    'merge_vcf_instruction': "🔗 *MERGE VCF - Upload File*\n\n📂 *Upload minimal 2 file VCF*\n• Bot akan menggabung semua kontak menjadi satu file\n• Otomatis remove duplikat kontak\n\n💡 *Bot akan memproses setelah upload selesai*"
+    'text_instruction': "📝 *Format input:*\n```\nnama_file_vcf\n\nnama kontak\nnomer telepon\n\nnama kontak\nnomer telepon\n```\n\n📎 Input panjang? Upload file .txt dengan format yang sama.",
+    'cv_instruction': "📁 *Upload file TXT Anda*\n\n• Upload satu atau beberapa file sekaligus\n• File .zip berisi banyak TXT juga bisa\n• Bot akan otomatis mendeteksi ketika upload selesai",
+    'v2_instruction': "🚀 *Mode V2 - Upload File TXT*\n\n📂 *Upload 1-10 file TXT*\n• **1 file**: Input manual format\n• **2-10 file**: Auto gabung & konfirmasi\n• **File .zip**: banyak TXT sekaligus\n\n💡 *Bot akan otomatis memproses setelah upload selesai*",
+    'vcf_instruction': "🔄 *Upload file VCF Anda*\n\n• Upload satu atau beberapa file VCF\n• File .zip berisi banyak VCF juga bisa\n• Bot akan otomatis mendeteksi ketika upload selesai",
+    'merge_txt_instruction': "🔗 *MERGE TXT - Upload File*\n\n📂 *Upload minimal 2 file TXT*\n• Bot akan menggabung semua file menjadi satu\n• Otomatis remove duplikat nomor telepon\n• File .zip berisi banyak TXT juga bisa\n\n💡 *Bot akan memproses setelah upload selesai*",
+    'merge_vcf_instruction': "🔗 *MERGE VCF - Upload File*\n\n📂 *Upload minimal 2 file VCF*\n• Bot akan menggabung semua kontak menjadi satu file\n• Otomatis remove duplikat kontak\n• File .zip berisi banyak VCF juga bisa\n\n💡 *Bot akan memproses setelah upload selesai*"
 }
 
-def clean_name_for_vcf(name):
-    """Clean name to be VCF compatible while preserving emojis"""
-    cleaned = re.sub(r'[;\n\r]', ' ', name)
-    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-    return cleaned
-
-def parse_vcf_content(vcf_content):
-    """Parse VCF content and extract contacts"""
-    contacts = []
-    vcards = re.findall(r'BEGIN:VCARD.*?END:VCARD', vcf_content, re.DOTALL)
-    
-    for vcard in vcards:
-        name_match = re.search(r'FN:(.+)', vcard)
-        tel_match = re.search(r'TEL:(.+)', vcard)
-        
-        if name_match and tel_match:
-            name = name_match.group(1).strip()
-            phone = tel_match.group(1).strip()
-            contacts.append({'name': name, 'phone': phone})
-    
-    return contacts
-
-def normalize_phone_for_txt_output(phone):
-    """Normalize phone number for TXT output - only add + if missing, don't force Indonesian format"""
-    phone = phone.strip()
-    
-    # If phone already starts with +, keep it as is
-    if phone.startswith('+'):
-        return phone
-    
-    # If phone doesn't start with +, just add + prefix without assuming country
-    # Don't automatically convert to Indonesian format (+62)
-    return '+' + phone
-
-def create_txt_from_vcf(contacts):
-    """Convert VCF contacts to TXT format (phone numbers only) with improved normalization"""
-    if not contacts:
-        return ""
-    
-    phone_numbers = []
-    for contact in contacts:
-        phone = normalize_phone_for_txt_output(contact['phone'])
-        if phone not in phone_numbers:  # Avoid duplicates
-            phone_numbers.append(phone)
-    
-    return '\n'.join(phone_numbers)
-
-def normalize_phone_list_format(phone_list):
-    """Normalize all phones in list to have consistent format"""
-    if not phone_list:
-        return phone_list
-    
-    # Check if any phone has + prefix
-    has_plus = any(phone.startswith('+') for phone in phone_list)
-    
-    normalized_phones = []
-    for phone in phone_list:
-        if has_plus:
-            # If any phone has +, make sure all have +
-            if not phone.startswith('+'):
-                if phone.startswith('0'):
-                    phone = '+62' + phone[1:]
-                elif phone.startswith('62'):
-                    phone = '+' + phone
-                else:
-                    phone = '+62' + phone if len(phone) >= 10 else '+' + phone
-        else:
-            # If no phone has +, remove + from all
-            if phone.startswith('+'):
-                if phone.startswith('+62'):
-                    phone = '0' + phone[3:]
-                else:
-                    phone = phone[1:]
-        normalized_phones.append(phone)
-    
-    return normalized_phones
-
-def merge_txt_files(txt_files_data):
-    """Merge multiple TXT files and remove duplicates with consistent format"""
-    all_phones = []
-    phone_set = set()
-    
-    # Collect all phones first
-    for file_data in txt_files_data:
-        for phone in file_data['phone_numbers']:
-            if phone not in phone_set:
-                all_phones.append(phone)
-                phone_set.add(phone)
-    
-    # Normalize format consistency
-    normalized_phones = normalize_phone_list_format(all_phones)
-    
-    return normalized_phones
-
-def merge_vcf_files(vcf_files_data):
-    """Merge multiple VCF files and remove duplicates"""
-    all_contacts = []
-    contact_set = set()
-    
-    for file_data in vcf_files_data:
-        for contact in file_data['contacts']:
-            # Create unique identifier for contact (name + phone)
-            contact_id = f"{contact['name']}|{contact['phone']}"
-            if contact_id not in contact_set:
-                all_contacts.append(contact)
-                contact_set.add(contact_id)
-    
-    return all_contacts
-
-def create_vcf_from_contacts(contacts):
-    """Create VCF content from contact list"""
-    vcf_content = ""
-    for contact in contacts:
-        vcf_content += f"BEGIN:VCARD\nVERSION:3.0\nFN:{contact['name']}\nTEL:{contact['phone']}\nEND:VCARD\n"
-    return vcf_content
-
 async def show_menu(message_target, menu_key, edit=False, **kwargs):
     """Show menu with configuration"""
     menu = MENUS[menu_key]
@@ -202,6 +129,282 @@ async def string_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['waiting_for_string'] = True
     await update.message.reply_text(MENUS['text_instruction'], parse_mode='Markdown')
 
+def session_mode(user_data):
+    """Metrics label for the conversion a user is in: text, v1_default, v2, vcf_to_txt, merge_txt, ..."""
+    if user_data.get('waiting_for_string'):
+        return 'text'
+    if user_data.get('merge_mode'):
+        return f"merge_{user_data['merge_mode']}"
+    if user_data.get('cv_mode') == 'v1' and user_data.get('output_mode'):
+        return f"v1_{user_data['output_mode']}"
+    if user_data.get('cv_mode'):
+        return user_data['cv_mode']
+    if 'vcf_files_data' in user_data:
+        return 'vcf_to_txt'
+    return 'unknown'
+
+def traced(handler):
+    """Run an update handler inside a root trace span, with the session mode set for metrics"""
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        mode = session_mode(context.user_data)
+        token = current_mode.set(mode)
+        try:
+            with labelled(handler.__name__, mode), start_trace(handler.__name__, update_id=update.update_id, mode=mode):
+                return await handler(update, context)
+        finally:
+            # later callbacks of the same task (e.g. the next update when updates are not concurrent) start unlabelled
+            current_mode.reset(token)
+            if profiling.counting:
+                result = profiling.count_call()
+                if result:
+                    await send_profile_report(context.bot, result)
+    return wrapper
+
+async def track_sessions(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs after every update (handler group 1) to refresh the active sessions gauge"""
+    active_sessions.set(sum(1 for data in context.application.user_data.values() if data))
+
+async def record_update_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs before every handler (group -1) while TRAFFIC_RECORD_PATH is set"""
+    context.bot_data['traffic_recorder'].begin(update, session_mode(context.user_data or {}))
+
+async def record_update_end(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs after every handler (group 2) and writes the update's anonymized record"""
+    context.bot_data['traffic_recorder'].end(update)
+
+# buttons that run a step of the job in progress; a job ended by any other button or by a command was cancelled
+JOB_ACTIONS = {'output_default', 'output_custom', 'v2_proceed', 'vcf_separate', 'vcf_separate_zip', 'vcf_merge'}
+
+async def job_update_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs before every handler (group -2) while JOB_LEDGER_PATH is set. A job starts with the first
+    upload or text input of a session and collects stage times and counts from every update after it"""
+    user_data = context.user_data if context.user_data is not None else {}
+    job = user_data.get('job')
+    mode = session_mode(user_data)
+    message = update.message
+    if (job is None and mode != 'unknown' and message is not None and
+            (message.document or (message.text and not message.text.startswith('/')))):
+        job = user_data['job'] = JobRecord(mode)
+    if job is not None:
+        if mode != 'unknown':
+            job.mode = mode
+        job.begin_update()
+    current_job.set(job)
+
+def job_outcome(update, job):
+    """completed when the job sent output files, else cancelled or failed by how it ended"""
+    if job.files_out:
+        return 'completed'
+    if update.callback_query:
+        return 'failed' if update.callback_query.data in JOB_ACTIONS else 'cancelled'
+    if update.message and (update.message.text or '').startswith('/'):
+        return 'cancelled'
+    return 'failed'
+
+async def job_update_end(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs after every handler (group 3): a job whose session data was cleared is queued for the ledger"""
+    job = current_job.get()
+    if job is None:
+        return
+    job.end_update()
+    if (context.user_data or {}).get('job') is not job:
+        context.bot_data['job_ledger'].record(job, job_outcome(update, job))
+    current_job.set(None)
+
+def is_admin(update):
+    user = update.effective_user
+    return user is not None and user.id in ADMIN_IDS
+
+QUOTA_LABELS = {
+    'upload_bytes': "📤 Upload",
+    'numbers': "📞 Nomor diproses",
+    'jobs': "🔁 Job",
+    'files_per_job': "📁 File per job",
+}
+
+def quota_message(error):
+    """Rejection message for a QuotaExceeded"""
+    label = QUOTA_LABELS[error.limit]
+    show = format_size if error.limit == 'upload_bytes' else (lambda n: f"{n:,.0f}".replace(',', '.'))
+    if error.retry_after is None or error.amount > error.allowed:
+        return f"⛔ *Batas penggunaan tercapai*\n\n{label}: {show(error.amount)} diminta, maksimal {show(error.allowed)}"
+    window_minutes = quota_settings()['window'] // 60
+    retry_minutes = max(1, round(error.retry_after / 60))
+    return (f"⛔ *Batas penggunaan tercapai*\n\n{label}: {show(error.used)} dari {show(error.allowed)} "
+            f"per {window_minutes} menit\n⏳ Coba lagi dalam ~{retry_minutes} menit.")
+
+async def admit(update, checks, require=()):
+    """Check and charge the sender's quotas for `checks` [(limit, amount)], and check that every limit in
+    `require` still has room; replies with the reason and returns False when one is exceeded"""
+    user = update.effective_user
+    if user is None or user.id in ADMIN_IDS:
+        return True
+    try:
+        quota_store.admit_all(user.id, checks, require)
+    except QuotaExceeded as e:
+        await update.message.reply_text(quota_message(e), parse_mode='Markdown')
+        return False
+    return True
+
+def parsed_checks(context, data_key, numbers, files=1):
+    """Quota checks for an upload that parsed into `files` records holding `numbers` numbers or contacts:
+    the numbers, the job when these are the session's first records, and for V1 the VCFs the job will write"""
+    existing = len(context.user_data.get(data_key) or [])
+    checks = [('numbers', numbers)]
+    if not existing:
+        checks.append(('jobs', 1))
+    if data_key == 'txt_files_data' and context.user_data.get('cv_mode') == 'v1':
+        checks.append(('files_per_job', existing + files))
+    return checks
+
+# numbers generated between two quota admissions of a streamed conversion
+STREAM_ADMIT_BATCH = 1000
+
+async def charge_quotas(user_id, checks):
+    quota_store.admit_all(user_id, checks)
+
+def admit_streamed(update, items, loop, batch=STREAM_ADMIT_BATCH):
+    """Yield `items` (one number each) from an executor thread, admitting each batch against the sender's
+    numbers quota on the event loop before handing it on; the first batch also charges the job. Raises
+    QuotaExceeded, which ends the stream, at the first batch that does not fit"""
+    items = iter(items)
+    user = update.effective_user
+    if user is None or user.id in ADMIN_IDS:
+        yield from items
+        return
+    checks = [('jobs', 1)]
+    for chunk in iter(lambda: list(itertools.islice(items, batch)), []):
+        checks.append(('numbers', len(chunk)))
+        asyncio.run_coroutine_threadsafe(charge_quotas(user.id, checks), loop).result()
+        checks = []
+        yield from chunk
+
+async def send_profile_report(bot, result):
+    """Send a finished profiling report to the admin chat that started it"""
+    session, filename, report = result
+    document = io.BytesIO(report.encode('utf-8'))
+    document.name = filename
+    await bot.send_document(chat_id=session.chat_id, document=document, filename=filename,
+                            caption=f"📈 Profil {session.kind} selesai")
+
+async def finish_profile_later(bot, session):
+    await asyncio.sleep(session.seconds)
+    result = profiling.finish(session)
+    if result:
+        await send_profile_report(bot, result)
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin only: /profile cpu|mem [30s|20x] starts a session, /profile stop ends it early"""
+    if not is_admin(update):
+        return
+    
+    args = [arg.lower() for arg in context.args]
+    if args and args[0] == 'stop':
+        result = profiling.finish()
+        if result:
+            await send_profile_report(context.bot, result)
+        else:
+            await update.message.reply_text("ℹ️ Tidak ada profil yang sedang berjalan.")
+        return
+    
+    kind = args[0] if args else 'cpu'
+    limit = re.fullmatch(r'(\d+)([sx]?)', args[1] if len(args) > 1 else '30s')
+    if kind not in profiling.KINDS or not limit or int(limit.group(1)) <= 0:
+        await update.message.reply_text(
+            "❌ Format: `/profile cpu|mem [30s|20x]` atau `/profile stop`\n\n"
+            "• `30s` = selama 30 detik\n• `20x` = selama 20 handler berikutnya",
+            parse_mode='Markdown'
+        )
+        return
+    
+    amount = int(limit.group(1))
+    seconds, calls = (None, amount) if limit.group(2) == 'x' else (amount, None)
+    try:
+        session = profiling.start(kind, update.effective_chat.id, seconds=seconds, calls=calls)
+    except RuntimeError:
+        await update.message.reply_text("⚠️ Profil lain sedang berjalan. Gunakan /profile stop terlebih dahulu.")
+        return
+    
+    if seconds:
+        asyncio.create_task(finish_profile_later(context.bot, session))
+    span_text = f"{seconds} detik" if seconds else f"{calls} handler berikutnya"
+    await update.message.reply_text(f"📈 Profil {kind} dimulai untuk {span_text}. Laporan dikirim sebagai dokumen.")
+
+async def stalls_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin only: /stalls sends the recent event loop stall reports with their stacks"""
+    if not is_admin(update):
+        return
+    
+    report = format_reports()
+    if not report:
+        await update.message.reply_text(f"✅ Tidak ada event loop stall di atas {STALL_THRESHOLD}s.")
+        return
+    
+    document = io.BytesIO(report.encode('utf-8'))
+    filename = f"stalls-{time.strftime('%Y%m%d-%H%M%S')}.txt"
+    await update.message.reply_document(document=document, filename=filename,
+                                        caption=f"🐢 {len(stall_reports)} stall terakhir (ambang {STALL_THRESHOLD}s)")
+
+async def jobs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin only: /jobs [30m|24h|7d] reports jobs, throughput and handler time per mode from the job ledger"""
+    if not is_admin(update):
+        return
+    
+    ledger = context.bot_data.get('job_ledger')
+    if ledger is None:
+        await update.message.reply_text("ℹ️ Job ledger tidak aktif. Set JOB_LEDGER_PATH untuk mencatat job.")
+        return
+    window = re.fullmatch(r'(\d+)([mhd])', context.args[0].lower() if context.args else '24h')
+    if not window or int(window.group(1)) <= 0:
+        await update.message.reply_text("❌ Format: `/jobs [30m|24h|7d]`", parse_mode='Markdown')
+        return
+    
+    seconds = int(window.group(1)) * {'m': 60, 'h': 3600, 'd': 86400}[window.group(2)]
+    modes = await ledger.summary(seconds)
+    if not modes:
+        await update.message.reply_text(f"ℹ️ Belum ada job dalam {window.group()} terakhir.")
+        return
+    
+    hours = seconds / 3600
+    rows = [f"{'mode':<11}{'job':>5}{'gagal':>6}{'batal':>6}{'job/j':>7}{'kontak/s':>10}{'p50':>7}{'p95':>7}{'p99':>7}"]
+    for mode, stats in sorted(modes.items()):
+        latency = stats['latency']
+        rate = stats['contacts'] / stats['busy_seconds'] if stats['busy_seconds'] else 0
+        percentiles = ''.join(f"{latency[pct]:>7.2f}" if latency else f"{'-':>7}" for pct in (50, 95, 99))
+        rows.append(f"{mode:<11}{stats['jobs']:>5}{stats['failed']:>6}{stats['cancelled']:>6}"
+                    f"{stats['completed'] / hours:>7.1f}{rate:>10.0f}{percentiles}")
+    report = f"📒 *Job {window.group()} terakhir*\n```\n" + '\n'.join(rows) + "\n```\n"
+    report += "⏱️ p50/p95/p99: detik waktu handler per job selesai; kontak/s per detik waktu handler\n"
+    if ledger.dropped:
+        report += f"⚠️ {ledger.dropped} job tidak tercatat (antrean penuh)\n"
+    await update.message.reply_text(report, parse_mode='Markdown')
+
+async def close_job_ledger(application):
+    """post_shutdown hook: write the ledger rows still queued"""
+    ledger = application.bot_data.get('job_ledger')
+    if ledger is not None:
+        await ledger.close()
+
+async def compact_exclusion_index():
+    """Fold the exclusion index's append log into its base file now and then, off the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(EXCLUSION_COMPACT_INTERVAL)
+        try:
+            await loop.run_in_executor(None, compact_exported)
+        except Exception as e:
+            logger.error(f"Exclusion index compaction failed: {e}")
+
+async def start_watchdog(application):
+    """post_init hook: start the event loop stall watchdog unless STALL_THRESHOLD is 0, and exclusion
+    index compaction in a single-process bot (cluster workers only append; the ingress compacts)"""
+    if STALL_THRESHOLD > 0:
+        application.bot_data['loop_watchdog'] = LoopWatchdog().start()
+    if BOT_WORKERS <= 1 and get_exclusion_index() is not None:
+        application.bot_data['exclusion_compactor'] = asyncio.create_task(compact_exclusion_index())
+
+@traced
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -219,6 +422,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'output_custom': lambda: setup_custom_output(query, context),
         'v2_proceed': lambda: process_v2_batch(query, context),
         'vcf_separate': lambda: process_vcf_separate(query, context),
+        'vcf_separate_zip': lambda: process_vcf_separate(query, context, compression='zip'),
         'vcf_merge': lambda: setup_vcf_merge(query, context),
         'back_to_main': lambda: show_menu(query, 'main', edit=True)
     }
@@ -318,7 +522,7 @@ async def setup_custom_output(query, context):
     
     await query.edit_message_text(summary, parse_mode='Markdown')
 
-async def process_vcf_separate(query, context):
+async def process_vcf_separate(query, context, compression=None):
     """Process VCF files separately"""
     vcf_files_data = context.user_data.get('vcf_files_data', [])
     
@@ -326,17 +530,18 @@ async def process_vcf_separate(query, context):
     
     successful_files = 0
     total_processed = 0
+    total_excluded = 0
+    outputs = []
     
     for file_data in vcf_files_data:
-        filename = file_data['filename'].rsplit('.vcf', 1)[0] + '.txt'
-        txt_content = create_txt_from_vcf(file_data['contacts'])
+        filename, file_compression = split_compression(file_data['filename'].rsplit('.vcf', 1)[0] + '.txt', compression)
         
-        if txt_content:
-            txt_file = io.BytesIO(txt_content.encode('utf-8'))
-            txt_file.name = filename
-            await query.message.reply_document(document=txt_file, filename=filename)
+        phones, excluded = claim_exported(list(iter_txt_from_vcf(file_data['contacts'])))
+        total_excluded += excluded
+        if phones:
+            outputs.extend(await send_claimed(query.message, phones, iter_lines, filename, file_compression))
             successful_files += 1
-            total_processed += len(file_data['contacts'])
+            total_processed += len(phones)
             await asyncio.sleep(0.3)
     
     try:
@@ -344,8 +549,13 @@ async def process_vcf_separate(query, context):
     except:
         pass
     
+    count_contacts(total_processed)
     summary = f"🎉 *VCF TO TXT SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
     summary += f"✅ *Berhasil: {successful_files} file*\n📞 *Total: {total_processed} kontak*\n"
+    if len(outputs) > successful_files:
+        summary += output_files_summary(outputs, '')
+    summary += exclusion_summary(total_excluded)
+    summary += compression_summary(outputs)
     summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
     
     await query.message.reply_text(summary, parse_mode='Markdown')
@@ -361,111 +571,105 @@ async def setup_vcf_merge(query, context):
     
     merge_text = f"🔗 *Mode Gabung Dipilih*\n\n📋 *Detail:*\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
     merge_text += f"📁 **{total_files} file VCF** akan digabung\n📞 **{total_contacts} kontak** total\n"
-    merge_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n📝 **Masukkan nama file TXT output:**"
+    merge_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n📝 **Masukkan nama file TXT output:**\n{COMPRESSION_HINT}"
     
     await query.edit_message_text(merge_text, parse_mode='Markdown')
 
-def extract_phone_numbers(text: str) -> list:
-    """Extract and clean phone numbers"""
-    patterns = [r'\+?62\d{8,15}', r'0\d{8,15}', r'\+\d{10,15}', r'\d{10,15}']
-    phones = []
-    
-    for pattern in patterns:
-        for match in re.findall(pattern, text):
-            clean = re.sub(r'[^\d+]', '', match)
-            if 10 <= len(clean) <= 15 and len(set(clean.replace('+', ''))) >= 3:
-                phones.append(clean)
-    
-    return list(dict.fromkeys(phones))
-
-def normalize_phone(phone):
-    """Normalize phone number format"""
-    phone = phone.strip()
-    if not phone.startswith('+'):
-        if phone.startswith('0'):
-            phone = '+62' + phone[1:]
-        elif phone.startswith('62'):
-            phone = '+' + phone
-        else:
-            phone = '+62' + phone if len(phone) >= 10 and not phone.startswith('1') else '+' + phone
-    return phone
-
-def create_vcf_content(text_input):
-    """Convert text input to VCF format"""
-    lines = [l.strip() for l in text_input.strip().split('\n')]
-    if len(lines) < 3:
-        return None, None, None
-    
-    filename = lines[0] + ('.vcf' if not lines[0].endswith('.vcf') else '')
-    contact_blocks = [b.strip() for b in '\n'.join(lines[1:]).split('\n\n') if b.strip()]
-    
-    vcf_content = ""
-    contact_stats = {}
-    
-    for block in contact_blocks:
-        contact_lines = [l for l in block.split('\n') if l.strip()]
-        if len(contact_lines) < 2:
-            continue
-            
-        name_base = clean_name_for_vcf(contact_lines[0])
-        phones = contact_lines[1:]
-        contact_stats[name_base] = len(phones)
-        
-        for i, phone in enumerate(phones, 1):
-            phone = normalize_phone(phone)
-            name = f"{name_base} {i}" if len(phones) > 1 else name_base
-            vcf_content += f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL:{phone}\nEND:VCARD\n"
-    
-    return vcf_content, filename, contact_stats
-
-def create_vcf_from_phones(phone_numbers: list, contact_name: str) -> str:
-    """Create VCF from phone list"""
-    contact_name = clean_name_for_vcf(contact_name)
-    vcf_content = ""
-    for i, phone in enumerate(phone_numbers, 1):
-        phone = normalize_phone(phone)
-        name = f"{contact_name} {i}" if len(phone_numbers) > 1 else contact_name
-        vcf_content += f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL:{phone}\nEND:VCARD\n"
-    return vcf_content
-
-def generate_custom_filenames(base_name: str, total_files: int) -> list:
-    """Generate custom filenames with incremental numbers"""
-    match = re.search(r'(.+?)(\d+)$', base_name)
-    if not match:
-        return []
-    
-    base_part = match.group(1)
-    start_number = int(match.group(2))
-    
-    return [f"{base_part}{start_number + i}.vcf" for i in range(total_files)]
-
-def split_phones_into_batches(phones: list, contacts_per_file: int, total_files: int) -> list:
-    """Split phone numbers into batches for V2 processing"""
-    batches = []
-    phones_per_batch = len(phones) // total_files
-    remainder = len(phones) % total_files
-    
-    start_idx = 0
-    for i in range(total_files):
-        batch_size = min(contacts_per_file, phones_per_batch + (1 if i < remainder else 0))
-        end_idx = start_idx + batch_size
-        if end_idx > len(phones):
-            end_idx = len(phones)
-        batches.append(phones[start_idx:end_idx])
-        start_idx = end_idx
-        if start_idx >= len(phones):
-            break
-    
-    return [batch for batch in batches if batch]
-
 async def send_vcf_file(update, filename, vcf_content, stats_msg=None):
     """Send VCF file with optional caption"""
     vcf_file = io.BytesIO(vcf_content.encode('utf-8'))
     vcf_file.name = filename
-    await update.message.reply_document(
-        document=vcf_file, filename=filename,
-        caption=stats_msg, parse_mode='Markdown' if stats_msg else None
-    )
+    with stage_timer('send'):
+        await update.message.reply_document(
+            document=vcf_file, filename=filename,
+            caption=stats_msg, parse_mode='Markdown' if stats_msg else None
+        )
+        count_file('out', vcf_file.getbuffer().nbytes)
+
+async def send_output(message, chunks, filename, compression=None):
+    """Encode (and compress, if asked) output chunks off the event loop and send every part"""
+    return await send_parts(message, pack_outputs(chunks, filename, compression))
+
+async def send_parts(message, parts, sent=None):
+    """Send the parts of a pack_outputs generator, packing each off the event loop only after the
+    previous one was sent and dropped; returns the sent parts without their buffers. They are appended
+    to `sent` when one is given, so a caller still sees what was delivered if a later part fails"""
+    loop = asyncio.get_running_loop()
+    sent = [] if sent is None else sent
+    while True:
+        with stage_timer('generate'):
+            packed = await loop.run_in_executor(None, next, parts, None)
+        if packed is None:
+            return sent
+        if sent:
+            await asyncio.sleep(0.3)
+        with stage_timer('send'):
+            await message.reply_document(document=packed.buffer, filename=packed.filename)
+            count_file('out', packed.size)
+        packed.buffer.close()
+        sent.append(packed._replace(buffer=None))
+
+@contextlib.contextmanager
+def releasing(claimed, release=release_exported):
+    """Give `claimed` exclusion index entries back if the block fails to deliver them"""
+    try:
+        yield
+    except BaseException:
+        release(claimed)
+        raise
+
+async def send_claimed(message, claimed, chunks, filename, compression=None, release=release_exported):
+    """send_output for items claimed from the exclusion index, rendered by `chunks` as one chunk each;
+    if sending fails, the items not in a delivered part are released again"""
+    sent = []
+    try:
+        return await send_parts(message, pack_outputs(chunks(claimed), filename, compression), sent)
+    except BaseException:
+        release(claimed[sum(packed.chunks for packed in sent):])
+        raise
+
+# per-name lines in a TEXT TO VCF summary; an uploaded file can hold far more names than a message fits
+MAX_STATS_NAMES = 20
+
+def contact_stats_summary(contact_stats):
+    """'👤 name: N kontak' lines of a TEXT TO VCF job, cut off after MAX_STATS_NAMES names"""
+    summary = ''.join(f"👤 {name}: {count} kontak\n"
+                      for name, count in itertools.islice(contact_stats.items(), MAX_STATS_NAMES))
+    if len(contact_stats) > MAX_STATS_NAMES:
+        summary += f"👥 ... dan {len(contact_stats) - MAX_STATS_NAMES} nama lainnya\n"
+    return summary
+
+def format_size(num_bytes):
+    """Human readable byte count for summaries"""
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+def output_files_summary(outputs, filename):
+    """'📁 File' summary line, listing every part when the output was split"""
+    if len(outputs) <= 1:
+        return f"📁 *File: {outputs[0].filename if outputs else filename}*\n"
+    summary = f"📁 *File: {len(outputs)} bagian*\n"
+    summary += ''.join(f"   • `{packed.filename}` ({format_size(packed.size)})\n" for packed in outputs)
+    return summary
+
+def compression_summary(outputs):
+    """Summary line with the compression ratio of compressed outputs, or "" when none were compressed"""
+    compressed = [packed for packed in outputs if packed.compression]
+    if not compressed:
+        return ""
+    raw_size = sum(packed.raw_size for packed in compressed)
+    size = sum(packed.size for packed in compressed)
+    ratio = raw_size / size if size else 1.0
+    return f"🗜️ *Kompresi: {format_size(raw_size)} → {format_size(size)} ({ratio:.1f}x)*\n"
+
+def exclusion_summary(excluded):
+    """Summary line for numbers skipped because an earlier job already exported them"""
+    if get_exclusion_index() is None:
+        return ""
+    return f"🚫 *Dikecualikan: {excluded} nomor (sudah pernah diekspor)*\n"
 
 async def update_upload_status(update, context, file_count, file_type='txt'):
     """Update upload status message"""
@@ -529,7 +733,8 @@ async def show_vcf_selection(context):
     details = f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n📁 **{total_files} file VCF** berhasil dianalisis\n📞 **{total_contacts} kontak** ditemukan\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
     
     reply_markup = InlineKeyboardMarkup([
-        [InlineKeyboardButton("📄 Selesai", callback_data='vcf_separate'), InlineKeyboardButton("🔗 Gabung", callback_data='vcf_merge')]
+        [InlineKeyboardButton("📄 Selesai", callback_data='vcf_separate'), InlineKeyboardButton("🔗 Gabung", callback_data='vcf_merge')],
+        [InlineKeyboardButton("🗜️ Selesai (ZIP)", callback_data='vcf_separate_zip')]
     ])
     
     selection_text = f"🔄 *VCF TO TXT - Pilih Output:*\n\n📋 *Detail:*\n{details}\n\n*Pilih mode konversi:*"
@@ -544,16 +749,14 @@ async def show_merge_txt_filename_request(context):
     """Show merge TXT filename request after upload completion"""
     merge_txt_files_data = context.user_data.get('merge_txt_files_data', [])
     total_files = len(merge_txt_files_data)
-    merged_phones = merge_txt_files(merge_txt_files_data)
-    total_phones = len(merged_phones)
-    unique_phones = len(set(merged_phones))
+    total_phones = sum(len(f['phone_numbers']) for f in merge_txt_files_data)
     
-    context.user_data['merged_phones'] = merged_phones
+    # the merge itself streams into the output once the file name is known
     context.user_data['waiting_for_merge_txt_filename'] = True
     
     merge_text = f"🔗 *MERGE TXT - Siap Digabung*\n\n📋 *Detail:*\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    merge_text += f"📁 **{total_files} file TXT** akan digabung\n📊 **{total_phones} nomor** total\n📞 **{unique_phones} nomor** unik (duplikat dihapus)\n"
-    merge_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n📝 **Masukkan nama file TXT output:**"
+    merge_text += f"📁 **{total_files} file TXT** akan digabung\n📊 **{total_phones} nomor** total (duplikat akan dihapus)\n"
+    merge_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n📝 **Masukkan nama file TXT output:**\n{COMPRESSION_HINT}"
     
     if 'upload_status_message' in context.user_data:
         try:
@@ -565,7 +768,8 @@ async def show_merge_vcf_filename_request(context):
     """Show merge VCF filename request after upload completion"""
     merge_vcf_files_data = context.user_data.get('merge_vcf_files_data', [])
     total_files = len(merge_vcf_files_data)
-    merged_contacts = merge_vcf_files(merge_vcf_files_data)
+    with stage_timer('merge'):
+        merged_contacts = merge_vcf_files(merge_vcf_files_data)
     total_contacts = len(merged_contacts)
     original_total = sum(len(f['contacts']) for f in merge_vcf_files_data)
     
@@ -574,7 +778,7 @@ async def show_merge_vcf_filename_request(context):
     
     merge_text = f"🔗 *MERGE VCF - Siap Digabung*\n\n📋 *Detail:*\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
     merge_text += f"📁 **{total_files} file VCF** akan digabung\n📊 **{original_total} kontak** total\n📞 **{total_contacts} kontak** unik (duplikat dihapus)\n"
-    merge_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n📝 **Masukkan nama file VCF output:**"
+    merge_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n📝 **Masukkan nama file VCF output:**\n{COMPRESSION_HINT}"
     
     if 'upload_status_message' in context.user_data:
         try:
@@ -684,18 +888,107 @@ async def process_v2_batch(query, context):
     for file_data in txt_files_data:
         all_phones.extend(file_data['phone_numbers'])
     
-    # Normalize format consistency for merged phones
-    all_phones = normalize_phone_list_format(all_phones)
+    # Normalize once to E.164 so the V2 generator can skip per-number normalization
+    with stage_timer('merge'):
+        all_phones = normalize_phone_batch(all_phones)
     
     context.user_data['merged_phones'] = all_phones
     context.user_data['waiting_for_v2_format'] = True
     
     await show_v2_format_input(context)
 
+# Upload states that accept files: (waiting flag, archive member kind, files data key, upload status type)
+UPLOAD_TARGETS = [
+    ('waiting_for_txt_files', 'txt', 'txt_files_data', 'txt'),
+    ('waiting_for_vcf_files', 'vcf', 'vcf_files_data', 'vcf'),
+    ('waiting_for_merge_txt_files', 'txt', 'merge_txt_files_data', 'merge_txt'),
+    ('waiting_for_merge_vcf_files', 'vcf', 'merge_vcf_files_data', 'merge_vcf'),
+]
+
+@contextlib.asynccontextmanager
+async def read_document(context, document):
+    """Upload content: memory-mapped from the local Bot API server's disk in local mode, downloaded otherwise.
+    A mapped file is unmapped when the block exits, so parse it inside and keep only what parsing returns."""
+    with stage_timer('download'):
+        file = await context.bot.get_file(document.file_id)
+        if context.bot.local_mode and file.file_path and os.path.isfile(file.file_path):
+            content = map_local_file(file.file_path)
+        else:
+            content = await file.download_as_bytearray()
+        count_file('in', len(content))
+    try:
+        yield content
+    finally:
+        if isinstance(content, MappedFile):
+            content.close()
+
+async def ingest_parsed_upload(update, context, document, parse):
+    """Handle a ZIP/CSV/XLSX upload: run `parse(bytes, kind)` off the event loop and add its records as one batch"""
+    waiting_flag, kind, data_key, status_type = next(t for t in UPLOAD_TARGETS if context.user_data.get(t[0]))
+    
+    try:
+        # Parsing is CPU-bound, keep it off the event loop
+        async with read_document(context, document) as file_content:
+            with stage_timer('parse'):
+                files_data, skipped = await asyncio.get_running_loop().run_in_executor(
+                    None, parse, file_content, kind
+                )
+        
+        if not files_data:
+            await update.message.reply_text(f"❌ Tidak ditemukan data yang valid dalam file {document.file_name}")
+            return
+        
+        # one archive or sheet can hold many files, so the batch is admitted as a whole
+        numbers = sum(len(f.get('phone_numbers') or f.get('contacts') or []) for f in files_data)
+        if not await admit(update, parsed_checks(context, data_key, numbers, len(files_data))):
+            return
+        
+        context.user_data[data_key].extend(files_data)
+        context.user_data['last_upload_time'] = time.time()
+        
+        await update_upload_status(update, context, len(context.user_data[data_key]), status_type)
+        if skipped:
+            await update.message.reply_text(f"⚠️ {skipped} file dalam arsip {document.file_name} dilewati (bukan {kind.upper()} atau kosong)")
+        asyncio.create_task(delayed_check(context))
+        
+    except (ArchiveError, TableError) as e:
+        await update.message.reply_text(f"❌ File {document.file_name} tidak dapat diproses: {e}")
+    except Exception as e:
+        logger.error(f"Error processing {document.file_name}: {e}")
+        await update.message.reply_text("❌ Terjadi kesalahan saat memproses file.")
+
+@traced
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle TXT and VCF file uploads"""
     document = update.message.document
     
+    # Quotas with room left are checked before anything is downloaded; numbers, files and the job itself
+    # are admitted once the upload is parsed, so a rejected first upload does not use up a job
+    target = next((t for t in UPLOAD_TARGETS if context.user_data.get(t[0])), None)
+    if target or context.user_data.get('waiting_for_string'):
+        checks, require = [('upload_bytes', document.file_size or 0)], ['numbers']
+        if not target or not context.user_data.get(target[2]):
+            require.append('jobs')
+        if target and context.user_data.get('cv_mode') == 'v1':
+            # V1 writes one VCF per uploaded TXT; a full job is turned away before the download
+            checks.append(('files_per_job', len(context.user_data.get(target[2]) or []) + 1))
+        if not await admit(update, checks, require=require):
+            return
+    
+    # ZIP archives and CSV/XLSX sheets are accepted in every upload state
+    if any(context.user_data.get(t[0]) for t in UPLOAD_TARGETS):
+        file_name = document.file_name.lower()
+        if file_name.endswith('.zip'):
+            # Members are decompressed one by one and parsed in a process pool
+            await ingest_parsed_upload(update, context, document, parse_zip)
+            return
+        if file_name.endswith(TABLE_EXTENSIONS):
+            # Column mapping can be overridden per upload with a caption like "phone=HP, name=Nama"
+            columns = parse_column_mapping(update.message.caption)
+            parse = functools.partial(parse_table, filename=document.file_name, **columns)
+            await ingest_parsed_upload(update, context, document, parse)
+            return
+    
     # Handle TXT files for CV modes
     if (context.user_data.get('waiting_for_txt_files') and 
         context.user_data.get('cv_mode') in ['v1', 'v2'] and
@@ -707,25 +1000,21 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         try:
-            file = await context.bot.get_file(document.file_id)
-            file_content = await file.download_as_bytearray()
-            
-            text_content = None
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    text_content = file_content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            async with read_document(context, document) as file_content:
+                with stage_timer('decode'):
+                    text_content = decode_file_content(file_content)
             
             if not text_content:
                 await update.message.reply_text(f"❌ Tidak dapat membaca file {document.file_name}")
                 return
             
-            phone_numbers = extract_phone_numbers(text_content)
+            with stage_timer('parse'):
+                phone_numbers = extract_phone_numbers(text_content)
             if not phone_numbers:
                 await update.message.reply_text(f"❌ Tidak ditemukan nomor telepon dalam file {document.file_name}")
                 return
+            if not await admit(update, parsed_checks(context, 'txt_files_data', len(phone_numbers))):
+                return
             
             context.user_data['txt_files_data'].append({
                 'filename': document.file_name,
@@ -745,25 +1034,21 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
           document.file_name.lower().endswith('.vcf')):
         
         try:
-            file = await context.bot.get_file(document.file_id)
-            file_content = await file.download_as_bytearray()
-            
-            vcf_content = None
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    vcf_content = file_content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            async with read_document(context, document) as file_content:
+                with stage_timer('decode'):
+                    vcf_content = decode_file_content(file_content)
             
             if not vcf_content:
                 await update.message.reply_text(f"❌ Tidak dapat membaca file {document.file_name}")
                 return
             
-            contacts = parse_vcf_content(vcf_content)
+            with stage_timer('parse'):
+                contacts = parse_vcf_content(vcf_content)
             if not contacts:
                 await update.message.reply_text(f"❌ Tidak ditemukan kontak dalam file {document.file_name}")
                 return
+            if not await admit(update, parsed_checks(context, 'vcf_files_data', len(contacts))):
+                return
             
             context.user_data['vcf_files_data'].append({
                 'filename': document.file_name,
@@ -783,25 +1068,21 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
           document.file_name.lower().endswith('.txt')):
         
         try:
-            file = await context.bot.get_file(document.file_id)
-            file_content = await file.download_as_bytearray()
-            
-            text_content = None
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    text_content = file_content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            async with read_document(context, document) as file_content:
+                with stage_timer('decode'):
+                    text_content = decode_file_content(file_content)
             
             if not text_content:
                 await update.message.reply_text(f"❌ Tidak dapat membaca file {document.file_name}")
                 return
             
-            phone_numbers = extract_phone_numbers(text_content)
+            with stage_timer('parse'):
+                phone_numbers = extract_phone_numbers(text_content)
             if not phone_numbers:
                 await update.message.reply_text(f"❌ Tidak ditemukan nomor telepon dalam file {document.file_name}")
                 return
+            if not await admit(update, parsed_checks(context, 'merge_txt_files_data', len(phone_numbers))):
+                return
             
             context.user_data['merge_txt_files_data'].append({
                 'filename': document.file_name,
@@ -821,25 +1102,21 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
           document.file_name.lower().endswith('.vcf')):
         
         try:
-            file = await context.bot.get_file(document.file_id)
-            file_content = await file.download_as_bytearray()
-            
-            vcf_content = None
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    vcf_content = file_content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            async with read_document(context, document) as file_content:
+                with stage_timer('decode'):
+                    vcf_content = decode_file_content(file_content)
             
             if not vcf_content:
                 await update.message.reply_text(f"❌ Tidak dapat membaca file {document.file_name}")
                 return
             
-            contacts = parse_vcf_content(vcf_content)
+            with stage_timer('parse'):
+                contacts = parse_vcf_content(vcf_content)
             if not contacts:
                 await update.message.reply_text(f"❌ Tidak ditemukan kontak dalam file {document.file_name}")
                 return
+            if not await admit(update, parsed_checks(context, 'merge_vcf_files_data', len(contacts))):
+                return
             
             context.user_data['merge_vcf_files_data'].append({
                 'filename': document.file_name,
@@ -854,22 +1131,82 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error(f"Error processing MERGE VCF file: {e}")
             await update.message.reply_text("❌ Terjadi kesalahan saat memproses file VCF untuk merge.")
     
+    # Handle TXT files for TEXT TO VCF mode
+    elif (context.user_data.get('waiting_for_string') and
+          document.file_name.lower().endswith('.txt')):
+        await convert_text_file(update, context, document)
+    
     else:
         await update.message.reply_text("❌ Silakan gunakan menu untuk memulai proses konversi atau upload file dengan format yang benar.")
 
+async def convert_text_file(update, context, document):
+    """TEXT TO VCF from an uploaded TXT in the pasted-text format, streamed line by line into output parts that
+    are sent one at a time; numbers are admitted against the quota in batches as they are generated"""
+    try:
+        async with read_document(context, document) as file_content:
+            loop = asyncio.get_running_loop()
+            lines = iter_text_lines(file_content)
+            first_line = next((line.strip() for line in lines if line.strip()), '')
+            filename, compression = split_compression(first_line)
+            filename = text_vcf_filename(filename)
+            
+            # vCards are generated while each part is packed, off the event loop
+            contact_stats = {}
+            vcards = iter_vcf_from_text(lines, contact_stats)
+            with stage_timer('generate'):
+                first = await loop.run_in_executor(None, next, vcards, None)
+            if first is None:
+                await update.message.reply_text(
+                    f"❌ Format file {document.file_name} tidak valid! Pastikan format:\n```\nnama_file\n\nnama kontak\nnomer telepon\n```",
+                    parse_mode='Markdown'
+                )
+                context.user_data.clear()
+                return
+            
+            vcards = admit_streamed(update, itertools.chain((first,), vcards), loop)
+            try:
+                outputs = await send_output(update.message, vcards, filename, compression)
+            except QuotaExceeded as e:
+                # parts already sent stay with the user, the rest of the upload is not converted
+                await update.message.reply_text(quota_message(e), parse_mode='Markdown')
+                context.user_data.clear()
+                return
+        
+        total_contacts = sum(contact_stats.values())
+        count_contacts(total_contacts)
+        
+        summary = f"✅ *File {filename} berhasil dibuat!*\n\n📊 *DETAIL:*\n━━━━━━━━━━━━━━━━━━━\n"
+        summary += contact_stats_summary(contact_stats)
+        summary += f"━━━━━━━━━━━━━━━━━━━\n🔢 *Total: {total_contacts} kontak*\n"
+        if len(outputs) > 1:
+            summary += output_files_summary(outputs, filename)
+        summary += compression_summary(outputs)
+        summary += f"\n💡 Gunakan /start untuk konversi baru."
+        await update.message.reply_text(summary, parse_mode='Markdown')
+        context.user_data.clear()
+        
+    except Exception as e:
+        logger.error(f"Error processing TEXT TO VCF file {document.file_name}: {e}")
+        await update.message.reply_text("❌ Terjadi kesalahan saat memproses file.")
+        context.user_data.clear()
+
 async def delayed_check(context):
     """Delayed upload completion check"""
     await asyncio.sleep(4.0)
     await check_upload_completion(context)
 
+@traced
 async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text input for all modes"""
     user_input = update.message.text.strip()
     
     # TEXT TO VCF V1 mode
     if context.user_data.get('waiting_for_string'):
+        if not await admit(update, [], require=('jobs', 'numbers')):
+            return
         try:
-            vcf_content, filename, contact_stats = create_vcf_content(user_input)
+            with stage_timer('generate'):
+                vcf_content, filename, contact_stats = create_vcf_content(user_input)
             if not all([vcf_content, filename, contact_stats]):
                 await update.message.reply_text(
                     "❌ Format tidak valid! Pastikan format:\n```\nnama_file\n\nnama kontak\nnomer telepon\n```",
@@ -878,9 +1215,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
             
             total_contacts = sum(contact_stats.values())
+            if not await admit(update, [('numbers', total_contacts), ('jobs', 1)]):
+                return
+            count_contacts(total_contacts)
             stats_msg = f"✅ *File {filename} berhasil dibuat!*\n\n📊 *DETAIL:*\n━━━━━━━━━━━━━━━━━━━\n"
-            for name, count in contact_stats.items():
-                stats_msg += f"👤 {name}: {count} kontak\n"
+            stats_msg += contact_stats_summary(contact_stats)
             stats_msg += f"━━━━━━━━━━━━━━━━━━━\n🔢 *Total: {total_contacts} kontak*\n\n💡 Gunakan /start untuk konversi baru."
             
             await send_vcf_file(update, filename, vcf_content, stats_msg)
@@ -905,8 +1244,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if contacts_per_file <= 0 or total_files <= 0:
                 await update.message.reply_text("❌ Jumlah kontak dan file harus lebih dari 0!")
                 return
+            if not await admit(update, [('files_per_job', total_files)]):
+                return
             
-            phones = context.user_data.get('merged_phones') or context.user_data['txt_files_data'][0]['phone_numbers']
+            phones = context.user_data.get('merged_phones') or normalize_phone_batch(context.user_data['txt_files_data'][0]['phone_numbers'])
+            phones, excluded = exclude_exported(phones)
             
             if len(phones) < contacts_per_file:
                 await update.message.reply_text(f"❌ Tidak cukup nomor! Tersedia {len(phones)}, diminta {contacts_per_file} per file.")
@@ -921,10 +1263,16 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             for i, batch in enumerate(phone_batches):
                 filename = f"{file_base}{start_num + i}.vcf"
-                vcf_content = create_vcf_from_phones(batch, contact_name)
-                
+                # claimed right before generating, so a concurrent job cannot hand out the same numbers
+                batch, taken = claim_exported(batch)
+                excluded += taken
+                with releasing(batch):
+                    with stage_timer('generate'):
+                        vcf_content = create_vcf_from_phones(batch, contact_name, normalized=True)
+                    
+                    if vcf_content:
+                        await send_vcf_file(update, filename, vcf_content)
                 if vcf_content:
-                    await send_vcf_file(update, filename, vcf_content)
                     successful_files += 1
                     total_processed += len(batch)
                     await asyncio.sleep(0.3)
@@ -934,10 +1282,12 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except:
                 pass
             
+            count_contacts(total_processed)
             summary = f"🎉 *V2 BATCH SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
             summary += f"✅ *Berhasil: {successful_files} file*\n"
             summary += f"👤 *Nama: {contact_name}*\n📞 *Total: {total_processed} kontak*\n"
             summary += f"📁 *Pattern: {file_base}{start_num}-{start_num + successful_files - 1}.vcf*\n"
+            summary += exclusion_summary(excluded)
             summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
             
             await update.message.reply_text(summary, parse_mode='Markdown')
@@ -951,7 +1301,7 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # VCF merge filename input
     elif context.user_data.get('waiting_for_merge_filename'):
-        filename = user_input.strip()
+        filename, compression = split_compression(user_input.strip())
         if not filename:
             await update.message.reply_text("❌ Nama file tidak boleh kosong!")
             return
@@ -963,25 +1313,24 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             processing_msg = await update.message.reply_text("🔄 Menggabung file VCF ke TXT...")
             
             vcf_files_data = context.user_data.get('vcf_files_data', [])
-            all_contacts = []
+            contacts = itertools.chain.from_iterable(file_data['contacts'] for file_data in vcf_files_data)
+            phones, excluded = claim_exported(list(iter_txt_from_vcf(contacts)))
+            outputs = []
             
-            for file_data in vcf_files_data:
-                all_contacts.extend(file_data['contacts'])
-            
-            merged_txt_content = create_txt_from_vcf(all_contacts)
-            
-            if merged_vcf_content:
-                vcf_file = io.BytesIO(merged_vcf_content.encode('utf-8'))
-                vcf_file.name = filename
-                await update.message.reply_document(document=vcf_file, filename=filename)
+            if phones:
+                outputs.extend(await send_claimed(update.message, phones, iter_lines, filename, compression))
             
             try:
                 await processing_msg.delete()
             except:
                 pass
             
+            count_contacts(len(phones))
             summary = f"🎉 *MERGE VCF SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
-            summary += f"📁 *File: {filename}*\n📞 *Total: {len(merged_contacts)} kontak*\n"
+            summary += output_files_summary(outputs, filename)
+            summary += f"📞 *Total: {len(phones)} kontak*\n"
+            summary += exclusion_summary(excluded)
+            summary += compression_summary(outputs)
             summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
             
             await update.message.reply_text(summary, parse_mode='Markdown')
@@ -1005,15 +1354,21 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             successful_files = 0
             total_processed = 0
+            total_excluded = 0
             
             for file_data in txt_files_data:
                 filename = file_data['filename'].rsplit('.txt', 1)[0] + '.vcf'
-                # Normalize phone format consistency before creating VCF
-                normalized_phones = normalize_phone_list_format(file_data['phone_numbers'])
-                vcf_content = create_vcf_from_phones(normalized_phones, contact_name)
-                
+                # Normalize phones once before creating VCF
+                normalized_phones = normalize_phone_batch(file_data['phone_numbers'])
+                normalized_phones, excluded = claim_exported(normalized_phones)
+                total_excluded += excluded
+                with releasing(normalized_phones):
+                    with stage_timer('generate'):
+                        vcf_content = create_vcf_from_phones(normalized_phones, contact_name, normalized=True)
+                    
+                    if vcf_content:
+                        await send_vcf_file(update, filename, vcf_content)
                 if vcf_content:
-                    await send_vcf_file(update, filename, vcf_content)
                     successful_files += 1
                     total_processed += len(normalized_phones)
                     await asyncio.sleep(0.3)
@@ -1023,9 +1378,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except:
                 pass
             
+            count_contacts(total_processed)
             summary = f"🎉 *DEFAULT MODE SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
             summary += f"✅ *Berhasil: {successful_files} file*\n"
             summary += f"👤 *Nama: {contact_name}*\n📞 *Total: {total_processed} kontak*\n"
+            summary += exclusion_summary(total_excluded)
             summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
             
             await update.message.reply_text(summary, parse_mode='Markdown')
@@ -1077,7 +1434,7 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # MERGE TXT filename input
     elif context.user_data.get('waiting_for_merge_txt_filename'):
-        filename = user_input.strip()
+        filename, compression = split_compression(user_input.strip())
         if not filename:
             await update.message.reply_text("❌ Nama file tidak boleh kosong!")
             return
@@ -1088,21 +1445,32 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             processing_msg = await update.message.reply_text("🔄 Menggabung file TXT...")
             
-            merged_phones = context.user_data.get('merged_phones', [])
-            merged_txt_content = '\n'.join(merged_phones)
+            merge_txt_files_data = context.user_data.get('merge_txt_files_data', [])
+            total_phones = sum(len(f['phone_numbers']) for f in merge_txt_files_data)
+            with stage_timer('merge'):
+                merged_phones = await asyncio.get_running_loop().run_in_executor(
+                    None, list, merge_txt_files(merge_txt_files_data)
+                )
+            duplicates = total_phones - len(merged_phones)
+            merged_phones, excluded = claim_exported(merged_phones)
+            outputs = []
             
-            if merged_txt_content:
-                txt_file = io.BytesIO(merged_txt_content.encode('utf-8'))
-                txt_file.name = filename
-                await update.message.reply_document(document=txt_file, filename=filename)
+            if merged_phones:
+                outputs.extend(await send_claimed(update.message, merged_phones, iter_lines, filename, compression))
             
             try:
                 await processing_msg.delete()
             except:
                 pass
             
+            count_contacts(len(merged_phones))
             summary = f"🎉 *MERGE TXT SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
-            summary += f"📁 *File: {filename}*\n📞 *Total: {len(merged_phones)} nomor*\n"
+            summary += output_files_summary(outputs, filename)
+            summary += f"📞 *Total: {len(merged_phones)} nomor*\n"
+            if duplicates:
+                summary += f"🔁 *Duplikat dihapus: {duplicates} nomor*\n"
+            summary += exclusion_summary(excluded)
+            summary += compression_summary(outputs)
             summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
             
             await update.message.reply_text(summary, parse_mode='Markdown')
@@ -1115,7 +1483,7 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
  # MERGE VCF filename input
     elif context.user_data.get('waiting_for_merge_vcf_filename'):
-        filename = user_input.strip()
+        filename, compression = split_compression(user_input.strip())
         if not filename:
             await update.message.reply_text("❌ Nama file tidak boleh kosong!")
             return
@@ -1127,20 +1495,24 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             processing_msg = await update.message.reply_text("🔄 Menggabung file VCF...")
             
             merged_contacts = context.user_data.get('merged_contacts', [])
-            merged_vcf_content = create_vcf_from_contacts(merged_contacts)
+            merged_contacts, excluded = claim_exported_contacts(merged_contacts)
+            outputs = []
             
-            if merged_vcf_content:
-                vcf_file = io.BytesIO(merged_vcf_content.encode('utf-8'))
-                vcf_file.name = filename
-                await update.message.reply_document(document=vcf_file, filename=filename)
+            if merged_contacts:
+                outputs.extend(await send_claimed(update.message, merged_contacts, iter_vcf_from_contacts, filename,
+                                                  compression, release=release_exported_contacts))
             
             try:
                 await processing_msg.delete()
             except:
                 pass
             
+            count_contacts(len(merged_contacts))
             summary = f"🎉 *VCF MERGE SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
-            summary += f"📁 *File: {filename}*\n📞 *Total: {len(merged_contacts)} kontak*\n"
+            summary += output_files_summary(outputs, filename)
+            summary += f"📞 *Total: {len(merged_contacts)} kontak*\n"
+            summary += exclusion_summary(excluded)
+            summary += compression_summary(outputs)
             summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
             
             await update.message.reply_text(summary, parse_mode='Markdown')
@@ -1165,16 +1537,22 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             successful_files = 0
             total_processed = 0
+            total_excluded = 0
             
             for i, file_data in enumerate(txt_files_data):
                 if i < len(custom_filenames):
                     filename = custom_filenames[i]
-                    # Normalize phone format consistency before creating VCF
-                    normalized_phones = normalize_phone_list_format(file_data['phone_numbers'])
-                    vcf_content = create_vcf_from_phones(normalized_phones, contact_name)
-                    
+                    # Normalize phones once before creating VCF
+                    normalized_phones = normalize_phone_batch(file_data['phone_numbers'])
+                    normalized_phones, excluded = claim_exported(normalized_phones)
+                    total_excluded += excluded
+                    with releasing(normalized_phones):
+                        with stage_timer('generate'):
+                            vcf_content = create_vcf_from_phones(normalized_phones, contact_name, normalized=True)
+                        
+                        if vcf_content:
+                            await send_vcf_file(update, filename, vcf_content)
                     if vcf_content:
-                        await send_vcf_file(update, filename, vcf_content)
                         successful_files += 1
                         total_processed += len(normalized_phones)
                         await asyncio.sleep(0.3)
@@ -1184,9 +1562,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except:
                 pass
             
+            count_contacts(total_processed)
             summary = f"🎉 *CUSTOM MODE SELESAI!*\n\n📊 *RINGKASAN:*\n━━━━━━━━━━━━━━━━━━━\n"
             summary += f"✅ *Berhasil: {successful_files} file*\n"
             summary += f"👤 *Nama: {contact_name}*\n📞 *Total: {total_processed} kontak*\n"
+            summary += exclusion_summary(total_excluded)
             summary += f"🎨 *Custom pattern berhasil diterapkan*\n"
             summary += f"━━━━━━━━━━━━━━━━━━━\n💡 Gunakan /start untuk konversi baru."
             
@@ -1201,16 +1581,72 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("❌ Tidak ada operasi yang menunggu input. Gunakan /start untuk memulai.")
 
-def main():
-    """Start the bot"""
-    application = Application.builder().token(BOT_TOKEN).build()
+def application_builder(polling=True):
+    """ApplicationBuilder with the token, pooled transport and optional self-hosted Bot API server.
+    
+    Without `polling` it builds an Application without an Updater, fed updates by a cluster worker.
+    """
+    BOT_TOKEN = os.getenv('BOT_TOKEN')
+    
+    #Validate token exists
+    if not BOT_TOKEN:
+        raise ValueError("BOT_TOKEN environment variable is required!")
+    
+    request, get_updates_request = build_requests()
+    builder = Application.builder().token(BOT_TOKEN).request(request)
+    builder = builder.get_updates_request(get_updates_request) if polling else builder.updater(None)
+    # Self-hosted Bot API server: no 20 MB download cap, and in local mode uploads are read from its disk
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+    if BOT_API_LOCAL_MODE:
+        builder = builder.local_mode(True)
+    return builder
+
+def build_application(polling=True):
+    """The bot Application with every handler registered"""
+    application = application_builder(polling).post_init(start_watchdog).post_shutdown(close_job_ledger).build()
     
     # Handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("string", string_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("stalls", stalls_command))
+    application.add_handler(CommandHandler("jobs", jobs_command))
     application.add_handler(CallbackQueryHandler(button_callback))
     application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input))
+    application.add_handler(TypeHandler(Update, track_sessions), group=1)
+    if RECORD_PATH:
+        application.bot_data['traffic_recorder'] = TrafficRecorder(RECORD_PATH)
+        application.add_handler(TypeHandler(Update, record_update_start), group=-1)
+        application.add_handler(TypeHandler(Update, record_update_end), group=2)
+        logger.info(f"Recording anonymized traffic to {RECORD_PATH}")
+    if LEDGER_PATH:
+        application.bot_data['job_ledger'] = JobLedger(LEDGER_PATH)
+        application.add_handler(TypeHandler(Update, job_update_start), group=-2)
+        application.add_handler(TypeHandler(Update, job_update_end), group=3)
+        logger.info(f"Recording finished jobs to {LEDGER_PATH}")
+    return application
+
+def main():
+    """Start the bot"""
+    if BOT_WORKERS > 1:
+        # Ingress only polls and routes; the handlers run in the worker processes
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
+            logger.info(f"Ingress metrics on :{METRICS_PORT}/metrics")
+        print(f"🤖 VCF Generator Bot is running with {BOT_WORKERS} workers...")
+        try:
+            asyncio.run(run_ingress(application_builder().build().bot, BOT_WORKERS))
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    application = build_application()
+    
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+        logger.info(f"Metrics on :{METRICS_PORT}/metrics")
     
     # Start bot
     print("🤖 VCF Generator Bot is running...")
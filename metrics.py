@@ -0,0 +1,209 @@
+"""In-process metrics for the bot, served in the Prometheus text format.
+
+Latency of every pipeline stage (download, decode, parse, merge, generate,
+send) goes into one histogram labelled by stage and mode, next to counters for
+files, contacts and bytes, a gauge of active sessions, the event loop lag and
+stalls seen by stall_watchdog and the connection pool waits seen by transport.
+Nothing here needs prometheus_client: metrics render themselves and
+`start_metrics_server` serves them on /metrics from a daemon thread
+(METRICS_PORT in main.py). The same helpers add to the
+record of the job being handled (`current_job`) for the job ledger.
+"""
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tracing import annotate, span
+
+# label values used by the bot
+STAGES = ('download', 'decode', 'parse', 'merge', 'generate', 'send')
+MODES = ('text', 'v1', 'v1_default', 'v1_custom', 'v2', 'vcf_to_txt', 'merge_txt', 'merge_vcf')
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# mode of the update being handled; set once per handler so helpers can label without passing it around
+current_mode = contextvars.ContextVar('current_mode', default='unknown')
+# ledger.JobRecord of the job the update belongs to, None unless JOB_LEDGER_PATH is set
+current_job = contextvars.ContextVar('current_job', default=None)
+
+_lock = threading.Lock()
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format(value)}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+
+    def _samples(self):
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format(value)}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', _format(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_format(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram('vcfbot_stage_seconds', "Time spent per pipeline stage", ('stage', 'mode'))
+files_total = Counter('vcfbot_files_total', "Files received (in) and sent (out)", ('mode', 'direction'))
+contacts_total = Counter('vcfbot_contacts_total', "Contacts or numbers written to output files", ('mode',))
+bytes_total = Counter('vcfbot_bytes_total', "File bytes received (in) and sent (out)", ('mode', 'direction'))
+active_sessions = Gauge('vcfbot_active_sessions', "Users with a conversion in progress")
+event_loop_lag = Histogram('vcfbot_event_loop_lag_seconds', "How late the event loop heartbeat woke up",
+                           buckets=LAG_BUCKETS)
+worker_up = Gauge('vcfbot_worker_up', "1 while a cluster worker is alive with a fresh heartbeat", ('worker',))
+worker_queue_depth = Gauge('vcfbot_worker_queue_depth', "Updates routed to a cluster worker and not yet handled",
+                           ('worker',))
+worker_updates_total = Counter('vcfbot_worker_updates_total', "Updates routed to each cluster worker", ('worker',))
+worker_restarts_total = Counter('vcfbot_worker_restarts_total', "Cluster workers restarted after exiting", ('worker',))
+event_loop_stalls = Counter('vcfbot_event_loop_stalls_total', "Event loop stalls over STALL_THRESHOLD",
+                            ('handler', 'mode'))
+pool_wait_seconds = Histogram('vcfbot_pool_wait_seconds', "Time requests waited for a pooled HTTP connection",
+                              ('endpoint',), buckets=LAG_BUCKETS)
+
+
+@contextlib.contextmanager
+def stage_timer(stage, mode=None):
+    """Time the enclosed block into vcfbot_stage_seconds and a trace span (works across awaits)"""
+    started = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage, mode=mode or current_mode.get())
+        job = current_job.get()
+        if job is not None:
+            job.add_stage(stage, elapsed)
+
+
+def count_file(direction, size, mode=None):
+    """Count one received or sent file of `size` bytes"""
+    mode = mode or current_mode.get()
+    files_total.inc(mode=mode, direction=direction)
+    bytes_total.inc(size, mode=mode, direction=direction)
+    annotate(**{f'bytes_{direction}': size})
+    job = current_job.get()
+    if job is not None:
+        job.add_file(direction, size)
+
+
+def count_contacts(count, mode=None):
+    contacts_total.inc(count, mode=mode or current_mode.get())
+    annotate(contacts=count)
+    job = current_job.get()
+    if job is not None:
+        job.add_contacts(count)
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """Serve /metrics on `host:port` from a daemon thread and return the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
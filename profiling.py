@@ -0,0 +1,110 @@
+"""On-demand cProfile / tracemalloc sessions for the running bot.
+
+Nothing is installed while no session runs. The only check left on the hot
+path is the module-level `counting` flag read after each handler call. A
+session either lasts a number of seconds (the bot schedules `finish`) or a
+number of handler calls (`count_call` ends it after the Nth call), and
+produces a top-N text report.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+KINDS = ('cpu', 'mem')
+TOP_N = 30
+TRACEMALLOC_FRAMES = 10
+
+_session = None
+# True only while a session limited by handler calls runs
+counting = False
+
+
+class ProfileSession:
+    def __init__(self, kind, chat_id, seconds=None, calls=None, top=TOP_N):
+        if kind not in KINDS:
+            raise ValueError(f"unknown profile kind {kind!r}, expected one of {KINDS}")
+        self.kind = kind
+        self.chat_id = chat_id
+        self.seconds = seconds
+        self.calls = calls
+        self.top = top
+        self.calls_seen = 0
+        self.started = None
+        self._profile = None
+
+    def start(self):
+        self.started = time.time()
+        if self.kind == 'cpu':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def stop(self):
+        """Stop collecting and return `(filename, report text)`"""
+        elapsed = time.time() - self.started
+        calls = f", {self.calls_seen} handler calls" if self.calls else ""
+        header = f"{self.kind} profile, {elapsed:.1f}s{calls}, top {self.top}\n\n"
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        if self.kind == 'cpu':
+            self._profile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+            report = out.getvalue()
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ])
+            lines = [f"traced now {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB", ""]
+            lines.extend(str(stat) for stat in snapshot.statistics('lineno')[:self.top])
+            report = '\n'.join(lines) + '\n'
+        return f"profile-{self.kind}-{stamp}.txt", header + report
+
+
+def current():
+    return _session
+
+
+def start(kind, chat_id, seconds=None, calls=None, top=TOP_N):
+    """Begin a session; raises RuntimeError if one is already running"""
+    global _session, counting
+    if _session is not None:
+        raise RuntimeError(f"a {_session.kind} profile is already running")
+    session = ProfileSession(kind, chat_id, seconds=seconds, calls=calls, top=top)
+    session.start()
+    _session = session
+    counting = bool(calls)
+    return session
+
+
+def finish(expected=None):
+    """End the running session; returns `(session, filename, report)` or None if none runs.
+
+    With `expected`, only that session is ended, so a timer from an earlier session stopped by
+    hand cannot end a newer one.
+    """
+    global _session, counting
+    session = _session
+    if session is None or (expected is not None and session is not expected):
+        return None
+    _session = None
+    counting = False
+    filename, report = session.stop()
+    return session, filename, report
+
+
+def count_call():
+    """Note one finished handler call; ends and returns the session once its call budget is spent"""
+    session = _session
+    if session is None:
+        return None
+    session.calls_seen += 1
+    if session.calls and session.calls_seen >= session.calls:
+        return finish()
+    return None
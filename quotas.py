@@ -0,0 +1,157 @@
+"""Per-user quotas for heavy jobs, checked when an upload or text input is admitted.
+
+Rolling limits (per QUOTA_WINDOW seconds) cover bytes uploaded, numbers parsed
+and jobs started; a job starts with the first upload of a session or with a
+TEXT TO VCF input. Files generated per job are capped outright. Each rolling
+counter is a two-bucket sliding window: the previous bucket is weighted by how
+much of it still overlaps the window, so a check or an update is O(1) time and
+memory per user and limit. In multi-worker mode one QuotaStore lives in a
+manager process owned by the ingress and every worker talks to it (cluster.py),
+so a user's allowance does not multiply with the worker count.
+
+Settings (all optional, environment variables; 0 turns a limit off):
+    QUOTA_WINDOW                 seconds, default 3600
+    QUOTA_UPLOAD_BYTES           bytes uploaded per window, default 500 MB
+    QUOTA_NUMBERS                numbers or contacts parsed per window, default 2,000,000
+    QUOTA_JOBS                   jobs started per window, default 60
+    QUOTA_FILES_PER_JOB          output files one job may generate, default 500
+"""
+import os
+import time
+
+# rolling limits, charged over the window
+WINDOW_LIMITS = ('upload_bytes', 'numbers', 'jobs')
+# users are pruned from the store at most once per this many charges
+PRUNE_EVERY = 1000
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def quota_settings():
+    """Quota settings from QUOTA_* environment variables"""
+    return {
+        'window': _env_int('QUOTA_WINDOW', 3600),
+        'upload_bytes': _env_int('QUOTA_UPLOAD_BYTES', 500 * 1024 * 1024),
+        'numbers': _env_int('QUOTA_NUMBERS', 2_000_000),
+        'jobs': _env_int('QUOTA_JOBS', 60),
+        'files_per_job': _env_int('QUOTA_FILES_PER_JOB', 500),
+    }
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, limit, amount, used, allowed, retry_after=None):
+        super().__init__(f"{limit} quota exceeded: {amount} more on top of {used:.0f} used, {allowed} allowed")
+        self.limit = limit
+        self.amount = amount
+        self.used = used
+        self.allowed = allowed
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        # raised inside the cluster's shared store and re-raised in the worker that asked
+        return type(self), (self.limit, self.amount, self.used, self.allowed, self.retry_after)
+
+
+class SlidingWindowCounter:
+    """Approximate count over the last `window` seconds from two fixed buckets"""
+    __slots__ = ('window', 'start', 'current', 'previous')
+
+    def __init__(self, window, now):
+        self.window = window
+        self.start = now
+        self.current = 0
+        self.previous = 0
+
+    def _roll(self, now):
+        periods = int((now - self.start) // self.window)
+        if periods:
+            self.previous = self.current if periods == 1 else 0
+            self.current = 0
+            self.start += periods * self.window
+
+    def total(self, now):
+        self._roll(now)
+        return self.previous * (1 - (now - self.start) / self.window) + self.current
+
+    def add(self, amount, now):
+        self._roll(now)
+        self.current += amount
+
+    def idle(self, now):
+        return self.total(now) == 0
+
+    def retry_after(self, excess, now):
+        """Seconds until `excess` of the count has slid out of the window (at least until the bucket rolls)"""
+        self._roll(now)
+        remaining = self.start + self.window - now
+        if self.previous and excess <= self.previous * remaining / self.window:
+            # the previous bucket fades out linearly over the rest of this period
+            return excess / self.previous * self.window
+        return remaining
+
+
+class QuotaStore:
+    def __init__(self, settings=None, clock=time.monotonic):
+        self.settings = settings or quota_settings()
+        self.clock = clock
+        self._users = {}
+        self._charges = 0
+
+    def _counter(self, user_id, limit, now):
+        counters = self._users.setdefault(user_id, {})
+        counter = counters.get(limit)
+        if counter is None:
+            counter = counters[limit] = SlidingWindowCounter(self.settings['window'], now)
+        return counter
+
+    def used(self, user_id, limit):
+        counter = self._users.get(user_id, {}).get(limit)
+        return counter.total(self.clock()) if counter else 0
+
+    def check(self, user_id, limit, amount=1):
+        """Raise QuotaExceeded if `amount` more of `limit` would go over the user's allowance"""
+        allowed = self.settings[limit]
+        if not allowed:
+            return
+        if limit == 'files_per_job':
+            if amount > allowed:
+                raise QuotaExceeded(limit, amount, 0, allowed)
+            return
+        now = self.clock()
+        counter = self._counter(user_id, limit, now)
+        used = counter.total(now)
+        if used + amount > allowed:
+            raise QuotaExceeded(limit, amount, used, allowed, counter.retry_after(used + amount - allowed, now))
+
+    def charge(self, user_id, limit, amount=1):
+        """Count `amount` of a rolling `limit` against the user, without checking"""
+        if limit not in WINDOW_LIMITS or not self.settings[limit] or not amount:
+            return
+        now = self.clock()
+        self._counter(user_id, limit, now).add(amount, now)
+        self._charges += 1
+        if self._charges % PRUNE_EVERY == 0:
+            self._prune(now)
+
+    def admit(self, user_id, limit, amount=1):
+        self.check(user_id, limit, amount)
+        self.charge(user_id, limit, amount)
+
+    def admit_all(self, user_id, checks, require=()):
+        """Check every (limit, amount) in `checks` and that each limit in `require` has room, then charge
+        `checks`; all or nothing, in one call so a shared store does it atomically"""
+        for limit, amount in checks:
+            self.check(user_id, limit, amount)
+        for limit in require:
+            self.check(user_id, limit)
+        for limit, amount in checks:
+            self.charge(user_id, limit, amount)
+
+    def _prune(self, now):
+        idle = [user_id for user_id, counters in self._users.items()
+                if all(counter.idle(now) for counter in counters.values())]
+        for user_id in idle:
+            del self._users[user_id]
@@ -0,0 +1,122 @@
+"""Opt-in, anonymized recording of incoming traffic for replay load tests.
+
+With TRAFFIC_RECORD_PATH set, every update is written as one JSON line: when
+it arrived, a salted hash of the chat, what kind of update it was (command,
+button, document, text), the session mode it arrived in and how long its
+handlers took. Button data and command names are kept as they are; documents
+keep only their extension and size; text keeps only its shape (see
+`text_shape`). Phone numbers, names and file contents are never written, and
+the salt lives only in memory, so chats cannot be linked across recordings.
+
+Cluster workers append to the same file: each record is written in one call
+under an flock, and times count from TRAFFIC_RECORD_EPOCH (set by the ingress)
+so every worker's offsets share an origin.
+
+benchmarks/bench_replay.py turns a recording back into traffic.
+"""
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import time
+
+RECORD_PATH = os.getenv('TRAFFIC_RECORD_PATH')
+
+# a run of 7+ digits, allowing the separators people type inside numbers
+_PHONE_RUN = re.compile(r'\+?\d[\d\s().-]{5,}\d')
+_LETTERS = re.compile(r'[^\W\d_]+')
+# kept on masked lines so replayed file names still pick the same output type
+_KEPT_SUFFIX = re.compile(r'\.(txt|vcf|gz|zip)$', re.IGNORECASE)
+MAX_MASK = 64
+
+
+def _line_token(line):
+    if not line.strip():
+        return 'b'
+    if any(sum(c.isdigit() for c in m.group()) >= 7 for m in _PHONE_RUN.finditer(line)):
+        return 'p'
+    suffix = _KEPT_SUFFIX.search(line)
+    head = line[:suffix.start()] if suffix else line
+    masked = _LETTERS.sub(lambda m: 'a' * len(m.group()), head)[:MAX_MASK]
+    return masked + (suffix.group() if suffix else '')
+
+
+def text_shape(text):
+    """Run-length list of line tokens: 'b' blank, 'p' a line holding a phone number, else the line
+    with letters masked to 'a' (digits shorter than a phone number, punctuation and a .txt/.vcf/
+    .gz/.zip suffix kept), e.g. "hasil\\n\\nBudi\\n0812...\\n0813..." -> [['aaaaa', 1], ['b', 1],
+    ['aaaa', 1], ['p', 2]]"""
+    shape = []
+    for line in text.split('\n'):
+        token = _line_token(line)
+        if shape and shape[-1][0] == token:
+            shape[-1][1] += 1
+        else:
+            shape.append([token, 1])
+    return shape
+
+
+def shape_hash(shape):
+    return hashlib.sha256(json.dumps(shape, separators=(',', ':')).encode()).hexdigest()[:16]
+
+
+class TrafficRecorder:
+    def __init__(self, path):
+        self.path = path
+        self._salt = secrets.token_bytes(16)
+        self._started = float(os.getenv('TRAFFIC_RECORD_EPOCH') or time.time())
+        self._pending = {}
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._write({'recording': 1, 'started': time.strftime('%Y-%m-%dT%H:%M:%S')}, header=True)
+
+    def _write(self, record, header=False):
+        data = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # the first worker to open the file writes the header
+            if not header or os.fstat(self._fd).st_size == 0:
+                os.write(self._fd, data)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def chat_key(self, chat_id):
+        return hmac.new(self._salt, str(chat_id).encode(), hashlib.sha256).hexdigest()[:12]
+
+    def describe(self, update):
+        """Anonymized fields of one update"""
+        if update.callback_query:
+            return {'kind': 'callback', 'data': update.callback_query.data}
+        message = update.message or update.edited_message
+        if message is None:
+            return {'kind': 'other'}
+        if message.document:
+            name = message.document.file_name or ''
+            return {'kind': 'document', 'ext': name.rsplit('.', 1)[-1].lower() if '.' in name else '',
+                    'size': message.document.file_size or 0, 'caption': bool(message.caption)}
+        if message.text and message.text.startswith('/'):
+            return {'kind': 'command', 'command': message.text.split()[0][1:].split('@')[0]}
+        if message.text:
+            shape = text_shape(message.text)
+            return {'kind': 'text', 'shape': shape, 'shape_hash': shape_hash(shape), 'chars': len(message.text)}
+        return {'kind': 'other'}
+
+    def begin(self, update, mode):
+        chat = update.effective_chat
+        self._pending[update.update_id] = (time.perf_counter(), {
+            't': round(time.time() - self._started, 3),
+            'chat': self.chat_key(chat.id if chat else 0),
+            'mode': mode,
+            **self.describe(update),
+        })
+
+    def end(self, update):
+        started, record = self._pending.pop(update.update_id, (None, None))
+        if record is not None:
+            record['handler_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self._write(record)
+
+    def close(self):
+        os.close(self._fd)
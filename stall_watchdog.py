@@ -0,0 +1,130 @@
+"""Event-loop stall watchdog.
+
+A heartbeat task sleeps HEARTBEAT_INTERVAL and measures how late it wakes up;
+every sample goes into vcfbot_event_loop_lag_seconds. A stall (lag above
+STALL_THRESHOLD seconds) cannot be inspected from the blocked loop itself, so a
+watcher thread notices the missing heartbeat while the stall is still going,
+captures the loop thread's stack, and names the handler through the label that
+main.traced gives the running task with `labelled(handler name, mode)`. When
+the heartbeat comes back, the stall is completed with its length, logged,
+counted in vcfbot_event_loop_stalls_total and kept in a bounded `reports` log.
+"""
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from metrics import event_loop_lag, event_loop_stalls
+
+logger = logging.getLogger(__name__)
+
+STALL_THRESHOLD = float(os.getenv('STALL_THRESHOLD', '1.0'))
+HEARTBEAT_INTERVAL = 0.1
+MAX_REPORTS = 50
+STACK_LIMIT = 40
+reports = collections.deque(maxlen=MAX_REPORTS)
+# (handler, mode) of every task inside a labelled handler; read by the watcher thread
+_labels = weakref.WeakKeyDictionary()
+
+
+class StallReport:
+    __slots__ = ('started', 'lag', 'handler', 'mode', 'stack')
+
+    def __init__(self, started, handler='unknown', mode='unknown', stack=''):
+        self.started = started
+        self.lag = None
+        self.handler = handler
+        self.mode = mode
+        self.stack = stack
+
+    def format(self):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))
+        stack = self.stack or "(stack not captured: the stall ended before the watcher saw it)\n"
+        return f"{stamp}  {self.lag:.2f}s  {self.handler} [{self.mode}]\n{stack}"
+
+
+@contextlib.contextmanager
+def labelled(handler, mode):
+    """Attribute stalls to `handler` and `mode` while the current task runs the block"""
+    task = asyncio.current_task()
+    previous = _labels.get(task)
+    _labels[task] = (handler, mode)
+    try:
+        yield
+    finally:
+        if previous is None:
+            _labels.pop(task, None)
+        else:
+            _labels[task] = previous
+
+
+def attribute(loop):
+    """(handler, mode) of the task `loop` is running, or ('unknown', 'unknown') outside a labelled handler"""
+    task = asyncio.current_task(loop)
+    return _labels.get(task, ('unknown', 'unknown')) if task is not None else ('unknown', 'unknown')
+
+
+class LoopWatchdog:
+    def __init__(self, threshold=STALL_THRESHOLD, interval=HEARTBEAT_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = time.perf_counter()
+        self._captured = None
+        self._loop = None
+        self._loop_thread = None
+        self._stop = threading.Event()
+        self._task = None
+
+    def start(self):
+        """Start the heartbeat on the running loop and the watcher thread"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._task = self._loop.create_task(self._heartbeat(), name='loop-watchdog')
+        threading.Thread(target=self._watch, name='loop-watchdog', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._beat = now
+            lag = max(0.0, now - before - self.interval)
+            event_loop_lag.observe(lag)
+            report, self._captured = self._captured, None
+            if lag >= self.threshold:
+                self._finish(report or StallReport(time.time() - lag), lag)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            if self._captured is None and time.perf_counter() - self._beat > self.threshold + self.interval:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    handler, mode = attribute(self._loop)
+                    stack = ''.join(traceback.format_stack(frame, limit=STACK_LIMIT))
+                    self._captured = StallReport(time.time() - (time.perf_counter() - self._beat),
+                                                 handler, mode, stack)
+
+    def _finish(self, report, lag):
+        report.lag = lag
+        reports.append(report)
+        event_loop_stalls.inc(handler=report.handler, mode=report.mode)
+        logger.warning(f"Event loop stalled {lag:.2f}s in {report.handler} [{report.mode}]")
+
+
+def format_reports(limit=MAX_REPORTS):
+    """Most recent stall reports first, as text"""
+    recent = list(reports)[-limit:][::-1]
+    return '\n'.join(report.format() for report in recent)
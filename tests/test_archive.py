@@ -0,0 +1,42 @@
+"""ZIP parsing: the parse pool runs with the parent's config, and 0 disables a limit"""
+import io
+import zipfile
+
+import pytest
+
+from engine import ArchiveError, configure, get_config, parse_zip, reset_config
+from engine.archive import get_parse_pool
+
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    reset_config()
+    yield
+    reset_config()
+
+
+def zip_of(count):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for i in range(count):
+            archive.writestr(f"d{i}.txt", f"0812{i:08d}\n0813{i:08d}")
+    return buffer.getvalue()
+
+
+def test_pool_workers_use_configured_overrides():
+    config = configure(parse_workers=2, default_country_code='60', zip_max_members=7)
+    assert get_parse_pool().submit(get_config).result(timeout=60) == config
+    # a new override reaches the workers too
+    config = configure(zip_max_members=9)
+    assert get_parse_pool().submit(get_config).result(timeout=60) == config
+    records, skipped = parse_zip(zip_of(5), 'txt')
+    assert [r['filename'] for r in records] == [f"d{i}.txt" for i in range(5)] and skipped == 0
+
+
+def test_zero_disables_member_limit():
+    configure(parse_workers=1, zip_max_members=2)
+    with pytest.raises(ArchiveError):
+        parse_zip(zip_of(3), 'txt')
+    configure(zip_max_members=0, zip_max_bytes=0)
+    records, _ = parse_zip(zip_of(3), 'txt')
+    assert len(records) == 3
@@ -0,0 +1,110 @@
+"""Multi-worker mode: chat sharding, the shared quota store and the exclusion index across two workers"""
+import asyncio
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+from cluster import HashRing, SharedState, shard_key
+from engine import ExclusionIndex
+from quotas import QuotaExceeded
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from bench_load import FlowError, Session, start_bot, stop_bot  # noqa: E402
+from fake_bot_api import FakeBotAPI  # noqa: E402
+
+CHATS = 6
+PER_CHAT = 300
+
+
+class _Chat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class _Update:
+    def __init__(self, chat_id):
+        self.effective_chat = _Chat(chat_id)
+        self.effective_user = None
+        self.update_id = 0
+
+
+def test_ring_sends_each_chat_to_one_worker():
+    ring = HashRing(range(2))
+    routes = {chat_id: ring.node_for(shard_key(_Update(chat_id))) for chat_id in range(1000, 1200)}
+    # the same chat always lands on the same worker, and both workers get chats
+    assert all(ring.node_for(shard_key(_Update(chat_id))) == node for chat_id, node in routes.items())
+    assert set(routes.values()) == {0, 1}
+    # a third worker takes chats only from the existing ones, about a third of them
+    grown = HashRing(range(3))
+    moved = [chat_id for chat_id, node in routes.items() if grown.node_for(chat_id) != node]
+    assert all(grown.node_for(chat_id) == 2 for chat_id in moved)
+    assert 20 < len(moved) < 120
+
+
+def test_quota_store_is_shared_between_workers(monkeypatch):
+    monkeypatch.setenv('QUOTA_JOBS', '3')
+    state = SharedState(ctx=multiprocessing.get_context('spawn'))
+    state.start()
+    try:
+        first, second = SharedState(address=state.address), SharedState(address=state.address)
+        first.connect()
+        second.connect()
+        stores = [first.quota_store(), second.quota_store()]
+        for i in range(3):
+            stores[i % 2].admit_all(42, [('jobs', 1)])
+        with pytest.raises(QuotaExceeded) as rejected:
+            stores[1].admit_all(42, [('jobs', 1)])
+        assert rejected.value.limit == 'jobs' and rejected.value.allowed == 3
+    finally:
+        state.shutdown()
+
+
+def phone(i):
+    return f"0812{i:08d}"
+
+
+async def run_v1(api, chat_id, numbers):
+    session = Session(api, chat_id, timeout=60)
+    await session.menu(('cv_txt_to_vcf', 'Pilih Mode'), ('cv_v1', 'Upload file TXT'))
+    session.upload('daftar.txt', '\n'.join(phone(i) for i in numbers))
+    await session.expect('Pilih mode output')
+    api.callback(chat_id, 'output_default')
+    await session.expect('Ketik nama kontak')
+    api.text(chat_id, 'Pelanggan')
+    await session.expect('SELESAI')
+
+
+async def run_cluster(directory):
+    api = await FakeBotAPI(keep_sent=True).start()
+    with open(os.devnull, 'wb') as log:
+        proc = await start_bot(api, log, BOT_WORKERS='2', VCF_EXCLUSION_DIR=directory)
+        try:
+            # neighbouring chats share half their numbers, so the workers race for them
+            await asyncio.gather(*(run_v1(api, 1000 + c, range(c * PER_CHAT // 2, c * PER_CHAT // 2 + PER_CHAT))
+                                   for c in range(CHATS)))
+        finally:
+            await stop_bot(proc)
+    await api.stop()
+    written = []
+    for c in range(CHATS):
+        for event in api.events(1000 + c):
+            if event.method == 'sendDocument':
+                text = api.files[event.file_id].decode('utf-8')
+                written.extend(line[4:] for line in text.splitlines() if line.startswith('TEL:'))
+    return written
+
+
+def test_two_workers_keep_sessions_and_exclusion_consistent(tmp_path):
+    directory = str(tmp_path / 'ex')
+    try:
+        written = asyncio.run(run_cluster(directory))
+    except FlowError as e:
+        # a multi-step flow only completes if every update of its chat reached the same worker
+        pytest.fail(f"flow broke across workers: {e}")
+    distinct = (CHATS + 1) * PER_CHAT // 2
+    assert len(written) == len(set(written)) == distinct
+    index = ExclusionIndex(directory)
+    assert len(index) == distinct
+    index.close()
@@ -0,0 +1,134 @@
+"""Several processes sharing one exclusion directory, as CLI and bot cluster workers do, and
+claims given back when their output is not delivered"""
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+
+import cli
+import main
+from engine import ExclusionIndex, claim_exported, configure, iter_lines, reset_config
+
+WORKERS = 4
+NUMBERS = 4000
+CHUNK = 250
+
+
+def phone(i):
+    return f"0812{i:08d}"
+
+
+def claim_worker(directory, start, results):
+    """Claim every number from `start` on, wrapping around, so all workers contend for all numbers"""
+    index = ExclusionIndex(directory)
+    kept = []
+    order = [(start + i) % NUMBERS for i in range(NUMBERS)]
+    for offset in range(0, NUMBERS, CHUNK):
+        chunk = [phone(i) for i in order[offset:offset + CHUNK]]
+        kept.extend(p for p, keep in zip(chunk, index.claim_mask(chunk)) if keep)
+    index.close()
+    results.put(kept)
+
+
+def compact_worker(directory, stop):
+    index = ExclusionIndex(directory)
+    while not stop.is_set():
+        index.compact()
+    index.close()
+
+
+def test_concurrent_claims_hand_out_each_number_once(tmp_path):
+    ctx = multiprocessing.get_context('fork')
+    directory = str(tmp_path / 'ex')
+    ExclusionIndex(directory).close()
+    results, stop = ctx.Queue(), ctx.Event()
+    compactor = ctx.Process(target=compact_worker, args=(directory, stop))
+    compactor.start()
+    workers = [ctx.Process(target=claim_worker, args=(directory, w * NUMBERS // WORKERS, results))
+               for w in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    claimed = [number for _ in workers for number in results.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=60)
+    stop.set()
+    compactor.join(timeout=60)
+
+    assert sorted(claimed) == sorted(phone(i) for i in range(NUMBERS))
+    index = ExclusionIndex(directory)
+    assert len(index) == NUMBERS
+    assert all(phone(i) in index for i in range(NUMBERS))
+    index.close()
+
+
+def test_cli_workers_keep_index_consistent(tmp_path, monkeypatch):
+    monkeypatch.setenv('VCF_EXCLUSION_COMPACT_THRESHOLD', '700')
+    inputs, output, directory = tmp_path / 'in', tmp_path / 'out', tmp_path / 'ex'
+    inputs.mkdir()
+    for f in range(40):
+        # every file repeats half of the previous one, so workers race for shared numbers
+        numbers = range(f * 250, f * 250 + 500)
+        (inputs / f"part{f:02d}.txt").write_text('\n'.join(phone(i) for i in numbers))
+
+    assert cli.main(['txt2vcf', str(inputs), '-o', str(output), '--name', 'x', '-j', '4',
+                     '--exclusion-dir', str(directory)]) == 0
+
+    written = []
+    for name in os.listdir(output):
+        with open(output / name, encoding='utf-8') as f:
+            written.extend(line[4:] for line in f if line.startswith('TEL:'))
+    distinct = 39 * 250 + 500
+    assert len(written) == len(set(written)) == distinct
+    index = ExclusionIndex(str(directory))
+    assert len(index) == distinct
+    index.close()
+
+
+def test_released_numbers_can_be_claimed_again(tmp_path):
+    directory = str(tmp_path / 'ex')
+    index, other = ExclusionIndex(directory), ExclusionIndex(directory)
+    assert all(index.claim_mask([phone(i) for i in range(10)]))
+    index.compact()
+    index.claim_mask([phone(10)])
+    # one number from the base file, one from the log, one never claimed
+    assert index.release([phone(3), phone(10), phone(99)]) == 2
+    assert phone(3) not in other and phone(10) not in other and phone(4) in other
+    other.compact()
+    assert index.claim_mask([phone(3), phone(4)]) == [True, False]
+    index.close()
+    other.close()
+    index = ExclusionIndex(directory)
+    assert len(index) == 10 and phone(3) in index and phone(10) not in index
+    index.close()
+
+
+class FailingMessage:
+    """Takes `parts` documents, then fails the upload"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.delivered = []
+
+    async def reply_document(self, document, filename):
+        if not self.parts:
+            raise ConnectionError('upload failed')
+        self.parts -= 1
+        self.delivered.extend(document.read().decode().split())
+
+
+def test_failed_send_releases_undelivered_numbers(tmp_path):
+    reset_config()
+    # 13 bytes a line, so 100 numbers a part
+    configure(exclusion_dir=str(tmp_path / 'ex'), output_max_bytes=1300)
+    try:
+        phones = [phone(i) for i in range(500)]
+        claimed, excluded = claim_exported(phones)
+        message = FailingMessage(2)
+        with pytest.raises(ConnectionError):
+            asyncio.run(main.send_claimed(message, claimed, iter_lines, 'out.txt'))
+        assert message.delivered == phones[:200]
+        # only what reached the user stays exported
+        assert claim_exported(phones) == (phones[200:], 200)
+    finally:
+        reset_config()
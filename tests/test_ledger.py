@@ -0,0 +1,35 @@
+"""Job ledger: nearest-rank percentiles and the write-behind summary"""
+import asyncio
+
+from ledger import JobLedger, JobRecord, percentile
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([1, 2], 50) == 1
+    assert percentile([1, 2, 3, 4, 5, 6], 50) == 3
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([3, 1, 2], 0) == 1
+    assert percentile([3, 1, 2], 100) == 3
+
+
+async def record_and_summarize(path):
+    ledger = JobLedger(path, flush_interval=0.01)
+    for busy, outcome in ((1.0, 'completed'), (2.0, 'completed'), (0.5, 'failed')):
+        job = JobRecord('v1')
+        job.busy = busy
+        job.add_contacts(10)
+        ledger.record(job, outcome)
+    # rows still queued are written before the report is read
+    summary = await ledger.summary(3600)
+    await ledger.close()
+    return summary
+
+
+def test_summary_includes_queued_jobs(tmp_path):
+    summary = asyncio.run(record_and_summarize(str(tmp_path / 'jobs.db')))
+    stats = summary['v1']
+    assert (stats['jobs'], stats['completed'], stats['failed'], stats['contacts']) == (3, 2, 1, 20)
+    assert stats['latency'] == {50: 1.0, 95: 2.0, 99: 2.0}
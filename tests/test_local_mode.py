@@ -0,0 +1,112 @@
+"""Uploads read from a local-mode Bot API server's disk, and the download fallback"""
+import asyncio
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+import main
+from engine import MappedFile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from bench_load import Session, start_bot, stop_bot  # noqa: E402
+from fake_bot_api import FakeBotAPI  # noqa: E402
+
+CHAT = 3001
+
+
+def phones(start, count):
+    return '\n'.join(f"0812{i:08d}" for i in range(start, start + count))
+
+
+class _File:
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    async def download_as_bytearray(self):
+        with open(self.file_path, 'rb') as f:
+            return bytearray(f.read())
+
+
+class _Bot:
+    def __init__(self, file_path, local_mode):
+        self.file_path = file_path
+        self.local_mode = local_mode
+
+    async def get_file(self, file_id):
+        return _File(self.file_path)
+
+
+class _Context:
+    def __init__(self, bot):
+        self.bot = bot
+
+
+class _Document:
+    file_id = 'file1'
+
+
+async def read(path, local_mode, fail=False):
+    async with main.read_document(_Context(_Bot(path, local_mode)), _Document()) as content:
+        kept = content
+        data = bytes(content[:5])
+        if fail:
+            raise ValueError('parse failed')
+    return kept, data
+
+
+def test_mapped_upload_is_unmapped_after_the_block(tmp_path):
+    path = tmp_path / 'daftar.txt'
+    path.write_text(phones(0, 10))
+    content, data = asyncio.run(read(str(path), local_mode=True))
+    assert isinstance(content, MappedFile) and content.closed
+    assert data == b'08120'
+    # also when parsing fails inside the block
+    with pytest.raises(ValueError):
+        asyncio.run(read(str(path), local_mode=True, fail=True))
+    content, data = asyncio.run(read(str(path), local_mode=False))
+    assert isinstance(content, bytearray) and data == b'08120'
+
+
+async def run_uploads(api, **env):
+    await api.start()
+    with open(os.devnull, 'wb') as log:
+        proc = await start_bot(api, log, **env)
+        try:
+            session = Session(api, CHAT, timeout=30)
+            # a plain TXT and a ZIP take the two read paths of the upload handler
+            await session.menu(('cv_txt_to_vcf', 'Pilih Mode'), ('cv_v1', 'Upload file TXT'))
+            session.upload('daftar.txt', phones(0, 100))
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w') as z:
+                z.writestr('lain.txt', phones(100, 50))
+            api.document(CHAT, 'arsip.zip', archive.getvalue())
+            await session.expect('Pilih mode output')
+            api.callback(CHAT, 'output_default')
+            await session.expect('Ketik nama kontak')
+            api.text(CHAT, 'Pelanggan')
+            await session.expect('SELESAI')
+            # TEXT TO VCF from a file streams lines straight from the upload
+            await session.menu(('text_to_vcf', 'Format input'))
+            session.upload('kontak.txt', f"kontak\n\nBudi\n{phones(200, 20)}")
+            await session.expect('berhasil dibuat')
+        finally:
+            await stop_bot(proc)
+    await api.stop()
+    return session.files_received
+
+
+def test_local_mode_reads_uploads_from_disk(tmp_path):
+    api = FakeBotAPI(local_dir=str(tmp_path))
+    files = asyncio.run(run_uploads(api, BOT_API_LOCAL_MODE='1'))
+    assert files >= 3
+    assert api.downloads == 0
+
+
+def test_local_mode_downloads_files_not_on_disk():
+    api = FakeBotAPI()
+    files = asyncio.run(run_uploads(api, BOT_API_LOCAL_MODE='1'))
+    assert files >= 3
+    assert api.downloads == 3
@@ -0,0 +1,33 @@
+"""TXT merges dedupe on the canonical number and stream their output"""
+import types
+
+import pytest
+
+from engine import configure, merge_txt_files, reset_config
+
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    reset_config()
+    yield
+    reset_config()
+
+
+def test_one_number_in_three_formats_is_kept_once():
+    merged = merge_txt_files([{'phone_numbers': ['081234567890', '+6281234567890', '6281234567890']}])
+    assert isinstance(merged, types.GeneratorType)
+    assert list(merged) == ['+6281234567890']
+
+
+def test_without_plus_the_first_spelling_is_kept():
+    files = [{'phone_numbers': ['081234567890', '6281234567890']}, {'phone_numbers': ['081234567891']}]
+    assert list(merge_txt_files(files)) == ['081234567890', '081234567891']
+
+
+def test_spilled_merge_matches_in_memory_merge():
+    files = [{'phone_numbers': [f"{prefix}8120000{i % 400:03d}" for i in range(f, 1000, 3)]}
+             for f, prefix in enumerate(('0', '62', '+62'))]
+    in_memory = list(merge_txt_files(files))
+    configure(merge_spill_threshold=50, merge_run_size=30)
+    assert list(merge_txt_files(files)) == in_memory
+    assert len(in_memory) == len(set(in_memory)) == 400
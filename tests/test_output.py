@@ -0,0 +1,36 @@
+"""pack_outputs hands out each part before encoding the next one"""
+import gzip
+
+import pytest
+
+from engine import pack_outputs
+
+
+def lines(count, consumed):
+    for i in range(count):
+        consumed.append(i)
+        yield f"0812{i:08d}\n"
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_parts_are_yielded_as_they_complete(compression):
+    consumed = []
+    parts = pack_outputs(lines(20000, consumed), 'out.txt', compression, max_bytes=100_000)
+    first = next(parts)
+    # only the chunk that opened the second part was read past the first part
+    assert first.filename == 'out.txt' + ('.gz' if compression else '')
+    assert len(consumed) < 20000
+    rest = list(parts)
+    assert len(consumed) == 20000 and len(rest) >= 1
+    assert rest[0].filename.startswith('out_part2.txt')
+    data = [first.buffer.read()] + [packed.buffer.read() for packed in rest]
+    if compression:
+        data = [gzip.decompress(d) for d in data]
+    assert b''.join(data) == ''.join(f"0812{i:08d}\n" for i in range(20000)).encode()
+    assert all(packed.size <= 100_000 for packed in [first] + rest)
+    assert sum(packed.chunks for packed in [first] + rest) == 20000
+
+
+def test_empty_input_still_gives_one_part():
+    parts = list(pack_outputs(iter(()), 'kosong.txt'))
+    assert len(parts) == 1 and parts[0].size == 0
@@ -0,0 +1,89 @@
+"""Quotas are admitted against what an upload actually parsed into, and only accepted uploads start a job"""
+import asyncio
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from bench_load import FlowError, Session, start_bot, stop_bot  # noqa: E402
+from fake_bot_api import FakeBotAPI  # noqa: E402
+
+CHAT = 2001
+
+
+def phones(start, count):
+    return '\n'.join(f"0812{i:08d}" for i in range(start, start + count))
+
+
+def zip_of(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    return buffer.getvalue()
+
+
+async def rejected(session, marker):
+    with pytest.raises(FlowError) as error:
+        await session.expect('Pilih mode output')
+    assert error.value.args[0].startswith('⛔')
+    event = session.api.events(session.chat_id)[session.cursor - 1]
+    assert marker in event.text
+
+
+async def run_quota_flow():
+    api = await FakeBotAPI().start()
+    with open(os.devnull, 'wb') as log:
+        proc = await start_bot(api, log, QUOTA_JOBS='1', QUOTA_NUMBERS='1000', QUOTA_FILES_PER_JOB='3')
+        try:
+            session = Session(api, CHAT, timeout=30)
+            await session.menu(('cv_txt_to_vcf', 'Pilih Mode'), ('cv_v1', 'Upload file TXT'))
+            # one archive holding more files than the job may write
+            api.document(CHAT, 'arsip.zip', zip_of({f"d{i}.txt": phones(i * 10, 10) for i in range(5)}))
+            await rejected(session, 'File per job')
+            # one file holding more numbers than the whole window allows
+            session.upload('besar.txt', phones(0, 1500))
+            await rejected(session, 'Nomor diproses')
+            # neither rejection used up the single job, so a valid upload still runs
+            session.upload('daftar.txt', phones(0, 100))
+            await session.expect('Pilih mode output')
+            api.callback(CHAT, 'output_default')
+            await session.expect('Ketik nama kontak')
+            api.text(CHAT, 'Pelanggan')
+            await session.expect('SELESAI')
+        finally:
+            await stop_bot(proc)
+    await api.stop()
+
+
+def test_uploads_are_admitted_by_parsed_content():
+    asyncio.run(run_quota_flow())
+
+
+async def run_streamed_text_flow():
+    api = await FakeBotAPI().start()
+    with open(os.devnull, 'wb') as log:
+        proc = await start_bot(api, log, QUOTA_NUMBERS='1500', VCF_OUTPUT_MAX_BYTES='30000')
+        try:
+            session = Session(api, CHAT, timeout=30)
+            await session.menu(('text_to_vcf', 'Format input'))
+            # the quota runs out while the vCards are generated: parts within it are sent, then it stops
+            session.upload('kontak.txt', f"kontak\n\nBudi\n{phones(0, 3000)}")
+            with pytest.raises(FlowError) as error:
+                await session.expect('berhasil dibuat')
+            assert error.value.args[0].startswith('⛔')
+            event = api.events(CHAT)[session.cursor - 1]
+            assert 'Nomor diproses' in event.text
+            sent = [e for e in api.events(CHAT) if e.method == 'sendDocument']
+        finally:
+            await stop_bot(proc)
+    await api.stop()
+    return sent
+
+
+def test_text_file_stops_once_the_numbers_quota_runs_out():
+    sent = asyncio.run(run_streamed_text_flow())
+    assert 1 <= len(sent) < 10
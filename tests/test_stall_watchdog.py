@@ -0,0 +1,40 @@
+"""Stalls are attributed to the labelled handler whose task blocked the loop"""
+import asyncio
+import time
+
+from stall_watchdog import LoopWatchdog, labelled, reports
+
+
+async def blocking_handler(seconds):
+    with labelled('blocking_handler', 'v1'):
+        await asyncio.sleep(0)
+        time.sleep(seconds)
+        await asyncio.sleep(0)
+
+
+async def idle_handler():
+    with labelled('idle_handler', 'text'):
+        await asyncio.sleep(1.0)
+
+
+async def run_stalls():
+    watchdog = LoopWatchdog(threshold=0.2, interval=0.02).start()
+    try:
+        await asyncio.sleep(0.1)
+        # another labelled handler is waiting while the blocking one runs
+        idle = asyncio.create_task(idle_handler())
+        await asyncio.gather(blocking_handler(0.6), asyncio.sleep(0.2))
+        await asyncio.sleep(0.2)
+        time.sleep(0.6)
+        await asyncio.sleep(0.2)
+        await idle
+    finally:
+        watchdog.stop()
+
+
+def test_stalls_name_the_running_handler():
+    reports.clear()
+    asyncio.run(run_stalls())
+    assert [(report.handler, report.mode) for report in reports] == [('blocking_handler', 'v1'),
+                                                                      ('unknown', 'unknown')]
+    assert 'time.sleep(seconds)' in reports[0].stack
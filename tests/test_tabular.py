@@ -0,0 +1,41 @@
+"""CSV/XLSX phone cells are read as one formatted number each, not scanned like free text"""
+import io
+
+import pytest
+
+from engine import parse_table
+
+
+def test_formatted_cells_in_semicolon_csv():
+    data = "Nama;No HP\nBudi;0812-3456-7890\nSiti;(0813) 1111 2222\nAni;-\n".encode('utf-8')
+    records, skipped = parse_table(data, 'vcf', 'kontak.csv')
+    assert skipped == 0
+    assert records[0]['contacts'] == [{'name': 'Budi', 'phone': '+6281234567890'},
+                                      {'name': 'Siti', 'phone': '+6281311112222'}]
+
+
+def test_international_cell_is_one_contact():
+    data = "name,phone\nAli,+60123456789\nLee,+60 12-345 6780\n".encode('utf-8')
+    records, _ = parse_table(data, 'vcf', 'kontak.csv')
+    assert records[0]['contacts'] == [{'name': 'Ali', 'phone': '+60123456789'},
+                                      {'name': 'Lee', 'phone': '+60123456780'}]
+
+
+def test_several_numbers_in_one_cell_and_no_header():
+    data = "Budi,0812 3456 7890 / 0813-1111-2222\nSiti,6281234567890\n".encode('utf-8')
+    records, _ = parse_table(data, 'txt', 'daftar.csv')
+    # the second row repeats the first number in another spelling
+    assert records[0]['phone_numbers'] == ['+6281234567890', '+6281311112222']
+
+
+def test_xlsx_number_and_text_cells():
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Nama', 'WhatsApp'])
+    sheet.append(['Budi', 6281234567890])
+    sheet.append(['Ali', '+60 12-345 6789'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    records, _ = parse_table(buffer.getvalue(), 'vcf', 'kontak.xlsx')
+    assert [c['phone'] for c in records[0]['contacts']] == ['+6281234567890', '+60123456789']
@@ -0,0 +1,132 @@
+"""Lightweight per-update tracing on contextvars, with structured JSON log lines.
+
+`start_trace` opens the root span of one update and decides once whether the
+update is sampled (TRACE_SAMPLE_RATE, 0 to 1). `span` opens a child span of
+whatever span is current; on an unsampled update it does nothing beyond a
+contextvar lookup. Every finished span is logged on the `vcfbot.trace` logger
+with its duration and attributes (sizes, counts) and, when TRACE_EXPORT_PATH is
+set, appended to that file as one JSON object per line.
+
+LOG_FORMAT=json switches all bot logging to JSON lines (`JsonFormatter`), with
+the current trace and span ids on every record so log lines join up with spans.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger('vcfbot.trace')
+
+SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'started', 'attrs')
+
+    def __init__(self, name, trace_id, parent_id, attrs):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.started = time.perf_counter()
+        self.attrs = attrs
+
+    def record(self):
+        """The finished span as a flat dict"""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'span': self.name,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            **self.attrs,
+        }
+
+
+def _finish(span, error=None):
+    record = span.record()
+    if error is not None:
+        record['error'] = type(error).__name__
+    logger.info(f"span {span.name} {record['duration_ms']}ms", extra={'span': record})
+    if EXPORT_PATH:
+        line = json.dumps(record, default=str) + '\n'
+        with _export_lock, open(EXPORT_PATH, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+@contextlib.contextmanager
+def _open(span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        _finish(span, e)
+        raise
+    else:
+        _finish(span)
+    finally:
+        _current_span.reset(token)
+
+
+@contextlib.contextmanager
+def start_trace(name, sample_rate=None, **attrs):
+    """Root span for one update; yields the span, or None when this update is not sampled"""
+    sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    if not sample_rate or random.random() >= sample_rate:
+        token = _current_span.set(None)
+        try:
+            yield None
+        finally:
+            _current_span.reset(token)
+        return
+    with _open(Span(name, f"{random.getrandbits(128):032x}", None, attrs)) as span:
+        yield span
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Child span of the current span; a no-op outside a sampled trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _open(Span(name, parent.trace_id, parent.span_id, attrs)) as child:
+        yield child
+
+
+def annotate(**attrs):
+    """Add attributes (sizes, counts) to the current span, if any"""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per log record, carrying span fields and the current trace ids"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        span_record = getattr(record, 'span', None)
+        if span_record is not None:
+            data.update(span_record)
+        else:
+            current = _current_span.get()
+            if current is not None:
+                data['trace_id'] = current.trace_id
+                data['span_id'] = current.span_id
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
@@ -0,0 +1,147 @@
+"""HTTP transport for the bot: tuned httpx pools, a separate pool for bulk sends, pool-wait metrics.
+
+PTB's default request object has a single small connection pool, so a batch of
+`reply_document` uploads can hold every connection while `get_file` and other
+calls wait for one and fail with "Pool timeout". Here sendDocument goes through
+its own pool, getUpdates keeps the dedicated request PTB already gives it, and
+the time each request spends waiting for a connection goes into the
+vcfbot_pool_wait_seconds histogram, labelled by endpoint.
+
+Settings (all optional, environment variables):
+    BOT_POOL_SIZE, BOT_BULK_POOL_SIZE, BOT_UPDATES_POOL_SIZE   connections per pool
+    BOT_KEEPALIVE_EXPIRY                                       idle keep-alive seconds
+    BOT_HTTP_VERSION                                           '1.1' or '2' (needs httpx[http2])
+    BOT_CONNECT_TIMEOUT, BOT_READ_TIMEOUT, BOT_WRITE_TIMEOUT,
+    BOT_POOL_TIMEOUT, BOT_BULK_POOL_TIMEOUT,
+    BOT_MEDIA_WRITE_TIMEOUT                                    seconds
+"""
+import logging
+import os
+import time
+
+import httpx
+from telegram.request import BaseRequest, HTTPXRequest
+
+from metrics import pool_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods that move whole files and get the bulk pool
+BULK_ENDPOINTS = frozenset({'sendDocument'})
+# pool waits at least this long (seconds) are logged as they happen
+SLOW_POOL_WAIT = 1.0
+
+
+def _env_number(name, default, kind=float):
+    value = os.getenv(name)
+    return kind(value) if value else default
+
+
+def transport_settings():
+    """Transport settings from BOT_* environment variables"""
+    return {
+        'pool_size': _env_number('BOT_POOL_SIZE', 8, int),
+        'bulk_pool_size': _env_number('BOT_BULK_POOL_SIZE', 4, int),
+        'updates_pool_size': _env_number('BOT_UPDATES_POOL_SIZE', 1, int),
+        'keepalive_expiry': _env_number('BOT_KEEPALIVE_EXPIRY', 30.0),
+        'http_version': os.getenv('BOT_HTTP_VERSION', '1.1'),
+        'connect_timeout': _env_number('BOT_CONNECT_TIMEOUT', 5.0),
+        'read_timeout': _env_number('BOT_READ_TIMEOUT', 10.0),
+        'write_timeout': _env_number('BOT_WRITE_TIMEOUT', 10.0),
+        'pool_timeout': _env_number('BOT_POOL_TIMEOUT', 5.0),
+        # queued uploads may wait for a free upload connection much longer than a plain call should
+        'bulk_pool_timeout': _env_number('BOT_BULK_POOL_TIMEOUT', 60.0),
+        'media_write_timeout': _env_number('BOT_MEDIA_WRITE_TIMEOUT', 120.0),
+    }
+
+
+def endpoint_name(url):
+    """Bot API method of a request URL ('sendDocument'), or 'file' for file downloads"""
+    if '/file/bot' in url:
+        return 'file'
+    return url.rsplit('/', 1)[-1].split('?', 1)[0]
+
+
+async def _start_pool_wait(request):
+    """httpx request hook: time from here to the first connection-level trace event is the pool wait"""
+    started = time.perf_counter()
+    endpoint = endpoint_name(str(request.url))
+    waiting = True
+
+    async def trace(event, info):
+        nonlocal waiting
+        if waiting:
+            waiting = False
+            waited = time.perf_counter() - started
+            pool_wait_seconds.observe(waited, endpoint=endpoint)
+            if waited >= SLOW_POOL_WAIT:
+                logger.warning(f"{endpoint} waited {waited:.2f}s for a pooled connection")
+
+    request.extensions['trace'] = trace
+
+
+class PooledRequest(HTTPXRequest):
+    """HTTPXRequest with a keep-alive expiry and pool-wait tracing on its httpx client"""
+
+    def __init__(self, keepalive_expiry=30.0, **kwargs):
+        self._keepalive_expiry = keepalive_expiry
+        super().__init__(**kwargs)
+
+    def _build_client(self):
+        limits = self._client_kwargs['limits']
+        self._client_kwargs['limits'] = httpx.Limits(
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=self._keepalive_expiry,
+        )
+        self._client_kwargs['event_hooks'] = {'request': [_start_pool_wait]}
+        return super()._build_client()
+
+
+class RoutedRequest(BaseRequest):
+    """Sends BULK_ENDPOINTS through their own pool and everything else through the default one"""
+
+    def __init__(self, default, bulk):
+        self.default = default
+        self.bulk = bulk
+
+    @property
+    def read_timeout(self):
+        return self.default.read_timeout
+
+    async def initialize(self):
+        await self.default.initialize()
+        await self.bulk.initialize()
+
+    async def shutdown(self):
+        await self.default.shutdown()
+        await self.bulk.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        target = self.bulk if endpoint_name(url) in BULK_ENDPOINTS else self.default
+        return await target.do_request(url, method, request_data, read_timeout=read_timeout,
+                                       write_timeout=write_timeout, connect_timeout=connect_timeout,
+                                       pool_timeout=pool_timeout)
+
+
+def _pooled(settings, pool_size, pool_timeout=None):
+    return PooledRequest(
+        keepalive_expiry=settings['keepalive_expiry'],
+        connection_pool_size=pool_size,
+        http_version=settings['http_version'],
+        connect_timeout=settings['connect_timeout'],
+        read_timeout=settings['read_timeout'],
+        write_timeout=settings['write_timeout'],
+        pool_timeout=pool_timeout or settings['pool_timeout'],
+        media_write_timeout=settings['media_write_timeout'],
+    )
+
+
+def build_requests(settings=None):
+    """Return `(request, get_updates_request)` for ApplicationBuilder"""
+    settings = settings or transport_settings()
+    bulk = _pooled(settings, settings['bulk_pool_size'], settings['bulk_pool_timeout'])
+    request = RoutedRequest(_pooled(settings, settings['pool_size']), bulk)
+    return request, _pooled(settings, settings['updates_pool_size'])